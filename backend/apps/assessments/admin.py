@@ -151,6 +151,9 @@ class SubmissionAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
         "completion_percentage",
+        "earned_points",
+        "answered_count",
+        "graded_answer_count",
     ]
     inlines = [AnswerInline]
 
@@ -163,7 +166,14 @@ class SubmissionAdmin(admin.ModelAdmin):
         (
             "Grading",
             {
-                "fields": ("graded_by", "graded_at", "feedback"),
+                "fields": (
+                    "graded_by",
+                    "graded_at",
+                    "feedback",
+                    "earned_points",
+                    "answered_count",
+                    "graded_answer_count",
+                ),
                 "classes": ("collapse",),
             },
         ),
@@ -195,6 +205,8 @@ class AnswerAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
         "display_answer",
+        "word_count",
+        "is_answered",
     ]
 
     fieldsets = (
@@ -218,7 +230,12 @@ class AnswerAdmin(admin.ModelAdmin):
         (
             "Metadata",
             {
-                "fields": ("answered_at", "display_answer"),
+                "fields": (
+                    "answered_at",
+                    "display_answer",
+                    "word_count",
+                    "is_answered",
+                ),
                 "classes": ("collapse",),
             },
         ),
@@ -0,0 +1,143 @@
+"""
+Aggregate reporting for tests.
+
+Everything here is computed with a fixed number of grouped queries per test
+(never one query per submission or per answer) and cached per test until a
+submission or answer for that test changes. Invalidation also drops the
+cached item analysis (see item_analysis.py).
+"""
+
+from django.core.cache import cache
+from django.db import models
+
+from .item_analysis import item_analysis_cache_key
+from .models import Answer, Submission
+
+STATISTICS_CACHE_TIMEOUT = 60 * 15
+COMPLETED_STATUSES = ["submitted", "graded"]
+
+
+def statistics_cache_key(test_id):
+    return f"test_statistics_{test_id}"
+
+
+def invalidate_test_statistics(test_id):
+    """Drop the cached statistics and item analysis for a test."""
+    cache.delete_many(
+        [statistics_cache_key(test_id), item_analysis_cache_key(test_id)]
+    )
+
+
+def get_test_statistics(test):
+    """Return statistics for a test, building and caching them on a miss."""
+    key = statistics_cache_key(test.id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = build_test_statistics(test)
+        cache.set(key, stats, timeout=STATISTICS_CACHE_TIMEOUT)
+    # Availability depends on the clock, so never serve it from the cache
+    return {**stats, "is_available": test.is_available}
+
+
+def build_test_statistics(test):
+    """
+    Build test-level and per-question statistics in one aggregate pass.
+
+    Expects `test.questions` / `options` to be prefetched; otherwise they
+    cost two extra queries.
+    """
+    questions = list(test.questions.all())
+
+    completed = models.Q(status__in=COMPLETED_STATUSES)
+    totals = Submission.objects.filter(test=test).aggregate(
+        total_submissions=models.Count("id"),
+        completed_submissions=models.Count("id", filter=completed),
+        average_completion_time=models.Avg(
+            "time_spent_minutes",
+            filter=completed & models.Q(time_spent_minutes__isnull=False),
+        ),
+        average_score=models.Avg(
+            "earned_points", filter=models.Q(status="graded")
+        ),
+    )
+    completed_count = totals["completed_submissions"]
+
+    answer_rows = (
+        Answer.objects.filter(
+            submission__test=test,
+            submission__status__in=COMPLETED_STATUSES,
+        )
+        .order_by()
+        .values("question_id")
+        .annotate(
+            mean_points=models.Avg("points_earned"),
+            answered=models.Count("id", filter=models.Q(is_answered=True)),
+            flagged=models.Count("id", filter=models.Q(is_flagged=True)),
+        )
+    )
+    per_question = {row["question_id"]: row for row in answer_rows}
+
+    option_counts = dict(
+        Answer.selected_options.through.objects.filter(
+            answer__submission__test=test,
+            answer__submission__status__in=COMPLETED_STATUSES,
+        )
+        .order_by()
+        .values("questionoption_id")
+        .annotate(count=models.Count("id"))
+        .values_list("questionoption_id", "count")
+    )
+
+    question_stats = []
+    for question in questions:
+        row = per_question.get(question.id, {})
+        answered = row.get("answered", 0)
+        mean_points = row.get("mean_points")
+        entry = {
+            "question_id": str(question.id),
+            "title": question.title,
+            "question_type": question.question_type,
+            "order": question.order,
+            "max_points": question.max_points,
+            "mean_points": (
+                round(mean_points, 2) if mean_points is not None else None
+            ),
+            "answered_count": answered,
+            "answer_rate": (
+                round(answered / completed_count, 4)
+                if completed_count
+                else None
+            ),
+            "flagged_count": row.get("flagged", 0),
+        }
+        if question.has_predefined_options:
+            entry["options"] = [
+                {
+                    "option_id": str(option.id),
+                    "text": option.text,
+                    "is_correct": option.is_correct,
+                    "count": option_counts.get(option.id, 0),
+                    "pick_rate": (
+                        round(option_counts.get(option.id, 0) / answered, 4)
+                        if answered
+                        else None
+                    ),
+                }
+                for option in question.options.all()
+            ]
+        question_stats.append(entry)
+
+    average_time = totals["average_completion_time"]
+    average_score = totals["average_score"]
+    return {
+        "total_questions": len(questions),
+        "total_submissions": totals["total_submissions"],
+        "completed_submissions": completed_count,
+        "average_completion_time": (
+            float(average_time) if average_time else None
+        ),
+        "average_score": (
+            round(average_score, 2) if average_score is not None else None
+        ),
+        "questions": question_stats,
+    }
@@ -0,0 +1,98 @@
+"""
+Bulk cloning of tests with their questions and options.
+
+A clone of one test into any number of targets costs three bulk_create
+calls (tests, questions, options) plus the two reads of the source,
+regardless of how many questions, options or targets are involved.
+"""
+
+import uuid
+
+from django.db import transaction
+
+from .models import Test, Question, QuestionOption
+
+# Fields copied from the source test; dates, status and totals are set per
+# clone (dates belong to the original intake, clones always start as drafts)
+TEST_COPY_FIELDS = [
+    "description",
+    "instructions",
+    "time_limit_minutes",
+    "max_attempts",
+    "allow_review_after_submission",
+    "randomize_questions",
+]
+# Per-row fields regenerated on the copy
+QUESTION_SKIP_FIELDS = {"id", "test", "created_at", "updated_at"}
+OPTION_SKIP_FIELDS = {"id", "question", "created_at"}
+
+
+def _copy_values(instance, skip):
+    """Concrete field values of `instance` keyed by attname, minus `skip`."""
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.name not in skip
+    }
+
+
+def clone_test(source, created_by, targets, title=None):
+    """
+    Copy `source` with all its questions and options into each target.
+
+    Args:
+        source: The Test to copy.
+        created_by: User recorded as the author of the copies.
+        targets: List of dicts with the `course` and `cohort` of each copy.
+        title: Title for the copies; defaults to the source title.
+
+    Returns:
+        List of the new Test instances, in the order of `targets`.
+    """
+    questions = list(source.questions.all())
+    options_by_question: dict[uuid.UUID, list[QuestionOption]] = {}
+    for option in QuestionOption.objects.filter(question__test=source):
+        options_by_question.setdefault(option.question_id, []).append(option)
+
+    # Recompute once from the source questions rather than trusting the
+    # stored total on the source
+    total_points = sum(question.max_points or 0 for question in questions)
+    test_values = {field: getattr(source, field) for field in TEST_COPY_FIELDS}
+
+    new_tests = [
+        Test(
+            title=title or source.title,
+            course=target["course"],
+            cohort=target["cohort"],
+            created_by=created_by,
+            status="draft",
+            total_points=total_points,
+            **test_values,
+        )
+        for target in targets
+    ]
+
+    with transaction.atomic():
+        Test.objects.bulk_create(new_tests)
+
+        new_questions: list[Question] = []
+        new_options: list[QuestionOption] = []
+        for new_test in new_tests:
+            for question in questions:
+                new_question = Question(
+                    test=new_test,
+                    **_copy_values(question, QUESTION_SKIP_FIELDS),
+                )
+                new_questions.append(new_question)
+                new_options.extend(
+                    QuestionOption(
+                        question=new_question,
+                        **_copy_values(option, OPTION_SKIP_FIELDS),
+                    )
+                    for option in options_by_question.get(question.id, [])
+                )
+
+        Question.objects.bulk_create(new_questions)
+        QuestionOption.objects.bulk_create(new_options)
+
+    return new_tests
@@ -0,0 +1,234 @@
+"""
+Streaming gradebook exports.
+
+Rows are produced by generators that walk submissions (or students) with
+chunked `.iterator()` queries and fetch the cells for one chunk at a time,
+so memory stays bounded by EXPORT_CHUNK_SIZE rather than by cohort size.
+"""
+
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import Answer, Submission
+from apps.cohorts.models import Enrollment
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FORMATS = ["csv", "xlsx"]
+XLSX_CONTENT_TYPE = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+)
+# Statuses that count as a handed-in attempt
+HANDED_IN_STATUSES = ["submitted", "graded", "returned"]
+# Leading characters that make spreadsheet applications evaluate a cell
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _chunked(iterable, size):
+    """Yield lists of up to `size` items from `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _format_datetime(value):
+    return value.isoformat() if value else ""
+
+
+def test_gradebook_rows(test, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the gradebook of one test: a header row, then one row per student
+    with their latest handed-in attempt and the points of every question.
+    """
+    questions = list(test.questions.values_list("id", "title"))
+    yield [
+        "Student",
+        "Email",
+        "Attempt",
+        "Status",
+        "Submitted at",
+        "Score",
+        "Max score",
+        *[title for _, title in questions],
+    ]
+
+    # Latest attempt first per student; older attempts are skipped below
+    submissions = (
+        Submission.objects.filter(test=test, status__in=HANDED_IN_STATUSES)
+        .order_by("student__last_name", "student_id", "-attempt_number")
+        .values_list(
+            "id",
+            "student_id",
+            "student__first_name",
+            "student__last_name",
+            "student__email",
+            "attempt_number",
+            "status",
+            "submitted_at",
+            "earned_points",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    last_student_id = None
+    for chunk in _chunked(submissions, chunk_size):
+        latest = []
+        for row in chunk:
+            if row[1] != last_student_id:
+                latest.append(row)
+                last_student_id = row[1]
+
+        points = {}
+        for submission_id, question_id, earned in Answer.objects.filter(
+            submission_id__in=[row[0] for row in latest]
+        ).values_list("submission_id", "question_id", "points_earned"):
+            points[(submission_id, question_id)] = earned
+
+        for (
+            submission_id,
+            _,
+            first_name,
+            last_name,
+            email,
+            attempt,
+            status,
+            submitted_at,
+            earned_points,
+        ) in latest:
+            yield [
+                f"{first_name} {last_name}".strip(),
+                email,
+                attempt,
+                status,
+                _format_datetime(submitted_at),
+                earned_points if status == "graded" else "",
+                test.total_points,
+                *[
+                    _blank_if_none(points.get((submission_id, question_id)))
+                    for question_id, _ in questions
+                ],
+            ]
+
+
+def cohort_gradebook_rows(cohort, tests, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the gradebook of a cohort: a header row, then one row per
+    enrolled student with their best graded score on each of `tests`.
+    """
+    tests = list(tests.order_by("created_at").values_list("id", "title"))
+    yield ["Student", "Email", *[title for _, title in tests]]
+
+    students = (
+        Enrollment.objects.filter(cohort=cohort)
+        .order_by("student__last_name", "student_id")
+        .values_list(
+            "student_id",
+            "student__first_name",
+            "student__last_name",
+            "student__email",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    test_ids = [test_id for test_id, _ in tests]
+
+    for chunk in _chunked(students, chunk_size):
+        scores = {}
+        for student_id, test_id, earned in (
+            Submission.objects.filter(
+                test_id__in=test_ids,
+                student_id__in=[row[0] for row in chunk],
+                status="graded",
+            )
+            .order_by("student_id", "test_id", "earned_points")
+            .values_list("student_id", "test_id", "earned_points")
+        ):
+            # Ordered ascending, so the best attempt is written last
+            scores[(student_id, test_id)] = earned
+
+        for student_id, first_name, last_name, email in chunk:
+            yield [
+                f"{first_name} {last_name}".strip(),
+                email,
+                *[
+                    _blank_if_none(scores.get((student_id, test_id)))
+                    for test_id in test_ids
+                ],
+            ]
+
+
+def _blank_if_none(value):
+    return "" if value is None else value
+
+
+def _escape_formula(value):
+    """
+    Quote a text cell that a spreadsheet would run as a formula.
+
+    Names, emails and question titles are user input; prefixing them with
+    an apostrophe makes Excel and LibreOffice show them as text. Numbers
+    are left alone so negative points stay numeric.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _escape_row(row):
+    return [_escape_formula(value) for value in row]
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(rows, filename):
+    """Stream `rows` as a CSV attachment."""
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(_escape_row(row)) for row in rows),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(rows, filename, sheet_title="Gradebook"):
+    """
+    Write `rows` to an XLSX attachment.
+
+    The workbook is built in openpyxl's write-only mode, which flushes rows
+    to a temporary file as they are appended, and the file is then
+    streamed back in blocks.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    for row in rows:
+        sheet.append(_escape_row(row))
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def gradebook_response(rows, filename, file_format):
+    """Render gradebook rows in the requested format."""
+    if file_format == "xlsx":
+        return xlsx_response(rows, filename)
+    return csv_response(rows, filename)
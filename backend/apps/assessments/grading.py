@@ -0,0 +1,162 @@
+"""
+Auto-grading of objective questions against the answer key.
+
+single_choice, multiple_choice and yes_no answers are scored from
+`QuestionOption.is_correct` and `Question.correct_boolean`. One pass loads
+the keys, answers and selections for any number of submissions in a fixed
+number of queries and writes the points back with a single bulk_update.
+Answers a lecturer has graded by hand are never overwritten.
+"""
+
+import uuid
+
+from django.db import models
+
+from .analytics import invalidate_test_statistics
+from .models import Answer, Question, QuestionOption, Submission
+
+AUTO_GRADED_TYPES = ["single_choice", "multiple_choice", "yes_no"]
+AUTO_GRADE_BATCH_SIZE = 500
+
+
+def answer_key(questions):
+    """
+    Return the answer key of the auto-gradable questions in `questions`.
+
+    Questions without a key (no correct option, or no correct_boolean for
+    yes/no) are left out and stay hand-graded.
+
+    Returns:
+        Dict of question id to a dict with type, max_points, partial_credit,
+        correct_boolean, correct (frozenset of option ids) and test_id.
+    """
+    questions = questions.filter(question_type__in=AUTO_GRADED_TYPES)
+
+    correct: dict[uuid.UUID, set[uuid.UUID]] = {}
+    for question_id, option_id in QuestionOption.objects.filter(
+        question__in=questions, is_correct=True
+    ).values_list("question_id", "id"):
+        correct.setdefault(question_id, set()).add(option_id)
+
+    key = {}
+    for (
+        question_id,
+        test_id,
+        question_type,
+        max_points,
+        partial_credit,
+        correct_boolean,
+    ) in questions.values_list(
+        "id",
+        "test_id",
+        "question_type",
+        "max_points",
+        "partial_credit",
+        "correct_boolean",
+    ):
+        if question_type == "yes_no":
+            if correct_boolean is None:
+                continue
+        elif question_id not in correct:
+            continue
+        key[question_id] = {
+            "test_id": test_id,
+            "type": question_type,
+            "max_points": max_points,
+            "partial_credit": partial_credit,
+            "correct_boolean": correct_boolean,
+            "correct": frozenset(correct.get(question_id, ())),
+        }
+    return key
+
+
+def score_answer(key, boolean_answer, selected):
+    """Points for one answer given its question's key entry."""
+    max_points = key["max_points"]
+    if key["type"] == "yes_no":
+        return max_points if boolean_answer == key["correct_boolean"] else 0.0
+
+    correct = key["correct"]
+    if key["type"] == "single_choice" or not key["partial_credit"]:
+        return max_points if selected == correct else 0.0
+
+    hits = len(selected & correct)
+    wrong = len(selected - correct)
+    return round(max_points * max(hits - wrong, 0) / len(correct), 2)
+
+
+def auto_grade(submissions):
+    """
+    Score the objective answers of `submissions` (a Submission queryset).
+
+    Answers without points, or whose points came from an earlier auto-grade,
+    are (re)scored; answers graded by a lecturer are left alone. Stored
+    submission scores and test statistics are refreshed for every
+    submission that changed.
+
+    Returns:
+        Number of answers whose points changed.
+    """
+    key = answer_key(
+        Question.objects.filter(test__in=submissions.values("test"))
+    )
+    if not key:
+        return 0
+
+    gradable = Answer.objects.filter(
+        submission__in=submissions, question_id__in=key
+    ).filter(
+        models.Q(points_earned__isnull=True) | models.Q(is_auto_graded=True)
+    )
+
+    selected: dict[int, set[uuid.UUID]] = {}
+    for answer_id, option_id in Answer.selected_options.through.objects.filter(
+        answer__in=gradable
+    ).values_list("answer_id", "questionoption_id"):
+        selected.setdefault(answer_id, set()).add(option_id)
+
+    changed = []
+    for answer in gradable.only(
+        "id",
+        "submission_id",
+        "question_id",
+        "boolean_answer",
+        "points_earned",
+        "is_auto_graded",
+    ):
+        points = score_answer(
+            key[answer.question_id],
+            answer.boolean_answer,
+            selected.get(answer.id, set()),
+        )
+        if answer.points_earned != points or not answer.is_auto_graded:
+            answer.points_earned = points
+            answer.is_auto_graded = True
+            changed.append(answer)
+
+    if not changed:
+        return 0
+
+    Answer.objects.bulk_update(
+        changed,
+        ["points_earned", "is_auto_graded"],
+        batch_size=AUTO_GRADE_BATCH_SIZE,
+    )
+    Submission.objects.filter(
+        id__in={answer.submission_id for answer in changed}
+    ).refresh_scores()
+
+    # Bulk updates bypass the post_save statistics invalidation
+    for test_id in {key[answer.question_id]["test_id"] for answer in changed}:
+        invalidate_test_statistics(test_id)
+    return len(changed)
+
+
+def regrade_test(test):
+    """
+    Re-run the auto-grader over the submissions of a test awaiting grading.
+
+    Graded and returned submissions keep the points the student was given;
+    returned ones are scored again when they are resubmitted.
+    """
+    return auto_grade(test.submissions.filter(status="submitted"))
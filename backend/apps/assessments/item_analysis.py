@@ -0,0 +1,167 @@
+"""
+Item analysis of a test's graded submissions.
+
+For every question: difficulty (p-value), point-biserial discrimination
+against the total score, an upper/lower group discrimination index and, for
+choice questions, how often each option was picked overall and by the top
+and bottom performers.
+
+The points of all graded submissions are loaded as one (submission x
+question) matrix and the selections as one (submission x option) matrix,
+two queries in total, and everything is computed with NumPy. Results are
+cached per test and dropped with the test statistics (regrades, answer key
+and answer changes); the cached report also records the number and latest
+graded_at of the graded submissions, so a new grade made through a
+queryset update produces a fresh report as well.
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db import models
+
+from .models import Answer, Submission
+
+ITEM_ANALYSIS_CACHE_TIMEOUT = 60 * 60 * 24
+# Share of submissions in each of the top and bottom groups (Kelley's 27%)
+GROUP_FRACTION = 0.27
+
+
+def item_analysis_cache_key(test_id):
+    return f"item_analysis_{test_id}"
+
+
+def get_item_analysis(test):
+    """Return the item analysis of a test, building and caching it on a miss."""
+    graded = Submission.objects.filter(test=test, status="graded").aggregate(
+        count=models.Count("id"), latest=models.Max("graded_at")
+    )
+    stamp = (graded["count"], graded["latest"])
+    key = item_analysis_cache_key(test.id)
+    cached = cache.get(key)
+    if cached is not None and cached["stamp"] == stamp:
+        return cached["report"]
+    report = build_item_analysis(test)
+    cache.set(
+        key,
+        {"stamp": stamp, "report": report},
+        timeout=ITEM_ANALYSIS_CACHE_TIMEOUT,
+    )
+    return report
+
+
+def _round(value, digits=4):
+    """Round a NumPy scalar for JSON; NaN (undefined) becomes None."""
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def build_item_analysis(test):
+    """
+    Compute the item analysis of every graded submission of a test.
+
+    Expects `test.questions` / `options` to be prefetched; otherwise they
+    cost two extra queries. Ungraded or missing answers count as 0 points.
+    """
+    questions = list(test.questions.all())
+    submission_ids = list(
+        Submission.objects.filter(test=test, status="graded")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    n = len(submission_ids)
+    row = {submission_id: i for i, submission_id in enumerate(submission_ids)}
+    column = {question.id: j for j, question in enumerate(questions)}
+    options = [
+        option
+        for question in questions
+        if question.has_predefined_options
+        for option in question.options.all()
+    ]
+    option_column = {option.id: k for k, option in enumerate(options)}
+
+    points = np.zeros((n, len(questions)))
+    for submission_id, question_id, earned in Answer.objects.filter(
+        submission__test=test, submission__status="graded"
+    ).values_list("submission_id", "question_id", "points_earned"):
+        if earned is not None and question_id in column:
+            points[row[submission_id], column[question_id]] = earned
+
+    picked = np.zeros((n, len(options)), dtype=bool)
+    for (
+        submission_id,
+        option_id,
+    ) in Answer.selected_options.through.objects.filter(
+        answer__submission__test=test, answer__submission__status="graded"
+    ).values_list("answer__submission_id", "questionoption_id"):
+        if option_id in option_column:
+            picked[row[submission_id], option_column[option_id]] = True
+
+    max_points = np.array([question.max_points for question in questions])
+    totals = points.sum(axis=1)
+
+    # Top and bottom groups by total score (stable, so ties are deterministic)
+    group_size = max(int(round(n * GROUP_FRACTION)), 1) if n else 0
+    ranking = np.argsort(totals, kind="stable")
+    bottom, top = ranking[:group_size], ranking[n - group_size :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if n:
+            p_values = points.mean(axis=0) / max_points
+            discrimination = (
+                points[top].mean(axis=0) - points[bottom].mean(axis=0)
+            ) / max_points
+            # Point-biserial: Pearson r of each item column with the totals;
+            # undefined (NaN) when either has no variance
+            centered = points - points.mean(axis=0)
+            centered_totals = totals - totals.mean()
+            point_biserial = (centered.T @ centered_totals) / (
+                np.sqrt((centered**2).sum(axis=0))
+                * np.sqrt((centered_totals**2).sum())
+            )
+            selection = picked.mean(axis=0)
+            top_selection = picked[top].mean(axis=0)
+            bottom_selection = picked[bottom].mean(axis=0)
+        else:
+            p_values = discrimination = point_biserial = np.full(
+                len(questions), np.nan
+            )
+            selection = top_selection = bottom_selection = np.full(
+                len(options), np.nan
+            )
+
+    question_reports = []
+    for j, question in enumerate(questions):
+        entry = {
+            "question_id": str(question.id),
+            "title": question.title,
+            "question_type": question.question_type,
+            "order": question.order,
+            "max_points": question.max_points,
+            "p_value": _round(p_values[j]),
+            "point_biserial": _round(point_biserial[j]),
+            "discrimination_index": _round(discrimination[j]),
+        }
+        if question.has_predefined_options:
+            entry["options"] = [
+                {
+                    "option_id": str(option.id),
+                    "text": option.text,
+                    "is_correct": option.is_correct,
+                    "selection_rate": _round(selection[k]),
+                    "top_selection_rate": _round(top_selection[k]),
+                    "bottom_selection_rate": _round(bottom_selection[k]),
+                }
+                for k, option in (
+                    (option_column[option.id], option)
+                    for option in question.options.all()
+                )
+            ]
+        question_reports.append(entry)
+
+    return {
+        "graded_submissions": n,
+        "group_size": group_size,
+        "mean_score": _round(totals.mean(), 2) if n else None,
+        "score_std": _round(totals.std(), 2) if n else None,
+        "questions": question_reports,
+    }
@@ -0,0 +1,45 @@
+"""
+Management command to backfill stored submission scores and answer counts.
+Run once after deploying the earned_points/answered_count fields, or at any
+time to repair drift.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.assessments.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Recompute stored earned_points and answer counts on submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of submissions to update per UPDATE statement",
+        )
+        parser.add_argument(
+            "--test",
+            type=int,
+            dest="test_id",
+            help="Only backfill submissions for this test id",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        submissions = Submission.objects.order_by("id")
+        if options.get("test_id"):
+            submissions = submissions.filter(test_id=options["test_id"])
+
+        ids = list(submissions.values_list("id", flat=True))
+        self.stdout.write(f"Backfilling scores for {len(ids)} submissions...")
+
+        updated = 0
+        for i in range(0, len(ids), batch_size):
+            chunk = ids[i : i + batch_size]
+            updated += Submission.objects.filter(id__in=chunk).refresh_scores()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully backfilled {updated} submissions")
+        )
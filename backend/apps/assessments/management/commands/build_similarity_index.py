@@ -0,0 +1,49 @@
+"""
+Management command to build the answer similarity index for submissions
+handed in before the index existed. Safe to re-run; entries are replaced.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.assessments.models import Submission
+from apps.assessments.similarity import index_submissions
+
+
+class Command(BaseCommand):
+    help = "Build MinHash similarity index entries for handed-in essay answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of submissions to index per batch",
+        )
+        parser.add_argument(
+            "--test",
+            type=int,
+            dest="test_id",
+            help="Only index submissions for this test id",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        submissions = Submission.objects.exclude(status="in_progress").order_by(
+            "id"
+        )
+        if options.get("test_id"):
+            submissions = submissions.filter(test_id=options["test_id"])
+
+        ids = list(submissions.values_list("id", flat=True))
+        self.stdout.write(f"Indexing answers of {len(ids)} submissions...")
+
+        indexed = 0
+        for i in range(0, len(ids), batch_size):
+            chunk = ids[i : i + batch_size]
+            indexed += index_submissions(
+                Submission.objects.filter(id__in=chunk)
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully indexed {indexed} answers")
+        )
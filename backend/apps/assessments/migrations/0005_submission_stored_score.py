@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0004_add_min_value_validator_to_max_points'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of answers with any content'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='earned_points',
+            field=models.FloatField(default=0.0, help_text='Sum of points_earned across graded answers'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='graded_answer_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of answers with points_earned set'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['test', 'status'], name='assessments_test_id_89d4cf_idx'),
+        ),
+    ]
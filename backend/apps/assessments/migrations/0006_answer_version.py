@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0005_submission_stored_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Incremented on every student write; autosave clients send the version they last saw to detect conflicting edits'),
+        ),
+    ]
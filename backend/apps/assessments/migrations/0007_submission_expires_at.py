@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:50
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    """Set expires_at on open attempts of timed tests (see Test.expiry_for)."""
+    Test = apps.get_model("assessments", "Test")
+    Submission = apps.get_model("assessments", "Submission")
+
+    timed_tests = Test.objects.filter(
+        time_limit_minutes__gt=0,
+        submissions__status="in_progress",
+    ).distinct()
+    for test in timed_tests:
+        in_progress = Submission.objects.filter(test=test, status="in_progress")
+        in_progress.update(
+            expires_at=models.ExpressionWrapper(
+                models.F("started_at")
+                + timedelta(minutes=test.time_limit_minutes),
+                output_field=models.DateTimeField(),
+            )
+        )
+        if test.available_until:
+            in_progress.filter(expires_at__gt=test.available_until).update(
+                expires_at=test.available_until
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0006_answer_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='When a timed attempt is auto-submitted (see Test.expiry_for)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'expires_at'], name='assessments_status_37f928_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
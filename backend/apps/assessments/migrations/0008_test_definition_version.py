@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0007_submission_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='definition_version',
+            field=models.PositiveIntegerField(default=1, help_text='Bumped when the question set changes in a way that invalidates existing answers (see snapshots.py)'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0008_test_definition_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='is_auto_graded',
+            field=models.BooleanField(default=False, help_text='points_earned was set by the auto-grader, not a lecturer'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='correct_boolean',
+            field=models.BooleanField(blank=True, help_text='Correct answer for auto-graded yes/no questions', null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='partial_credit',
+            field=models.BooleanField(default=False, help_text='Multiple choice: credit each correct option picked, less one for each wrong pick, instead of all-or-nothing'),
+        ),
+        migrations.AlterField(
+            model_name='questionoption',
+            name='is_correct',
+            field=models.BooleanField(default=False, help_text='Mark as correct for auto-graded questions'),
+        ),
+    ]
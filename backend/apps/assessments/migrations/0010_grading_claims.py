@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0009_auto_grading'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, limit_choices_to={'role__in': ['admin', 'lecturer']}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions_claimed', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text="The grader's claim lapses after this time", null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0010_grading_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerSignature',
+            fields=[
+                ('answer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity_signature', serialize=False, to='assessments.answer')),
+                ('signature', models.BinaryField(help_text='MinHash values as packed unsigned 32-bit integers')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_signatures', to='assessments.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnswerBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='assessments.answer')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_buckets', to='assessments.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'bucket'], name='answer_bucket_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:13
+
+from django.db import migrations, models
+from django.db.models.functions import Trim
+
+
+def backfill_content_state(apps, schema_editor):
+    """Fill word_count and is_answered (see Answer.refresh_content_state)."""
+    Answer = apps.get_model("assessments", "Answer")
+    Through = Answer.selected_options.through
+
+    Answer.objects.annotate(trimmed_text=Trim("text_answer")).filter(
+        ~models.Q(trimmed_text="")
+        | models.Q(boolean_answer__isnull=False)
+        | models.Q(date_answer__isnull=False)
+        | (models.Q(file_answer__isnull=False) & ~models.Q(file_answer=""))
+        | models.Exists(Through.objects.filter(answer_id=models.OuterRef("pk")))
+    ).update(is_answered=True)
+
+    batch = []
+    for answer in (
+        Answer.objects.exclude(text_answer="").only("id", "text_answer").iterator()
+    ):
+        answer.word_count = len(answer.text_answer.split())
+        batch.append(answer)
+        if len(batch) == 1000:
+            Answer.objects.bulk_update(batch, ["word_count"])
+            batch = []
+    if batch:
+        Answer.objects.bulk_update(batch, ["word_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0011_answer_similarity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='is_answered',
+            field=models.BooleanField(default=False, help_text='Whether the answer has any content, maintained on write'),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, help_text='Words in text_answer, maintained on write'),
+        ),
+        migrations.RunPython(backfill_content_state, migrations.RunPython.noop),
+    ]
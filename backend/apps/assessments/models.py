@@ -1,4 +1,9 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, router
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_save
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
@@ -58,6 +63,12 @@ class Test(models.Model):
         default=False, help_text="Randomize question order for each student"
     )
 
+    definition_version = models.PositiveIntegerField(
+        default=1,
+        help_text="Bumped when the question set changes in a way that "
+        "invalidates existing answers (see snapshots.py)",
+    )
+
     # Grading settings
     total_points = models.FloatField(
         default=0.0, help_text="Total possible points for this test"
@@ -138,6 +149,39 @@ class Test(models.Model):
                     delattr(self, "_suppress_notification_signals")
         return total
 
+    def expiry_for(self, started_at):
+        """
+        Deadline for an attempt started at `started_at`: the time limit,
+        capped by available_until. Untimed tests never expire.
+        """
+        if not self.time_limit_minutes:
+            return None
+        expires_at = started_at + timedelta(minutes=self.time_limit_minutes)
+        if self.available_until and self.available_until < expires_at:
+            return self.available_until
+        return expires_at
+
+    def sync_submission_expiry(self):
+        """
+        Recompute expires_at for in-progress submissions after the time limit
+        or deadline changed. Runs as at most two UPDATE statements.
+        """
+        in_progress = self.submissions.filter(status="in_progress")
+        if not self.time_limit_minutes:
+            return in_progress.update(expires_at=None)
+        updated = in_progress.update(
+            expires_at=models.ExpressionWrapper(
+                models.F("started_at")
+                + timedelta(minutes=self.time_limit_minutes),
+                output_field=models.DateTimeField(),
+            )
+        )
+        if self.available_until:
+            in_progress.filter(expires_at__gt=self.available_until).update(
+                expires_at=self.available_until
+            )
+        return updated
+
     def has_graded_submissions(self):
         """Check if this test has any graded submissions"""
         return self.submissions.filter(status="graded").exists()
@@ -237,6 +281,16 @@ class Question(models.Model):
         validators=[MinValueValidator(0.01)],
         help_text="Maximum points possible for this question"
     )
+    correct_boolean = models.BooleanField(
+        null=True,
+        blank=True,
+        help_text="Correct answer for auto-graded yes/no questions",
+    )
+    partial_credit = models.BooleanField(
+        default=False,
+        help_text="Multiple choice: credit each correct option picked, "
+        "less one for each wrong pick, instead of all-or-nothing",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -271,7 +325,7 @@ class QuestionOption(models.Model):
     order = models.PositiveIntegerField(default=0)
     is_correct = models.BooleanField(
         default=False,
-        help_text="Mark as correct for auto-graded questions (future feature)",
+        help_text="Mark as correct for auto-graded questions",
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -289,6 +343,122 @@ class QuestionOption(models.Model):
         return f"{self.question.title} - Option {self.order}: {self.text[:30]}"
 
 
+class SubmissionQuerySet(models.QuerySet):
+    """QuerySet helpers for keeping stored submission aggregates in sync."""
+
+    def refresh_scores(self):
+        """
+        Recompute earned_points, answered_count and graded_answer_count for
+        every submission in this queryset with a single UPDATE.
+
+        Returns the number of submissions updated.
+        """
+        answers = Answer.objects.filter(submission=OuterRef("pk")).order_by()
+
+        earned = (
+            answers.filter(points_earned__isnull=False)
+            .values("submission")
+            .annotate(total=models.Sum("points_earned"))
+            .values("total")
+        )
+        graded = (
+            answers.filter(points_earned__isnull=False)
+            .values("submission")
+            .annotate(total=models.Count("id"))
+            .values("total")
+        )
+
+        return self.update(
+            earned_points=Coalesce(
+                Subquery(earned, output_field=models.FloatField()), 0.0
+            ),
+            graded_answer_count=Coalesce(
+                Subquery(graded, output_field=models.IntegerField()), 0
+            ),
+            answered_count=self._answered_count_expression(),
+        )
+
+    def transition(self, expected, target, **changes):
+        """
+        Move every submission still in one of the `expected` statuses to
+        `target` with a single conditional UPDATE (compare-and-swap on
+        status). Rows that already moved on are left untouched.
+
+        Returns the number of submissions transitioned. Sends no signals.
+        """
+        if isinstance(expected, str):
+            expected = [expected]
+        changes.setdefault("updated_at", timezone.now())
+        return self.filter(status__in=expected).update(
+            status=target, **changes
+        )
+
+    def unclaimed(self, user=None, now=None):
+        """
+        Submissions with no live grading claim; with `user`, also those
+        whose claim belongs to that user.
+        """
+        now = now or timezone.now()
+        free = models.Q(claimed_until__isnull=True) | models.Q(
+            claimed_until__lte=now
+        )
+        if user is not None:
+            free |= models.Q(claimed_by=user)
+        return self.filter(free)
+
+    def grading_queue_counts(self, now=None):
+        """
+        Count the `submitted` submissions of this queryset still to grade
+        and how many of them are currently claimed, in one query.
+        """
+        now = now or timezone.now()
+        return self.filter(status="submitted").aggregate(
+            remaining=models.Count("id"),
+            claimed=models.Count("id", filter=models.Q(claimed_until__gt=now)),
+        )
+
+    def with_question_total(self):
+        """
+        Annotate `question_total`, the number of questions of each row's test,
+        which Submission.completion_percentage uses instead of a COUNT.
+        """
+        questions = (
+            Question.objects.filter(test=OuterRef("test"))
+            .order_by()
+            .values("test")
+            .annotate(total=models.Count("id"))
+            .values("total")
+        )
+        return self.annotate(
+            question_total=Coalesce(
+                Subquery(questions, output_field=models.IntegerField()), 0
+            ),
+        )
+
+    def with_completion(self):
+        """
+        Annotate `live_answered_count` and `question_total` so completion can
+        be computed for every row without touching answers in Python.
+        """
+        return self.with_question_total().annotate(
+            live_answered_count=self._answered_count_expression()
+        )
+
+    @staticmethod
+    def _answered_count_expression():
+        """Correlated count of answers with any content per submission."""
+        answered = (
+            Answer.objects.filter(submission=OuterRef("pk"), is_answered=True)
+            .order_by()
+            .values("submission")
+            .annotate(total=models.Count("id"))
+            .values("total")
+        )
+        return Coalesce(
+            Subquery(answered, output_field=models.IntegerField()), 0
+        )
+
+
 class Submission(models.Model):
     """
     A student's submission of a test. Contains all their answers.
@@ -320,6 +490,11 @@ class Submission(models.Model):
     # Timing
     started_at = models.DateTimeField(auto_now_add=True)
     submitted_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a timed attempt is auto-submitted (see Test.expiry_for)",
+    )
     time_spent_minutes = models.PositiveIntegerField(
         null=True,
         blank=True,
@@ -340,6 +515,21 @@ class Submission(models.Model):
         blank=True, help_text="General feedback from grader"
     )
 
+    # Grading work queue lease (see SubmissionViewSet.claim_next)
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="submissions_claimed",
+        limit_choices_to={"role__in": ["admin", "lecturer"]},
+    )
+    claimed_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="The grader's claim lapses after this time",
+    )
+
     # Re-grading audit trail
     grading_history = models.JSONField(
         default=list,
@@ -347,6 +537,17 @@ class Submission(models.Model):
         help_text="List of previous grading events: [{grader_id, grader_name, graded_at, score, feedback, per_answer}]"
     )
 
+    # Stored grading aggregates (see SubmissionQuerySet.refresh_scores)
+    earned_points = models.FloatField(
+        default=0.0, help_text="Sum of points_earned across graded answers"
+    )
+    answered_count = models.PositiveIntegerField(
+        default=0, help_text="Number of answers with any content"
+    )
+    graded_answer_count = models.PositiveIntegerField(
+        default=0, help_text="Number of answers with points_earned set"
+    )
+
     # Metadata
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
@@ -354,6 +555,8 @@ class Submission(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SubmissionQuerySet.as_manager()
+
     class Meta:
         ordering = ["-submitted_at", "-created_at"]
         constraints = [
@@ -362,10 +565,30 @@ class Submission(models.Model):
                 name="unique_test_student_attempt",
             )
         ]
+        indexes = [
+            models.Index(fields=["test", "status"]),
+            models.Index(fields=["status", "expires_at"]),
+        ]
 
     def __str__(self):
         return f"{self.student.get_full_name()} - {self.test.title} (Attempt {self.attempt_number})"
 
+    def save(self, *args, **kwargs):
+        # started_at is only assigned on insert, so derive the deadline from
+        # the same clock reading here
+        if (
+            self._state.adding
+            and self.status == "in_progress"
+            and self.expires_at is None
+        ):
+            self.expires_at = self.test.expiry_for(timezone.now())
+        super().save(*args, **kwargs)
+
+    @property
+    def is_expired(self):
+        """Whether a timed attempt is past its deadline"""
+        return self.expires_at is not None and timezone.now() >= self.expires_at
+
     @property
     def is_submitted(self):
         """Check if submission has been submitted"""
@@ -381,43 +604,103 @@ class Submission(models.Model):
         - boolean_answer is not None
         - date_answer is not None
         - at least one selected_option
+
+        The question total comes from the `with_question_total()` annotation
+        when present, otherwise from the test (prefetched questions or one
+        COUNT).
         """
-        total_questions = self.test.total_questions
+        total_questions = getattr(self, "question_total", None)
+        if total_questions is None:
+            total_questions = self.test.total_questions
         if total_questions == 0:
             return 100
 
-        answered = 0
-        for answer in self.answers.all():
-            if (
-                (answer.text_answer and answer.text_answer.strip())
-                or (answer.file_answer)
-                or (answer.boolean_answer is not None)
-                or (answer.date_answer is not None)
-                or (answer.selected_options.exists())
-            ):
-                answered += 1
+        # Stored Answer.is_answered: count prefetched answers in Python,
+        # otherwise one COUNT query
+        answers = getattr(self, "_prefetched_objects_cache", {}).get("answers")
+        if answers is not None:
+            answered = sum(1 for answer in answers if answer.is_answered)
+        else:
+            answered = self.answers.filter(is_answered=True).count()
 
         return (answered / total_questions) * 100
 
     @property
     def score(self):
-        """Calculate total score from all graded answers"""
+        """Total score from the stored earned_points of graded answers"""
         if self.status not in ["graded"]:
             return None
         # B.5.2 — Guard against zero total_points to avoid division issues upstream
         if self.test.total_points == 0:
             return 0.0
-        total_score = sum(
-            answer.points_earned or 0
-            for answer in self.answers.filter(points_earned__isnull=False)
+        return self.earned_points
+
+    def transition(self, expected, target, **changes):
+        """
+        Apply a status transition as a compare-and-swap.
+
+        Issues ``UPDATE ... WHERE id = <pk> AND status IN <expected>`` that
+        writes only the status, updated_at and the given `changes`. When a
+        concurrent request (or the auto-submit sweep) already moved the
+        submission, nothing is written and False is returned. On success
+        the instance is updated in memory and post_save is sent once with
+        `update_fields`, so receivers only ever see real transitions.
+
+        Args:
+            expected: Status or list of statuses the submission must be in.
+            target: Status to move to.
+            **changes: Other field values to write in the same UPDATE.
+
+        Returns:
+            True if this call performed the transition.
+        """
+        changes["updated_at"] = timezone.now()
+        transitioned = Submission.objects.filter(pk=self.pk).transition(
+            expected, target, **changes
+        )
+        if not transitioned:
+            return False
+
+        self._previous_status = self.status
+        self.status = target
+        for field, value in changes.items():
+            setattr(self, field, value)
+        post_save.send(
+            sender=Submission,
+            instance=self,
+            created=False,
+            update_fields=frozenset(["status", *changes]),
+            raw=False,
+            using=router.db_for_write(Submission, instance=self),
+        )
+        return True
+
+    def refresh_score(self):
+        """
+        Recompute the stored grading aggregates for this submission and
+        reload them onto the instance.
+        """
+        Submission.objects.filter(pk=self.pk).refresh_scores()
+        self.refresh_from_db(
+            fields=["earned_points", "answered_count", "graded_answer_count"]
         )
-        return total_score
 
     @property
     def is_resubmittable(self):
         """Check if this submission can be reopened for revision."""
         return self.status == "returned"
 
+    @property
+    def results_released(self):
+        """
+        Whether the student may see their points: once the submission is
+        graded or returned, or after the test has closed.
+        """
+        if self.status in ["graded", "returned"]:
+            return True
+        available_until = self.test.available_until
+        return available_until is not None and timezone.now() > available_until
+
     @property
     def max_score(self):
         """Get maximum possible score for this test"""
@@ -454,14 +737,30 @@ class Answer(models.Model):
 
     # Answer metadata
     answered_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented on every student write; autosave clients "
+        "send the version they last saw to detect conflicting edits",
+    )
     is_flagged = models.BooleanField(
         default=False, help_text="Flag for review during grading"
     )
+    word_count = models.PositiveIntegerField(
+        default=0, help_text="Words in text_answer, maintained on write"
+    )
+    is_answered = models.BooleanField(
+        default=False,
+        help_text="Whether the answer has any content, maintained on write",
+    )
 
     # Individual question feedback (for manual grading)
     points_earned = models.FloatField(
         null=True, blank=True, help_text="Points earned for this answer"
     )
+    is_auto_graded = models.BooleanField(
+        default=False,
+        help_text="points_earned was set by the auto-grader, not a lecturer",
+    )
     feedback = models.TextField(
         blank=True, help_text="Specific feedback for this answer"
     )
@@ -478,9 +777,45 @@ class Answer(models.Model):
             )
         ]
 
+    # Fields whose change requires word_count / is_answered to be recomputed
+    CONTENT_FIELDS = {"text_answer", "boolean_answer", "date_answer", "file_answer"}
+
     def __str__(self):
         return f"{self.submission.student.get_full_name()} - {self.question.title[:30]}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.CONTENT_FIELDS & set(update_fields):
+            self.refresh_content_state()
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "word_count",
+                    "is_answered",
+                }
+        super().save(*args, **kwargs)
+
+    def refresh_content_state(self, has_options=None):
+        """
+        Recompute word_count and is_answered from the answer's content.
+
+        `has_options` tells whether any option is selected; when not given
+        it is only looked up if no other field holds content.
+        """
+        self.word_count = len(self.text_answer.split())
+        self.is_answered = bool(
+            self.text_answer.strip()
+            or self.boolean_answer is not None
+            or self.date_answer is not None
+            or self.file_answer
+        )
+        if not self.is_answered:
+            if has_options is None:
+                has_options = (
+                    not self._state.adding and self.selected_options.exists()
+                )
+            self.is_answered = has_options
+
     @property
     def display_answer(self):
         """Get a string representation of the answer based on question type"""
@@ -512,13 +847,7 @@ class Answer(models.Model):
     @property
     def has_answer(self):
         """Check if this answer has any content"""
-        return bool(
-            self.text_answer
-            or self.boolean_answer is not None
-            or self.date_answer
-            or self.file_answer
-            or self.selected_options.exists()
-        )
+        return self.is_answered
 
     @property
     def max_points(self):
@@ -561,7 +890,7 @@ class Answer(models.Model):
         ]:
             # Validate word count for essay-type questions
             if self.question.min_word_count or self.question.max_word_count:
-                word_count = len(self.text_answer.split())
+                word_count = self.word_count
 
                 if (
                     self.question.min_word_count
@@ -579,8 +908,6 @@ class Answer(models.Model):
                         f"Essay answer must be no more than {self.question.max_word_count} words (current: {word_count})"
                     )
 
-
-
     def get_validation_errors(self):
         """
         Get validation errors without raising exceptions.
@@ -591,3 +918,53 @@ class Answer(models.Model):
             return []
         except ValidationError as e:
             return e.messages
+
+
+class AnswerSignature(models.Model):
+    """
+    MinHash signature of a long text answer, used to find near-duplicate
+    answers to the same question. Built when the submission is handed in.
+    """
+
+    answer = models.OneToOneField(
+        Answer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="similarity_signature",
+    )
+    question = models.ForeignKey(
+        Question, on_delete=models.CASCADE, related_name="answer_signatures"
+    )
+    signature = models.BinaryField(
+        help_text="MinHash values as packed unsigned 32-bit integers"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Signature of answer {self.answer_id}"
+
+
+class AnswerBucket(models.Model):
+    """
+    One LSH band of an answer signature. Answers to the same question that
+    share a bucket are candidate near-duplicates.
+    """
+
+    answer = models.ForeignKey(
+        Answer, on_delete=models.CASCADE, related_name="similarity_buckets"
+    )
+    question = models.ForeignKey(
+        Question, on_delete=models.CASCADE, related_name="answer_buckets"
+    )
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["question", "bucket"], name="answer_bucket_lookup_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"Bucket {self.bucket} of answer {self.answer_id}"
@@ -0,0 +1,54 @@
+"""
+Deterministic per-attempt question and option order for tests with
+`randomize_questions`.
+
+The order is a pure function of the submission id and the test's
+`definition_version`: every question and option gets a rank from a keyed
+BLAKE2 hash of its id and items are sorted by rank. Nothing is stored, every
+server computes the same order without a lookup, and because ranks are per
+item, any subset (such as the answers of a submission) comes out in the same
+relative order as the full question list.
+"""
+
+import hashlib
+
+
+def order_ranker(submission_id, definition_version):
+    """Return a function mapping an item id to its rank in this attempt."""
+    key = f"{submission_id}:{definition_version}".encode()
+
+    def rank(item_id):
+        digest = hashlib.blake2b(
+            str(item_id).encode(), key=key, digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "big")
+
+    return rank
+
+
+def shuffle_questions(
+    questions,
+    submission_id,
+    definition_version,
+    id_field="id",
+    options_field="options",
+):
+    """
+    Return serialized questions and their options in the attempt's order.
+
+    `questions` is a list of dicts, e.g. the cached snapshot or serialized
+    answers (``id_field="question"``, ``options_field="question_options"``).
+    The list and the dicts are never modified, so cached data is safe to
+    pass in.
+    """
+    rank = order_ranker(submission_id, definition_version)
+    shuffled = []
+    for question in sorted(questions, key=lambda q: rank(q[id_field])):
+        options = question.get(options_field)
+        if options:
+            question = {
+                **question,
+                options_field: sorted(options, key=lambda o: rank(o["id"])),
+            }
+        shuffled.append(question)
+    return shuffled
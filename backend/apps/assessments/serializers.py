@@ -1,9 +1,25 @@
 from rest_framework import serializers
 from .models import Test, Question, QuestionOption, Submission, Answer
+from .grading import answer_key, regrade_test
+from .randomization import shuffle_questions
+from .snapshots import (
+    batched_invalidation,
+    bump_definition_version,
+    get_test_snapshot,
+    refresh_test_snapshot,
+)
 from drf_spectacular.utils import extend_schema_field
 from django.db import transaction, models
 
 
+def hide_answer_key(serializer, data, fields):
+    """Drop answer-key fields when the context asks for it (students)."""
+    if serializer.context.get("hide_answer_key"):
+        for field in fields:
+            data.pop(field, None)
+    return data
+
+
 class QuestionOptionSerializer(serializers.ModelSerializer):
     """Serializer for question options in choice-based questions."""
 
@@ -17,6 +33,11 @@ class QuestionOptionSerializer(serializers.ModelSerializer):
             },  # Order will be determined by position in array
         }
 
+    def to_representation(self, instance):
+        return hide_answer_key(
+            self, super().to_representation(instance), ["is_correct"]
+        )
+
 
 class QuestionSerializer(serializers.ModelSerializer):
     """Serializer for test questions with nested options."""
@@ -44,6 +65,8 @@ class QuestionSerializer(serializers.ModelSerializer):
             "text_max_length",
             "text_placeholder",
             "max_points",
+            "correct_boolean",
+            "partial_credit",
             "options",
         ]
         extra_kwargs = {
@@ -52,6 +75,11 @@ class QuestionSerializer(serializers.ModelSerializer):
             },  # Order will be determined by position in array
         }
 
+    def to_representation(self, instance):
+        return hide_answer_key(
+            self, super().to_representation(instance), ["correct_boolean"]
+        )
+
     def validate(self, attrs):
         """Validate question based on its type."""
         question_type = attrs.get("question_type")
@@ -122,6 +150,7 @@ class TestSerializer(serializers.ModelSerializer):
             "allow_review_after_submission",
             "randomize_questions",
             "total_points",
+            "definition_version",
             "status",
             "available_from",
             "available_until",
@@ -143,6 +172,7 @@ class TestSerializer(serializers.ModelSerializer):
         ]
         extra_kwargs = {
             "created_by": {"read_only": True},
+            "definition_version": {"read_only": True},
             "created_at": {"read_only": True},
             "updated_at": {"read_only": True},
         }
@@ -246,11 +276,15 @@ class TestSerializer(serializers.ModelSerializer):
         test = Test.objects.create(**validated_data)
 
         # Create questions and options
-        self._create_questions(test, questions_data)
+        with batched_invalidation():
+            self._create_questions(test, questions_data)
 
         # Calculate total points
         test.calculate_total_points()
 
+        if test.status == "published":
+            refresh_test_snapshot(test)
+
         return test
 
     def update(self, instance, validated_data):
@@ -282,20 +316,34 @@ class TestSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
 
+        # Keep in-progress deadlines in step with the new timing
+        if {"time_limit_minutes", "available_until"} & validated_data.keys():
+            instance.sync_submission_expiry()
+
         # Handle questions if provided
         if questions_data is not None:
-            breaking_changes, graded_submissions_returned = (
-                self._handle_question_updates_with_breaking_changes(
-                    instance, questions_data
+            previous_key = answer_key(instance.questions.all())
+            # One invalidation for the whole question set, not one per row
+            with batched_invalidation():
+                breaking_changes, graded_submissions_returned = (
+                    self._handle_question_updates_with_breaking_changes(
+                        instance, questions_data
+                    )
                 )
-            )
             # Recalculate total points after questions are updated
             instance.calculate_total_points()
 
+            # A corrected answer key rescores the auto-graded answers
+            if answer_key(instance.questions.all()) != previous_key:
+                regrade_test(instance)
+
             # Add breaking change info to the response
             instance.breaking_changes_detected = breaking_changes
             instance.graded_submissions_returned = graded_submissions_returned
 
+        if instance.status == "published":
+            refresh_test_snapshot(instance)
+
         return instance
 
     def _create_questions(self, test, questions_data):
@@ -330,9 +378,8 @@ class TestSerializer(serializers.ModelSerializer):
 
         if has_active_submissions:
             # Detect breaking changes
-            breaking_changes = self._detect_breaking_changes(
-                test, questions_data
-            )
+            diff = self._detect_breaking_changes(test, questions_data)
+            breaking_changes = diff["breaking"]
 
             if breaking_changes:
                 # Check if force flag is set in context
@@ -343,6 +390,11 @@ class TestSerializer(serializers.ModelSerializer):
                         "breaking_change": True,
                         "message": "This edit contains breaking changes.",
                         "impacted_submissions": impacted,
+                        "changes": {
+                            "added": len(diff["added"]),
+                            "deleted": diff["deleted"],
+                            "changed": diff["changed"],
+                        },
                         "detail": "Pass force=true to confirm and apply the changes.",
                     })
                 # force=True: return active submissions and update questions
@@ -350,106 +402,158 @@ class TestSerializer(serializers.ModelSerializer):
                     test, questions_data, active_submissions
                 )
             else:
-                # No breaking changes, use safe update
-                self._safe_update_questions(test, questions_data)
+                # No breaking changes, use safe update with the loaded state
+                self._safe_update_questions(test, questions_data, diff)
         else:
             # No active submissions, safe to update
             self._safe_update_questions(test, questions_data)
 
         return breaking_changes, active_submissions_returned
 
+    def _load_question_state(self, test):
+        """
+        Load the existing questions of a test, their options and which of
+        them have answers, in three queries.
+
+        Returns a dict with:
+            questions: Questions keyed by str(id)
+            options: Options per str(question id), keyed by str(option id)
+            answered: str ids of questions that have at least one answer
+        """
+        options: dict[str, dict[str, QuestionOption]] = {}
+        for option in QuestionOption.objects.filter(question__test=test):
+            options.setdefault(str(option.question_id), {})[
+                str(option.id)
+            ] = option
+
+        return {
+            "questions": {str(q.id): q for q in test.questions.all()},
+            "options": options,
+            "answered": {
+                str(question_id)
+                for question_id in Answer.objects.filter(question__test=test)
+                .order_by()
+                .values_list("question_id", flat=True)
+                .distinct()
+            },
+        }
+
     def _detect_breaking_changes(self, test, questions_data):
         """
-        Detect if the question changes constitute breaking changes.
+        Diff the incoming questions against the test.
         Breaking changes include:
         - New questions added
         - Question type changes
         - Question deletion
+        - max_points changes
+        - is_required turned on while a handed-in submission lacks an answer
         - Option changes for questions with answers
-        """
-        existing_questions = {str(q.id): q for q in test.questions.all()}
-        # Convert all incoming IDs to strings for consistent comparison
-        incoming_question_ids = {
-            str(q.get("id")) for q in questions_data if q.get("id") is not None
-        }
-
-        # Check for deleted questions (existing IDs not in incoming set)
-        deleted_questions = (
-            set(existing_questions.keys()) - incoming_question_ids
-        )
-        if deleted_questions:
-            return True
 
-        # Check for new questions (any incoming ID not in existing, or no ID at all)
-        for q in questions_data:
-            qid = q.get("id")
-            if qid and str(qid) not in existing_questions:
-                return True  # New question with client-generated UUID
-            if not qid:
-                return True  # New question with no ID
+        Runs a fixed number of grouped queries regardless of the number of
+        questions. Returns the state from `_load_question_state` plus:
+            breaking: True if any breaking change was found
+            added: Positions in questions_data of new questions
+            deleted: str ids of existing questions missing from the data
+            changed: {str question id: [reasons]} for edited questions
+        """
+        state = self._load_question_state(test)
+        existing_questions = state["questions"]
 
-        # Check for question type changes or option changes
-        for question_data in questions_data:
+        added = []
+        changed = {}
+        required_turned_on = []
+        for position, question_data in enumerate(questions_data):
             question_id = question_data.get("id")
-            question_id_str = str(question_id) if question_id is not None else None
-            if question_id_str and question_id_str in existing_questions:
-                existing_question = existing_questions[question_id_str]
-
-                # Check for question type change
-                if (
-                    question_data.get("question_type")
-                    != existing_question.question_type
+            question_id_str = str(question_id) if question_id else ""
+            # New question, with or without a client-generated UUID
+            if question_id_str not in existing_questions:
+                added.append(position)
+                continue
+
+            existing_question = existing_questions[question_id_str]
+            reasons = []
+
+            # Check for question type change
+            if question_data.get("question_type") != existing_question.question_type:
+                reasons.append("question_type")
+
+            # Check max_points change (with epsilon for float no-ops)
+            incoming_max_points = question_data.get("max_points")
+            if incoming_max_points is not None:
+                if abs(float(incoming_max_points) - float(existing_question.max_points)) > 0.001:
+                    reasons.append("max_points")
+
+            # is_required false→true is only breaking if an answer is missing,
+            # which is checked for all such questions at once below
+            if (
+                question_data.get("is_required") is True
+                and existing_question.is_required is False
+            ):
+                required_turned_on.append(question_id_str)
+
+            # Check for option changes in questions with answers
+            if question_id_str in state["answered"] and self._has_option_changes(
+                state["options"].get(question_id_str, {}),
+                question_data.get("options", []),
+            ):
+                reasons.append("options")
+
+            if reasons:
+                changed[question_id_str] = reasons
+
+        if required_turned_on:
+            # Breaking if any active submission has no answer OR an empty
+            # answer for the question
+            active_submission_ids = set(
+                Submission.objects.filter(
+                    test=test, status__in=["submitted", "graded"]
+                ).values_list("id", flat=True)
+            )
+            answered_by_question: dict[str, set[int]] = {}
+            for question_id, submission_id in (
+                Answer.objects.filter(
+                    question_id__in=required_turned_on,
+                    submission_id__in=active_submission_ids,
+                )
+                .exclude(
+                    models.Q(text_answer="")
+                    & models.Q(boolean_answer__isnull=True)
+                    & models.Q(date_answer__isnull=True)
+                    & models.Q(file_answer__isnull=True)
+                )
+                .values_list("question_id", "submission_id")
+            ):
+                answered_by_question.setdefault(str(question_id), set()).add(
+                    submission_id
+                )
+            for question_id in required_turned_on:
+                if active_submission_ids - answered_by_question.get(
+                    question_id, set()
                 ):
-                    return True
+                    changed.setdefault(question_id, []).append("is_required")
 
-                # Check max_points change (with epsilon for float no-ops)
-                incoming_max_points = question_data.get("max_points")
-                if incoming_max_points is not None:
-                    if abs(float(incoming_max_points) - float(existing_question.max_points)) > 0.001:
-                        return True
-
-                # Check is_required change false→true
-                incoming_required = question_data.get("is_required")
-                if (
-                    incoming_required is True
-                    and existing_question.is_required is False
-                ):
-                    # Breaking if any active submission has no answer OR an empty answer for this question
-                    active_submission_ids = set(
-                        Submission.objects.filter(
-                            test=test, status__in=["submitted", "graded"]
-                        ).values_list("id", flat=True)
-                    )
-                    answered_submission_ids = set(
-                        Answer.objects.filter(
-                            question=existing_question,
-                            submission_id__in=active_submission_ids,
-                        ).exclude(
-                            models.Q(text_answer="")
-                            & models.Q(boolean_answer__isnull=True)
-                            & models.Q(date_answer__isnull=True)
-                            & models.Q(file_answer__isnull=True)
-                        ).values_list("submission_id", flat=True)
-                    )
-                    has_unanswered = bool(active_submission_ids - answered_submission_ids)
-                    if has_unanswered:
-                        return True
-
-                # Check for option changes in questions with answers
-                if existing_question.answers.exists():
-                    options_data = question_data.get("options", [])
-                    if self._has_option_changes(
-                        existing_question, options_data
-                    ):
-                        return True
+        # Existing IDs not in the incoming set
+        incoming_question_ids = {
+            str(q["id"]) for q in questions_data if q.get("id")
+        }
+        deleted = [
+            question_id
+            for question_id in existing_questions
+            if question_id not in incoming_question_ids
+        ]
 
-        return False
+        return {
+            **state,
+            "breaking": bool(added or deleted or changed),
+            "added": added,
+            "deleted": deleted,
+            "changed": changed,
+        }
 
-    def _has_option_changes(self, question, options_data):
-        """Check if options have changed for a question."""
-        existing_options = {str(opt.id): opt for opt in question.options.all()}
+    def _has_option_changes(self, existing_options, options_data):
+        """Check if options have changed, given the existing options by str(id)."""
         incoming_option_ids = {
-            opt.get("id") for opt in options_data if opt.get("id")
+            str(opt["id"]) for opt in options_data if opt.get("id")
         }
 
         # Check for deleted options
@@ -463,8 +567,8 @@ class TestSerializer(serializers.ModelSerializer):
         # Check for text changes in existing options
         for option_data in options_data:
             option_id = option_data.get("id")
-            if option_id and option_id in existing_options:
-                existing_option = existing_options[option_id]
+            if option_id and str(option_id) in existing_options:
+                existing_option = existing_options[str(option_id)]
                 if option_data.get("text") != existing_option.text:
                     return True
 
@@ -480,6 +584,9 @@ class TestSerializer(serializers.ModelSerializer):
         3. Updating references
         """
         with transaction.atomic():
+            # Capture ids first: the queryset no longer matches once returned
+            returned_ids = list(active_submissions.values_list("id", flat=True))
+
             # Step 1: Return active submissions
             returned_count = self._return_active_submissions(
                 active_submissions
@@ -490,6 +597,12 @@ class TestSerializer(serializers.ModelSerializer):
                 test, questions_data
             )
 
+            # Step 3: Answers to removed questions are gone; resync scores
+            Submission.objects.filter(id__in=returned_ids).refresh_scores()
+
+            # Step 4: Students get the new question set as a new version
+            bump_definition_version(test)
+
             return returned_count
 
     def _return_active_submissions(self, active_submissions):
@@ -497,14 +610,16 @@ class TestSerializer(serializers.ModelSerializer):
         from apps.assessments.tasks import send_submission_returned_notification
         count = 0
         for submission in active_submissions:
-            submission.status = "returned"
             note = "Test has been updated. Please review and resubmit."
             if submission.feedback:
-                submission.feedback = f"{submission.feedback}\n\n[System] {note}"
+                feedback = f"{submission.feedback}\n\n[System] {note}"
             else:
-                submission.feedback = f"[System] {note}"
+                feedback = f"[System] {note}"
             # Preserve graded_by, graded_at — do NOT clear them
-            submission.save()
+            if not submission.transition(
+                ["submitted", "graded"], "returned", feedback=feedback
+            ):
+                continue
             try:
                 send_submission_returned_notification(submission.id)
             except Exception:
@@ -516,50 +631,54 @@ class TestSerializer(serializers.ModelSerializer):
         """
         Create new question instances and update all references to point to new instances.
         This preserves the data integrity while allowing breaking changes.
+
+        New questions and options are inserted with one bulk_create each, and
+        answers are remapped with one UPDATE per table, however large the test.
         """
-        # Store mapping of old question IDs to new question instances
+        # Map old question and option IDs (as str) to the new IDs
         question_mapping = {}
         option_mapping = {}
 
-        # Get the highest existing order value to avoid conflicts
-        # Get the highest existing order value to avoid conflicts
+        # Collect IDs of ALL existing questions to delete them after creating new ones
+        all_old_question_ids = list(test.questions.values_list("id", flat=True))
+
+        # Place new questions above both the existing orders and the final
+        # 0..n-1 range, so neither the inserts nor the final renumbering can
+        # collide with a row that is still present.
         # Use explicit None check (not `or -1`) because order=0 is a valid max
         _max_order_result = test.questions.aggregate(max_order=models.Max("order"))["max_order"]
         max_existing_order = _max_order_result if _max_order_result is not None else -1
+        base_order = max(max_existing_order + 1, len(questions_data))
 
-        # Collect IDs of ALL existing questions to delete them after creating new ones
-        all_old_question_ids = list(test.questions.values_list("id", flat=True))
-        new_question_ids = []
-
-        # Step 1: Create new questions and options
-        for order, question_data in enumerate(questions_data):
+        # Step 1: Create new questions and options (UUIDs are assigned on
+        # instantiation, so the mappings are known before the insert)
+        new_questions = []
+        new_options = []
+        for position, question_data in enumerate(questions_data):
             options_data = question_data.pop("options", [])
-            old_question_id = question_data.get("id")
-
-            # Create new question (remove old ID to let Django generate new one)
-            question_data.pop("id", None)
-            # Use order values that don't conflict with existing ones
-            new_order = max_existing_order + 1 + order
-            new_question = Question.objects.create(
-                test=test, order=new_order, **question_data
-            )
-            new_question_ids.append(new_question.id)
+            old_question_id = question_data.pop("id", None)
 
-            # Store mapping if this was an existing question
-            if old_question_id:
-                question_mapping[old_question_id] = new_question
-
-            # Create new options and store mappings
-            new_options = self._create_options_with_mapping(
-                new_question, options_data
+            new_question = Question(
+                test=test, order=base_order + position, **question_data
             )
+            new_questions.append(new_question)
             if old_question_id:
-                option_mapping[old_question_id] = new_options
+                question_mapping[str(old_question_id)] = new_question.id
+
+            for order, option_data in enumerate(options_data):
+                old_option_id = option_data.pop("id", None)
+                new_option = QuestionOption(
+                    question=new_question, order=order, **option_data
+                )
+                new_options.append(new_option)
+                if old_option_id:
+                    option_mapping[str(old_option_id)] = new_option.id
+
+        Question.objects.bulk_create(new_questions)
+        QuestionOption.objects.bulk_create(new_options)
 
         # Step 2: Update all references to point to new instances
-        self._update_references_to_new_instances(
-            test, question_mapping, option_mapping
-        )
+        self._update_references_to_new_instances(question_mapping, option_mapping)
 
         # Step 3: Clean up ALL old questions (not just mapped ones)
         self._cleanup_old_instances(test, all_old_question_ids)
@@ -567,49 +686,37 @@ class TestSerializer(serializers.ModelSerializer):
         # Step 4: Reorder questions to be sequential starting from 0
         self._reorder_questions_sequentially(test)
 
-    def _create_options_with_mapping(self, question, options_data):
-        """Create options and return mapping of old to new option IDs."""
-        option_mapping = {}
-
-        for order, option_data in enumerate(options_data):
-            old_option_id = option_data.get("id")
+    def _id_mapping_case(self, field, mapping):
+        """CASE expression translating `field` from old to new IDs."""
+        return models.Case(
+            *[
+                models.When(**{field: old_id}, then=models.Value(new_id))
+                for old_id, new_id in mapping.items()
+            ],
+            output_field=models.UUIDField(),
+        )
 
-            # Create new option (remove old ID to let Django generate new one)
-            option_data.pop("id", None)
-            new_option = QuestionOption.objects.create(
-                question=question, order=order, **option_data
+    def _update_references_to_new_instances(self, question_mapping, option_mapping):
+        """
+        Point answers and their selected options at the new instances, with
+        one UPDATE on answers and one on the selected options join table.
+        """
+        if question_mapping:
+            Answer.objects.filter(question_id__in=question_mapping).update(
+                question_id=self._id_mapping_case(
+                    "question_id", question_mapping
+                )
             )
 
-            # Store mapping if this was an existing option
-            if old_option_id:
-                option_mapping[old_option_id] = new_option
-
-        return option_mapping
-
-    def _update_references_to_new_instances(
-        self, test, question_mapping, option_mapping
-    ):
-        """Update all references from old instances to new instances."""
-        # Update Answer references
-        for old_question_id, new_question in question_mapping.items():
-            # Update question references in answers
-            Answer.objects.filter(question_id=old_question_id).update(
-                question=new_question
+        if option_mapping:
+            Answer.selected_options.through.objects.filter(
+                questionoption_id__in=option_mapping
+            ).update(
+                questionoption_id=self._id_mapping_case(
+                    "questionoption_id", option_mapping
+                )
             )
 
-            # Update option references in answers
-            if old_question_id in option_mapping:
-                old_to_new_options = option_mapping[old_question_id]
-                for old_option_id, new_option in old_to_new_options.items():
-                    # Update selected_options in answers
-                    answers = Answer.objects.filter(
-                        question=new_question,
-                        selected_options__id=old_option_id,
-                    )
-                    for answer in answers:
-                        answer.selected_options.remove(old_option_id)
-                        answer.selected_options.add(new_option)
-
     def _cleanup_old_instances(self, test, old_question_ids):
         """Clean up old question and option instances after references are updated."""
         # Delete old questions (this will cascade to old options)
@@ -617,13 +724,19 @@ class TestSerializer(serializers.ModelSerializer):
 
     def _reorder_questions_sequentially(self, test):
         """Reorder all questions in a test to be sequential starting from 0."""
-        questions = test.questions.all().order_by("order", "created_at")
+        questions = list(
+            test.questions.order_by("order", "created_at").only("id", "order")
+        )
         for index, question in enumerate(questions):
             question.order = index
-            question.save(update_fields=["order"])
+        Question.objects.bulk_update(questions, ["order"])
 
-    def _safe_update_questions(self, test, questions_data):
-        """Safely update questions, protecting existing answers from being deleted."""
+    def _safe_update_questions(self, test, questions_data, state=None):
+        """
+        Safely update questions, protecting existing answers from being deleted.
+        `state` is the result of `_load_question_state` (or the breaking
+        change diff) when the caller already has it.
+        """
         # Check if test has any submissions (any non-archived status)
         has_submissions = test.submissions.filter(
             status__in=["in_progress", "submitted", "graded", "returned"]
@@ -631,7 +744,9 @@ class TestSerializer(serializers.ModelSerializer):
 
         if has_submissions:
             # Use safe update strategy to preserve existing answers
-            self._update_questions_with_answer_protection(test, questions_data)
+            self._update_questions_with_answer_protection(
+                test, questions_data, state or self._load_question_state(test)
+            )
         else:
             # Use simple delete-and-recreate strategy for tests without submissions
             self._update_questions_simple(test, questions_data)
@@ -661,80 +776,81 @@ class TestSerializer(serializers.ModelSerializer):
             # Create options for this question
             self._create_options(question, options_data)
 
-    def _update_questions_with_answer_protection(self, test, questions_data):
+    def _update_questions_with_answer_protection(
+        self, test, questions_data, state
+    ):
         """Careful update strategy that protects existing student answers."""
         # For tests with submissions (both draft and published), use conservative update
         # Get IDs of questions that should remain
         incoming_question_ids = {
-            q.get("id") for q in questions_data if q.get("id") is not None
+            str(q["id"]) for q in questions_data if q.get("id") is not None
         }
 
         # Only delete questions that are not in the incoming data AND have no answers
-        questions_to_delete = test.questions.exclude(
-            id__in=incoming_question_ids
-        ).filter(answers__isnull=True)
-        questions_to_delete.delete()
+        questions_to_delete = [
+            question_id
+            for question_id in state["questions"]
+            if question_id not in incoming_question_ids
+            and question_id not in state["answered"]
+        ]
+        if questions_to_delete:
+            Question.objects.filter(id__in=questions_to_delete).delete()
 
         # Process each question in the order received
         for order, question_data in enumerate(questions_data):
             options_data = question_data.pop("options", [])
             question_id = question_data.get("id")
 
-            if question_id:
-                # Update existing question if it exists
-                try:
-                    question = test.questions.get(id=question_id)
-
-                    # B.3.4 — Clean up orphaned files if question type changes away from document_upload
-                    new_question_type = question_data.get("question_type")
-                    if (
-                        question.question_type == "document_upload"
-                        and new_question_type is not None
-                        and new_question_type != "document_upload"
-                    ):
-                        for answer in question.answers.all():
-                            if answer.file_answer:
-                                answer.file_answer.delete(save=False)
-                                answer.file_answer = None
-                                answer.save()
-
-                    # Only update safe fields
-                    safe_fields = [
-                        "title",
-                        "max_points",
-                        "description",
-                        "is_required",
-                        "min_word_count",
-                        "max_word_count",
-                        "text_max_length",
-                        "text_placeholder",
-                        "required_translation",
-                        "allow_multiple_verses",
-                        "max_file_size_mb",
-                        "allowed_file_types",
-                    ]
-                    for field in safe_fields:
-                        if field in question_data:
-                            setattr(question, field, question_data[field])
-                    question.order = order
-                    question.save()
-
-                    # Update options carefully
-                    self._update_options_safe(question, options_data)
-
-                except Question.DoesNotExist:
-                    # Create new question if ID doesn't exist
-                    question_data.pop("id", None)
-                    question = Question.objects.create(
-                        test=test, order=order, **question_data
-                    )
-                    self._create_options(question, options_data)
-            else:
-                # Create new question
+            question = (
+                state["questions"].get(str(question_id)) if question_id else None
+            )
+            if question is None:
+                # New question, or an ID that doesn't exist: create it
+                question_data.pop("id", None)
                 question = Question.objects.create(
                     test=test, order=order, **question_data
                 )
                 self._create_options(question, options_data)
+                continue
+
+            # B.3.4 — Clean up orphaned files if question type changes away from document_upload
+            new_question_type = question_data.get("question_type")
+            if (
+                question.question_type == "document_upload"
+                and new_question_type is not None
+                and new_question_type != "document_upload"
+            ):
+                for answer in question.answers.all():
+                    if answer.file_answer:
+                        answer.file_answer.delete(save=False)
+                        answer.file_answer = None
+                        answer.save()
+
+            # Only update safe fields
+            safe_fields = [
+                "title",
+                "max_points",
+                "description",
+                "is_required",
+                "min_word_count",
+                "max_word_count",
+                "text_max_length",
+                "text_placeholder",
+                "required_translation",
+                "allow_multiple_verses",
+                "max_file_size_mb",
+                "allowed_file_types",
+                "correct_boolean",
+                "partial_credit",
+            ]
+            for field in safe_fields:
+                if field in question_data:
+                    setattr(question, field, question_data[field])
+            question.order = order
+            question.save()
+
+            # Update options carefully
+            self._update_options_safe(question, options_data, state)
 
     def _create_options(self, question, options_data):
         """Create options for a question, preserving IDs if provided."""
@@ -759,14 +875,12 @@ class TestSerializer(serializers.ModelSerializer):
         # Create fresh options using the same logic as _create_options
         self._create_options(question, options_data)
 
-    def _update_options_safe(self, question, options_data):
+    def _update_options_safe(self, question, options_data, state):
         """Safely update options, only for questions that don't have critical answer dependencies."""
         # For questions that already have answers, be more conservative
-        if question.answers.exists():
+        if str(question.id) in state["answered"]:
             # Only allow text updates for existing options, don't delete/recreate
-            existing_options = {
-                str(opt.id): opt for opt in question.options.all()
-            }
+            existing_options = state["options"].get(str(question.id), {})
 
             for order, option_data in enumerate(options_data):
                 option_id = option_data.get("id")
@@ -775,6 +889,9 @@ class TestSerializer(serializers.ModelSerializer):
                     # Update existing option
                     option = existing_options[str(option_id)]
                     option.text = option_data.get("text", option.text)
+                    option.is_correct = option_data.get(
+                        "is_correct", option.is_correct
+                    )
                     option.order = order
                     option.save()
                 # Don't create new options for questions with existing answers
@@ -849,8 +966,10 @@ class AnswerSerializer(serializers.ModelSerializer):
             "file_answer",
             "selected_options",
             "answered_at",
+            "version",
             "is_flagged",
             "points_earned",
+            "is_auto_graded",
             "max_points",
             "feedback",
             "display_answer",
@@ -864,8 +983,12 @@ class AnswerSerializer(serializers.ModelSerializer):
     def get_question_options(self, obj):
         """Get question options for choice-based questions."""
         if obj.question.question_type in ["single_choice", "multiple_choice"]:
-            options = obj.question.options.all().order_by("order")
-            return QuestionOptionSerializer(options, many=True).data
+            # Options are ordered by Meta.ordering; re-ordering here would
+            # bypass the answers__question__options prefetch
+            options = obj.question.options.all()
+            return QuestionOptionSerializer(
+                options, many=True, context=self.context
+            ).data
         return []
 
     def to_representation(self, instance):
@@ -879,6 +1002,25 @@ class AnswerSerializer(serializers.ModelSerializer):
         return data
 
 
+class AnswerStateSerializer(serializers.ModelSerializer):
+    """Compact answer content returned to autosave clients on conflicts."""
+
+    class Meta:
+        model = Answer
+        fields = [
+            "id",
+            "question",
+            "version",
+            "text_answer",
+            "boolean_answer",
+            "date_answer",
+            "file_answer",
+            "selected_options",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class SubmissionSerializer(serializers.ModelSerializer):
     """Serializer for submissions with detailed answer information."""
 
@@ -910,13 +1052,18 @@ class SubmissionSerializer(serializers.ModelSerializer):
             "status",
             "started_at",
             "submitted_at",
+            "expires_at",
             "time_spent_minutes",
             "score",
             "max_score",
             "graded_by",
             "graded_at",
             "feedback",
+            "claimed_by",
+            "claimed_until",
             "grading_history",
+            "answered_count",
+            "graded_answer_count",
             "created_at",
             "updated_at",
             "answers",
@@ -932,12 +1079,104 @@ class SubmissionSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "student": {"read_only": True},
             "started_at": {"read_only": True},
+            "expires_at": {"read_only": True},
+            "claimed_by": {"read_only": True},
+            "claimed_until": {"read_only": True},
+            "answered_count": {"read_only": True},
+            "graded_answer_count": {"read_only": True},
             "created_at": {"read_only": True},
             "updated_at": {"read_only": True},
             "score": {"read_only": True},  # This is now a property
             "max_score": {"read_only": True},  # This is now a property
         }
 
+    def to_representation(self, instance):
+        """
+        Answers follow the attempt's question order on randomized tests.
+        Students only see the points of their answers once the results are
+        released; auto-graded points would otherwise give the key away.
+        """
+        data = super().to_representation(instance)
+        if not instance.results_released:
+            for answer in data["answers"]:
+                hide_answer_key(self, answer, ["points_earned", "is_auto_graded"])
+        test = instance.test
+        if test.randomize_questions:
+            data["answers"] = shuffle_questions(
+                data["answers"],
+                instance.id,
+                test.definition_version,
+                id_field="question",
+                options_field="question_options",
+            )
+        return data
+
+
+class SubmissionListSerializer(serializers.ModelSerializer):
+    """
+    Summary serializer for submission listings (no answers).
+
+    Expects the queryset to be annotated with
+    `Submission.objects.with_completion()`.
+    """
+
+    is_submitted = serializers.BooleanField(read_only=True)
+    is_resubmittable = serializers.BooleanField(read_only=True)
+    completion_percentage = serializers.SerializerMethodField()
+    student_name = serializers.CharField(
+        source="student.get_full_name", read_only=True
+    )
+    student_email = serializers.CharField(
+        source="student.email", read_only=True
+    )
+    test_title = serializers.CharField(source="test.title", read_only=True)
+    test_total_points = serializers.FloatField(
+        source="test.total_points", read_only=True
+    )
+    graded_by_name = serializers.CharField(
+        source="graded_by.get_full_name", read_only=True
+    )
+
+    class Meta:
+        model = Submission
+        fields = [
+            "id",
+            "test",
+            "student",
+            "attempt_number",
+            "status",
+            "started_at",
+            "submitted_at",
+            "expires_at",
+            "time_spent_minutes",
+            "score",
+            "max_score",
+            "graded_by",
+            "graded_at",
+            "feedback",
+            "claimed_by",
+            "claimed_until",
+            "answered_count",
+            "graded_answer_count",
+            "created_at",
+            "updated_at",
+            "is_submitted",
+            "is_resubmittable",
+            "completion_percentage",
+            "student_name",
+            "student_email",
+            "test_title",
+            "test_total_points",
+            "graded_by_name",
+        ]
+        read_only_fields = fields
+
+    def get_completion_percentage(self, obj):
+        """Same rule as Submission.completion_percentage, from annotations."""
+        if not obj.question_total:
+            return 100
+        return (obj.live_answered_count / obj.question_total) * 100
+
 
 class StudentTestSerializer(serializers.ModelSerializer):
     """Serializer for tests viewed by students with submission information"""
@@ -982,68 +1221,74 @@ class StudentTestSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
 
-    @extend_schema_field(SubmissionSerializer)
-    def get_my_submission(self, obj):
-        """Get student's latest submission for this test"""
+    def _get_my_submissions(self, obj):
+        """
+        Return the requesting student's submissions for this test, newest
+        first, or None without an authenticated request.
+
+        Uses the `my_submissions` prefetch set up by TestViewSet when present
+        so a whole page resolves in one query; otherwise queries once per
+        test and memoizes the result on the instance.
+        """
         request = self.context.get("request")
         if not request or not hasattr(request, "user"):
             return None
 
-        latest_submission = (
-            obj.submissions.filter(student=request.user)
-            .order_by("-created_at")
-            .first()
+        if not hasattr(obj, "my_submissions"):
+            obj.my_submissions = list(
+                obj.submissions.filter(student=request.user).order_by(
+                    "-created_at"
+                )
+            )
+        return obj.my_submissions
+
+    def _get_latest_submission(self, obj):
+        submissions = self._get_my_submissions(obj)
+        return submissions[0] if submissions else None
+
+    def _get_attempts_used(self, obj):
+        """Returned submissions don't count towards the attempt limit."""
+        return sum(
+            1
+            for submission in self._get_my_submissions(obj) or []
+            if submission.status != "returned"
         )
 
+    @extend_schema_field(SubmissionSerializer)
+    def get_my_submission(self, obj):
+        """Get student's latest submission for this test"""
+        latest_submission = self._get_latest_submission(obj)
         if latest_submission:
-            return SubmissionSerializer(latest_submission).data
+            return SubmissionSerializer(
+                latest_submission,
+                context={**self.context, "hide_answer_key": True},
+            ).data
         return None
 
     @extend_schema_field(serializers.IntegerField)
     def get_my_latest_submission_id(self, obj):
         """Get the ID of student's latest submission"""
-        request = self.context.get("request")
-        if not request or not hasattr(request, "user"):
-            return None
-
-        latest_submission = (
-            obj.submissions.filter(student=request.user)
-            .order_by("-created_at")
-            .first()
-        )
+        latest_submission = self._get_latest_submission(obj)
         return latest_submission.id if latest_submission else None
 
     @extend_schema_field(serializers.CharField)
     def get_my_submission_status(self, obj):
         """Get status of student's latest submission"""
-        request = self.context.get("request")
-        if not request or not hasattr(request, "user"):
-            return None
-
-        latest_submission = (
-            obj.submissions.filter(student=request.user)
-            .order_by("-created_at")
-            .first()
-        )
+        latest_submission = self._get_latest_submission(obj)
         return latest_submission.status if latest_submission else None
 
     @extend_schema_field(serializers.IntegerField)
     def get_attempts_remaining(self, obj):
         """Get number of attempts remaining for this student"""
-        request = self.context.get("request")
-        if not request or not hasattr(request, "user"):
+        if self._get_my_submissions(obj) is None:
             return obj.max_attempts
-
-        attempts_used = obj.submissions.filter(
-            student=request.user
-        ).exclude(status="returned").count()
-        return max(0, obj.max_attempts - attempts_used)
+        return max(0, obj.max_attempts - self._get_attempts_used(obj))
 
     @extend_schema_field(serializers.BooleanField)
     def get_can_attempt(self, obj):
         """Check if student can start a new attempt"""
-        request = self.context.get("request")
-        if not request or not hasattr(request, "user"):
+        submissions = self._get_my_submissions(obj)
+        if submissions is None:
             return False
 
         # Check if test is available
@@ -1051,35 +1296,44 @@ class StudentTestSerializer(serializers.ModelSerializer):
             return False
 
         # Check attempts remaining
-        attempts_used = obj.submissions.filter(
-            student=request.user
-        ).exclude(status="returned").count()
-        if attempts_used >= obj.max_attempts:
+        if self._get_attempts_used(obj) >= obj.max_attempts:
             return False
 
         # Check if there's an in-progress submission
-        in_progress = obj.submissions.filter(
-            student=request.user, status="in_progress"
-        ).exists()
-
-        return not in_progress
+        return not any(s.status == "in_progress" for s in submissions)
 
     @extend_schema_field(serializers.BooleanField)
     def get_can_resubmit(self, obj):
         """Check if the student has a returned submission they can reopen."""
-        request = self.context.get("request")
-        if not request or not hasattr(request, "user"):
-            return False
-        latest = obj.submissions.filter(
-            student=request.user
-        ).order_by("-created_at").first()
+        latest = self._get_latest_submission(obj)
         return latest is not None and latest.status == "returned"
 
 
 class StudentTestDetailSerializer(StudentTestSerializer):
     """Detailed serializer for individual test view by students, includes questions"""
 
-    questions = QuestionSerializer(many=True, read_only=True)
+    questions = serializers.SerializerMethodField()
+    total_questions = serializers.SerializerMethodField()
 
     class Meta(StudentTestSerializer.Meta):
-        fields = StudentTestSerializer.Meta.fields + ["questions"]
+        fields = StudentTestSerializer.Meta.fields + [
+            "definition_version",
+            "questions",
+        ]
+
+    @extend_schema_field(QuestionSerializer(many=True))
+    def get_questions(self, obj):
+        """
+        Questions come from the cached snapshot of the current version, in
+        the latest attempt's order when the test randomizes questions
+        """
+        questions = get_test_snapshot(obj)["questions"]
+        latest_submission = self._get_latest_submission(obj)
+        if obj.randomize_questions and latest_submission is not None:
+            return shuffle_questions(
+                questions, latest_submission.id, obj.definition_version
+            )
+        return questions
+
+    def get_total_questions(self, obj) -> int:
+        return len(get_test_snapshot(obj)["questions"])
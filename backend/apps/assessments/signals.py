@@ -2,13 +2,20 @@
 Django signals for test notifications.
 """
 
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
 from django.dispatch import receiver
 from django_q.tasks import async_task
 import logging
 
-from .models import Test, Submission, Answer
+from .models import Test, Question, QuestionOption, Submission, Answer
 from .tasks import schedule_deadline_reminder, cancel_deadline_reminder
+from .analytics import invalidate_test_statistics
+from .snapshots import defer_invalidation, invalidate_test_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -124,8 +131,19 @@ def handle_submission_saved(sender, instance, created, **kwargs):
     """
     Handle submission creation and status changes.
     Send notifications when submissions are created, graded, or returned.
+
+    Status notifications only fire for saves made by Submission.transition,
+    which sends post_save once per real status change; plain saves and
+    same-status re-saves (e.g. re-grades) stay silent.
     """
     try:
+        update_fields = kwargs.get("update_fields") or ()
+        if not created and (
+            "status" not in update_fields
+            or getattr(instance, "_previous_status", None) == instance.status
+        ):
+            return
+
         # New submission created
         if created:
             # Send notification to admins/lecturers
@@ -175,6 +193,75 @@ def handle_submission_saved(sender, instance, created, **kwargs):
         logger.error(f"Error in submission save signal handler: {str(e)}")
 
 
+@receiver(post_save, sender=Test)
+def invalidate_statistics_for_test(sender, instance, **kwargs):
+    """Drop cached test statistics when the test or its questions change."""
+    invalidate_test_statistics(instance.id)
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def invalidate_statistics_for_submission(sender, instance, **kwargs):
+    """Drop cached test statistics when a submission changes."""
+    invalidate_test_statistics(instance.test_id)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_statistics_for_answer(sender, instance, **kwargs):
+    """Drop cached test statistics when an answer changes."""
+    if Answer.submission.is_cached(instance):
+        test_id = instance.submission.test_id
+    else:
+        # Only the test id is needed: don't load the whole submission
+        test_id = (
+            Submission.objects.filter(pk=instance.submission_id)
+            .values_list("test_id", flat=True)
+            .order_by()
+            .first()
+        )
+    if test_id is not None:
+        invalidate_test_statistics(test_id)
+
+
+@receiver(m2m_changed, sender=Answer.selected_options.through)
+def sync_answered_for_options(sender, instance, action, reverse, **kwargs):
+    """
+    Keep Answer.is_answered in step with option selections made through the
+    related manager. The bulk autosave path maintains it itself.
+    """
+    if reverse or action not in ("post_add", "post_remove", "post_clear"):
+        return
+    instance.refresh_content_state()
+    Answer.objects.filter(pk=instance.pk).update(
+        is_answered=instance.is_answered
+    )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_snapshot_for_question(sender, instance, **kwargs):
+    """Drop the cached student snapshot and statistics when a question changes."""
+    if defer_invalidation(test_id=instance.test_id):
+        return
+    invalidate_test_snapshot(instance.test_id)
+    invalidate_test_statistics(instance.test_id)
+
+
+@receiver(post_save, sender=QuestionOption)
+@receiver(post_delete, sender=QuestionOption)
+def invalidate_snapshot_for_option(sender, instance, **kwargs):
+    """Drop the cached student snapshot and statistics when an option changes."""
+    if defer_invalidation(question_id=instance.question_id):
+        return
+    try:
+        invalidate_test_snapshot(instance.question.test_id)
+        invalidate_test_statistics(instance.question.test_id)
+    except Question.DoesNotExist:
+        # Cascade delete of the parent question; already invalidated
+        pass
+
+
 @receiver(pre_delete, sender=Submission)
 def cleanup_submission_files(sender, instance, **kwargs):
     """Delete physical files when a submission is deleted."""
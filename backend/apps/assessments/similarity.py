@@ -0,0 +1,210 @@
+"""
+Near-duplicate detection for long text answers.
+
+Each essay-type answer is reduced to word shingles and a MinHash signature
+when its submission is handed in. The signature is split into LSH bands and
+every band is stored as a bucket hash, so answers that share a bucket with
+an answer are its candidate near-duplicates. Finding the answers similar to
+a submission costs three queries and a comparison of signatures against the
+candidates only, never against every other answer to the question.
+"""
+
+import hashlib
+import re
+import uuid
+from typing import Any
+
+import numpy as np
+from django.db import transaction
+
+from .models import Answer, AnswerBucket, AnswerSignature
+
+SIMILARITY_TYPES = ["essay", "reflection", "ministry_plan", "sermon_outline"]
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 128
+# 32 bands of 4 rows: pairs around 0.4 Jaccard similarity and up become
+# candidates with even odds, pairs at 0.7 almost always do
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+DEFAULT_SIMILARITY_THRESHOLD = 0.5
+INDEX_BATCH_SIZE = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures must stay comparable across processes and deploys
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _MAX_HASH, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MAX_HASH, NUM_PERMUTATIONS, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text):
+    """Return the set of lowercase word SHINGLE_SIZE-grams of `text`."""
+    words = _WORD_RE.findall(text.lower())
+    return {
+        " ".join(words[i : i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _hash32(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=4).digest(), "little"
+    )
+
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_PERMUTATIONS uint32 values) of a shingle set."""
+    hashes = np.fromiter(
+        (_hash32(shingle) for shingle in shingle_set),
+        dtype=np.uint64,
+        count=len(shingle_set),
+    )
+    # Both factors are below 2**32, so the product cannot overflow uint64
+    permuted = np.outer(_PERM_A, hashes) % _MERSENNE_PRIME
+    permuted = (permuted + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """Return one signed 64-bit bucket hash per LSH band of a signature."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS : (band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8)
+        buckets.append(int.from_bytes(digest.digest(), "little", signed=True))
+    return buckets
+
+
+def index_submissions(submissions):
+    """
+    (Re)build the similarity index entries of the essay-type answers of
+    `submissions` (a Submission queryset). Answers too short to form a
+    shingle are left out.
+
+    Returns:
+        Number of answers indexed.
+    """
+    answers = Answer.objects.filter(
+        submission__in=submissions,
+        question__question_type__in=SIMILARITY_TYPES,
+    )
+
+    signatures: list[AnswerSignature] = []
+    buckets: list[AnswerBucket] = []
+    for answer_id, question_id, text in answers.values_list(
+        "id", "question_id", "text_answer"
+    ):
+        shingle_set = shingles(text)
+        if not shingle_set:
+            continue
+        signature = minhash(shingle_set)
+        signatures.append(
+            AnswerSignature(
+                answer_id=answer_id,
+                question_id=question_id,
+                signature=signature.tobytes(),
+            )
+        )
+        buckets.extend(
+            AnswerBucket(
+                answer_id=answer_id, question_id=question_id, bucket=bucket
+            )
+            for bucket in band_buckets(signature)
+        )
+
+    with transaction.atomic():
+        # A resubmission replaces the entries of the earlier hand-in
+        AnswerBucket.objects.filter(answer__in=answers).delete()
+        AnswerSignature.objects.filter(answer__in=answers).delete()
+        AnswerSignature.objects.bulk_create(
+            signatures, batch_size=INDEX_BATCH_SIZE
+        )
+        AnswerBucket.objects.bulk_create(buckets, batch_size=INDEX_BATCH_SIZE)
+    return len(signatures)
+
+
+def _unpack(signature):
+    return np.frombuffer(bytes(signature), dtype=np.uint32)
+
+
+def find_similar_answers(submission, threshold=DEFAULT_SIMILARITY_THRESHOLD):
+    """
+    Find answers by other students that are near-duplicates of the indexed
+    answers of `submission`.
+
+    Similarity is the MinHash estimate of the Jaccard similarity of the two
+    answers' shingle sets; only bucket candidates are compared.
+
+    Returns:
+        Dict of answer id to a list of matches (answer_id, submission_id,
+        student_id, student_name, similarity), most similar first. Every
+        indexed answer of the submission has an entry.
+    """
+    own = {
+        question_id: (answer_id, _unpack(signature))
+        for answer_id, question_id, signature in AnswerSignature.objects.filter(
+            answer__submission=submission
+        ).values_list("answer_id", "question_id", "signature")
+    }
+    matches: dict[int, list[dict[str, Any]]] = {
+        answer_id: [] for answer_id, _ in own.values()
+    }
+    if not own:
+        return matches
+
+    own_buckets = {
+        (question_id, bucket)
+        for question_id, bucket in AnswerBucket.objects.filter(
+            answer__submission=submission
+        ).values_list("question_id", "bucket")
+    }
+    candidate_ids = {
+        answer_id
+        for answer_id, question_id, bucket in AnswerBucket.objects.filter(
+            question_id__in=own,
+            bucket__in={bucket for _, bucket in own_buckets},
+        )
+        .exclude(answer__submission__student_id=submission.student_id)
+        .values_list("answer_id", "question_id", "bucket")
+        # Bucket hashes are not namespaced by question; check both
+        if (question_id, bucket) in own_buckets
+    }
+    if not candidate_ids:
+        return matches
+
+    candidates: dict[uuid.UUID, list[tuple]] = {}
+    signatures = AnswerSignature.objects.filter(answer_id__in=candidate_ids)
+    for row in signatures.values_list(
+        "question_id",
+        "signature",
+        "answer_id",
+        "answer__submission_id",
+        "answer__submission__student_id",
+        "answer__submission__student__first_name",
+        "answer__submission__student__last_name",
+    ):
+        candidates.setdefault(row[0], []).append(row)
+
+    for question_id, rows in candidates.items():
+        answer_id, signature = own[question_id]
+        stacked = np.stack([_unpack(row[1]) for row in rows])
+        similarity = (stacked == signature).mean(axis=1)
+        for row, score in zip(rows, similarity):
+            if score < threshold:
+                continue
+            _, _, other_id, submission_id, student_id, first_name, last_name = (
+                row
+            )
+            matches[answer_id].append(
+                {
+                    "answer_id": other_id,
+                    "submission_id": submission_id,
+                    "student_id": student_id,
+                    "student_name": f"{first_name} {last_name}".strip(),
+                    "similarity": round(float(score), 3),
+                }
+            )
+        matches[answer_id].sort(key=lambda match: -match["similarity"])
+    return matches
@@ -0,0 +1,135 @@
+"""
+Versioned snapshots of a test's question set as served to students.
+
+A snapshot is the serialized questions and options of a test at a given
+`Test.definition_version`. It is built once (on publish or update, or on
+the first cache miss) and then served from the cache to every student,
+keyed by test id and version. Changes that break existing answers bump the
+version; other edits rebuild the snapshot in place for the same version.
+
+Question and option signals invalidate the snapshot per row. Bulk edits
+run inside `batched_invalidation()`, which collects those invalidations and
+runs them once per test when the block exits.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .analytics import invalidate_test_statistics
+from .models import Question, Test
+
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def snapshot_cache_key(test_id, version):
+    return f"test_definition_{test_id}_v{version}"
+
+
+def build_test_snapshot(test):
+    """Serialize the current questions and options of a test, without the answer key."""
+    from .serializers import QuestionSerializer
+
+    questions = test.questions.prefetch_related("options")
+    return {
+        "version": test.definition_version,
+        "questions": QuestionSerializer(
+            questions, many=True, context={"hide_answer_key": True}
+        ).data,
+    }
+
+
+def get_test_snapshot(test):
+    """Return the snapshot for the test's current version, building on a miss."""
+    key = snapshot_cache_key(test.id, test.definition_version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = refresh_test_snapshot(test)
+    return snapshot
+
+
+def refresh_test_snapshot(test):
+    """Rebuild and cache the snapshot for the test's current version."""
+    snapshot = build_test_snapshot(test)
+    cache.set(
+        snapshot_cache_key(test.id, test.definition_version),
+        snapshot,
+        timeout=SNAPSHOT_CACHE_TIMEOUT,
+    )
+    return snapshot
+
+
+def invalidate_test_snapshot(test_id):
+    """Drop the cached snapshot of a test's current version."""
+    version = (
+        Test.objects.filter(id=test_id)
+        .values_list("definition_version", flat=True)
+        .first()
+    )
+    if version is not None:
+        cache.delete(snapshot_cache_key(test_id, version))
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_invalidation():
+    """
+    Invalidate each touched test once on exit instead of once per question
+    or option written inside the block. Nested blocks join the outer one.
+
+    Nothing is invalidated when the block raises: run it inside a
+    transaction so its writes roll back with it.
+    """
+    if getattr(_batch, "pending", None) is not None:
+        yield
+        return
+    _batch.pending = {"test_ids": set(), "question_ids": set()}
+    try:
+        yield
+    finally:
+        pending = _batch.pending
+        _batch.pending = None
+    test_ids = pending["test_ids"]
+    if pending["question_ids"]:
+        test_ids |= set(
+            Question.objects.filter(id__in=pending["question_ids"])
+            .values_list("test_id", flat=True)
+            .order_by()
+        )
+    for test_id in test_ids:
+        invalidate_test_snapshot(test_id)
+        invalidate_test_statistics(test_id)
+
+
+def defer_invalidation(test_id=None, question_id=None):
+    """
+    Record a test (or the test of a question) for invalidation when the
+    enclosing `batched_invalidation()` block exits.
+
+    Returns:
+        False if no block is active and the caller must invalidate now
+    """
+    pending = getattr(_batch, "pending", None)
+    if pending is None:
+        return False
+    if test_id is not None:
+        pending["test_ids"].add(test_id)
+    if question_id is not None:
+        pending["question_ids"].add(question_id)
+    return True
+
+
+def bump_definition_version(test):
+    """
+    Start a new definition version after a breaking change. Uses a queryset
+    update so no test signals (notifications) fire.
+    """
+    Test.objects.filter(id=test.id).update(
+        definition_version=F("definition_version") + 1
+    )
+    test.refresh_from_db(fields=["definition_version"])
+    return test.definition_version
@@ -3,14 +3,18 @@ Django Q tasks for assessment notifications.
 """
 
 import datetime
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from django.conf import settings
-from django_q.tasks import schedule
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django_q.tasks import async_task, schedule
 from django.utils import timezone
 import logging
 
 from .models import Test, Submission
+from .analytics import invalidate_test_statistics
+from .grading import auto_grade
+from .similarity import index_submissions
+from apps.notifications.outbox import queue_emails
 from apps.users.models import User
 
 logger = logging.getLogger(__name__)
@@ -94,25 +98,25 @@ def send_test_notification_email(test_id, notification_type, user_ids=None):
             notification_type, "emails/test_notification.txt"
         )
 
-        # Generate email content
-        html_message = render_to_string(html_template, context)
-        plain_message = render_to_string(text_template, context)
-
-        # Send to each recipient
-        recipient_emails = [user.email for user in recipients if user.email]
+        recipient_emails = [
+            email for email in recipients.values_list("email", flat=True) if email
+        ]
 
         if recipient_emails:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipient_emails,
-                html_message=html_message,
-                fail_silently=False,
+            # The content is the same for every recipient: render it once and
+            # queue one message per recipient for the outbox worker
+            html_message = render_to_string(html_template, context)
+            plain_message = render_to_string(text_template, context)
+            queue_emails(
+                recipient_emails,
+                subject,
+                plain_message,
+                html_body=html_message,
+                template=html_template.removesuffix(".html"),
             )
 
             logger.info(
-                f"Sent {notification_type} notification for test {test_id} to {len(recipient_emails)} recipients"
+                f"Queued {notification_type} notification for test {test_id} to {len(recipient_emails)} recipients"
             )
         else:
             logger.warning(
@@ -165,19 +169,18 @@ def send_submission_returned_notification(submission_id):
         html_message = render_to_string(html_template, context)
         plain_message = render_to_string(text_template, context)
 
-        # Send to student
+        # Queue for the student; delivery happens outside the request
         if submission.student.email:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[submission.student.email],
-                html_message=html_message,
-                fail_silently=False,
+            queue_emails(
+                [submission.student.email],
+                subject,
+                plain_message,
+                html_body=html_message,
+                template="emails/submission_returned",
             )
 
             logger.info(
-                f"Sent submission returned notification for submission {submission_id} to {submission.student.email}"
+                f"Queued submission returned notification for submission {submission_id} to {submission.student.email}"
             )
         else:
             logger.warning(
@@ -192,45 +195,63 @@ def send_submission_returned_notification(submission_id):
         )
 
 
-def auto_submit_expired_tests():
+def auto_submit_expired_tests(chunk_size=200):
     """
-    Find all in-progress submissions whose time limit has expired and auto-submit them.
-    Should be run every 5 minutes via Django Q scheduled task.
+    Auto-submit every in-progress submission whose expires_at has passed.
+
+    Expired rows are found through the (status, expires_at) index, flipped
+    to submitted with one UPDATE, and the student notifications are handed
+    to the task queue in batches of `chunk_size`. Runs every minute via a
+    Django Q scheduled task.
     """
     now = timezone.now()
 
-    # Find submissions where: in_progress AND test has time_limit
-    expired_candidates = Submission.objects.filter(
-        status="in_progress",
-        test__time_limit_minutes__isnull=False,
-    ).select_related("test", "student")
-
-    auto_submitted_ids = []
-    for submission in expired_candidates:
-        limit_seconds = submission.test.time_limit_minutes * 60
-        elapsed = (now - submission.started_at).total_seconds()
-        if elapsed >= limit_seconds:
-            submission.status = "submitted"
-            submission.submitted_at = now
-            submission.time_spent_minutes = submission.test.time_limit_minutes  # capped
-            submission.save()
-            auto_submitted_ids.append(submission.id)
-            logger.info(
-                f"Auto-submitted submission {submission.id} for student {submission.student.id} "
-                f"(elapsed {elapsed:.0f}s >= limit {limit_seconds}s)"
-            )
-
-    # Send notifications for auto-submitted submissions
-    if auto_submitted_ids:
-        from apps.notifications.tasks import send_submission_auto_submitted_notification
-        for submission_id in auto_submitted_ids:
-            try:
-                send_submission_auto_submitted_notification(submission_id)
-            except Exception as e:
-                logger.error(f"Failed to send auto-submit notification for {submission_id}: {e}")
+    with transaction.atomic():
+        expired = list(
+            Submission.objects.select_for_update()
+            .filter(status="in_progress", expires_at__lte=now)
+            .values_list("id", "test_id", "started_at", "expires_at")
+        )
+        if not expired:
+            return "Auto-submitted 0 expired submissions"
+
+        # Time spent is capped at the deadline; group ids by minutes so the
+        # whole batch is still a single UPDATE
+        ids_by_minutes: dict[int, list[int]] = {}
+        for submission_id, _, started_at, expires_at in expired:
+            minutes = max(int((expires_at - started_at).total_seconds() // 60), 0)
+            ids_by_minutes.setdefault(minutes, []).append(submission_id)
+
+        submission_ids = [row[0] for row in expired]
+        Submission.objects.filter(id__in=submission_ids).transition(
+            "in_progress",
+            "submitted",
+            submitted_at=now,
+            time_spent_minutes=Case(
+                *[
+                    When(id__in=ids, then=Value(minutes))
+                    for minutes, ids in ids_by_minutes.items()
+                ],
+                output_field=IntegerField(),
+            ),
+            updated_at=now,
+        )
+        auto_grade(Submission.objects.filter(id__in=submission_ids))
+        index_submissions(Submission.objects.filter(id__in=submission_ids))
+        Submission.objects.filter(id__in=submission_ids).refresh_scores()
+
+    # Bulk updates bypass the post_save statistics invalidation
+    for test_id in {row[1] for row in expired}:
+        invalidate_test_statistics(test_id)
+
+    for i in range(0, len(submission_ids), chunk_size):
+        async_task(
+            "apps.notifications.tasks.send_submission_auto_submitted_notifications",
+            submission_ids[i : i + chunk_size],
+        )
 
-    logger.info(f"Auto-submitted {len(auto_submitted_ids)} expired submissions")
-    return f"Auto-submitted {len(auto_submitted_ids)} expired submissions"
+    logger.info(f"Auto-submitted {len(submission_ids)} expired submissions")
+    return f"Auto-submitted {len(submission_ids)} expired submissions"
 
 
 def schedule_deadline_reminder(test_id):
@@ -297,23 +318,11 @@ def cancel_deadline_reminder(test_id):
         logger.error(f"Error cancelling deadline reminder: {str(e)}")
 
 
-def send_bulk_test_notification(test_id, notification_type, chunk_size=50):
-    """
-    Send notifications in chunks to avoid overwhelming the email server.
+def send_bulk_test_notification(test_id, notification_type):
     """
-    try:
-        test = Test.objects.get(id=test_id)
-        # Get students enrolled in the cohort through the Enrollment model
-        recipients = User.objects.filter(
-            enrollments__cohort=test.cohort, role="student", is_active=True
-        )
+    Notify every active student of the test's cohort by email.
 
-        # Process in chunks
-        recipient_ids = list(recipients.values_list("id", flat=True))
-
-        for i in range(0, len(recipient_ids), chunk_size):
-            chunk = recipient_ids[i : i + chunk_size]
-            send_test_notification_email(test_id, notification_type, chunk)
-
-    except Exception as e:
-        logger.error(f"Error in bulk notification: {str(e)}")
+    The message is rendered once and queued per recipient; the outbox worker
+    sends it in batches over a single mail connection.
+    """
+    send_test_notification_email(test_id, notification_type)
@@ -0,0 +1,527 @@
+"""
+Query-budget tests for assessment endpoints.
+These pin endpoints at a constant number of queries regardless of page size.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from datetime import timedelta
+
+from apps.assessments.models import (
+    Test,
+    Question,
+    QuestionOption,
+    Submission,
+    Answer,
+)
+from apps.courses.models import Course
+from apps.cohorts.models import Cohort, Enrollment
+
+User = get_user_model()
+
+
+class MyTestsQueryCountTestCase(APITestCase):
+    """The student my-tests listing must not issue per-test queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+        self.student = User.objects.create_user(
+            email="student@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Student",
+            role="student",
+        )
+        self.lecturer = User.objects.create_user(
+            email="lecturer@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Lecturer",
+            role="lecturer",
+        )
+        self.course = Course.objects.create(
+            name="Course",
+            program_type="certificate",
+            module_count=5,
+            description="Test course",
+            lecturer=self.lecturer,
+            is_active=True,
+        )
+        self.cohort = Cohort.objects.create(
+            name="Cohort",
+            program_type="certificate",
+            start_date=self.now.date(),
+            end_date=(self.now + timedelta(days=30)).date(),
+            is_active=True,
+        )
+        Enrollment.objects.create(student=self.student, cohort=self.cohort)
+        self.test_count = 0
+
+    def _create_tests(self, count):
+        """Create published tests, each with a graded and a returned attempt."""
+        for _ in range(count):
+            self.test_count += 1
+            test = Test.objects.create(
+                title=f"Test {self.test_count}",
+                course=self.course,
+                cohort=self.cohort,
+                created_by=self.lecturer,
+                status="published",
+                max_attempts=3,
+            )
+            question = Question.objects.create(
+                test=test, question_type="text", title="Q", order=0
+            )
+            choice = Question.objects.create(
+                test=test, question_type="single_choice", title="C", order=1
+            )
+            option = QuestionOption.objects.create(
+                question=choice, text="A", order=0, is_correct=True
+            )
+            QuestionOption.objects.create(question=choice, text="B", order=1)
+            for attempt, sub_status in enumerate(["returned", "graded"], 1):
+                submission = Submission.objects.create(
+                    test=test,
+                    student=self.student,
+                    attempt_number=attempt,
+                    status=sub_status,
+                    graded_by=self.lecturer,
+                )
+                Answer.objects.create(
+                    submission=submission, question=question, text_answer="A"
+                )
+                Answer.objects.create(
+                    submission=submission, question=choice
+                ).selected_options.set([option])
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/tests/my-tests/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx), response
+
+    def test_my_tests_query_count_is_constant(self):
+        """Query count is the same for 3 and 15 tests on the page."""
+        self.client.force_authenticate(user=self.student)
+
+        self._create_tests(3)
+        small_count, response = self._count_queries()
+        self.assertEqual(len(response.data["results"]), 3)
+
+        self._create_tests(12)
+        large_count, response = self._count_queries()
+        self.assertEqual(len(response.data["results"]), 15)
+
+        self.assertEqual(
+            small_count,
+            large_count,
+            f"my-tests issued {small_count} queries for 3 tests "
+            f"but {large_count} for 15",
+        )
+        self.assertLess(large_count, 15)
+
+    def test_my_tests_submission_fields(self):
+        """Per-student fields still resolve correctly from the prefetch."""
+        self.client.force_authenticate(user=self.student)
+        self._create_tests(1)
+
+        _, response = self._count_queries()
+        data = response.data["results"][0]
+        latest = Submission.objects.filter(student=self.student).latest(
+            "created_at"
+        )
+        self.assertEqual(data["my_latest_submission_id"], latest.id)
+        self.assertEqual(data["my_submission_status"], "graded")
+        self.assertEqual(data["my_submission"]["id"], latest.id)
+        choice = next(
+            answer
+            for answer in data["my_submission"]["answers"]
+            if answer["question_type"] == "single_choice"
+        )
+        self.assertEqual(
+            [option["text"] for option in choice["question_options"]],
+            ["A", "B"],
+        )
+        self.assertNotIn("is_correct", choice["question_options"][0])
+        # The returned attempt does not count towards the limit
+        self.assertEqual(data["attempts_remaining"], 2)
+        self.assertTrue(data["can_attempt"])
+        self.assertFalse(data["can_resubmit"])
+
+
+class UpsertAnswersQueryCountTestCase(APITestCase):
+    """Autosave writes must not scale with the number of answers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+        self.student = User.objects.create_user(
+            email="student@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Student",
+            role="student",
+        )
+        lecturer = User.objects.create_user(
+            email="lecturer@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Lecturer",
+            role="lecturer",
+        )
+        course = Course.objects.create(
+            name="Course",
+            program_type="certificate",
+            module_count=5,
+            description="Test course",
+            is_active=True,
+        )
+        cohort = Cohort.objects.create(
+            name="Cohort",
+            program_type="certificate",
+            start_date=self.now.date(),
+            end_date=(self.now + timedelta(days=30)).date(),
+            is_active=True,
+        )
+        Enrollment.objects.create(student=self.student, cohort=cohort)
+        self.test = Test.objects.create(
+            title="Autosave",
+            course=course,
+            cohort=cohort,
+            created_by=lecturer,
+            status="published",
+        )
+        self.submission = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        self.client.force_authenticate(user=self.student)
+
+    def _autosave_queries(self, question_count, text):
+        for order in range(self.test.questions.count(), question_count):
+            Question.objects.create(
+                test=self.test, question_type="essay", title="Q", order=order
+            )
+        payload = [
+            {"question": str(q.id), "text_answer": text}
+            for q in self.test.questions.all()
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                f"/api/submissions/{self.submission.id}/answers/",
+                {"answers": payload},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx)
+
+    def test_upsert_query_count_is_constant(self):
+        """Creating or updating 3 or 30 answers costs the same queries."""
+        small_create = self._autosave_queries(3, "one")
+        small_update = self._autosave_queries(3, "two")
+        Answer.objects.all().delete()
+        large_create = self._autosave_queries(30, "one")
+        large_update = self._autosave_queries(30, "two")
+
+        self.assertEqual(small_create, large_create)
+        self.assertEqual(small_update, large_update)
+
+
+class SubmissionListQueryCountTestCase(APITestCase):
+    """The grading queue must not load answers per submission."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+        self.lecturer = User.objects.create_user(
+            email="lecturer@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Lecturer",
+            role="lecturer",
+        )
+        course = Course.objects.create(
+            name="Course",
+            program_type="certificate",
+            module_count=5,
+            description="Test course",
+            lecturer=self.lecturer,
+            is_active=True,
+        )
+        self.cohort = Cohort.objects.create(
+            name="Cohort",
+            program_type="certificate",
+            start_date=self.now.date(),
+            end_date=(self.now + timedelta(days=30)).date(),
+            is_active=True,
+        )
+        self.test = Test.objects.create(
+            title="Queue",
+            course=course,
+            cohort=self.cohort,
+            created_by=self.lecturer,
+            status="published",
+        )
+        self.questions = [
+            Question.objects.create(
+                test=self.test,
+                question_type="single_choice",
+                title="Q",
+                order=i,
+            )
+            for i in range(2)
+        ]
+        self.options = {
+            q.id: [
+                QuestionOption.objects.create(question=q, text=t, order=i)
+                for i, t in enumerate("AB")
+            ]
+            for q in self.questions
+        }
+        self.student_count = 0
+        self.client.force_authenticate(user=self.lecturer)
+
+    def _create_submissions(self, count):
+        for _ in range(count):
+            self.student_count += 1
+            student = User.objects.create_user(
+                email=f"s{self.student_count}@example.com",
+                password="testpassword123",
+                first_name="S",
+                last_name=str(self.student_count),
+                role="student",
+            )
+            submission = Submission.objects.create(
+                test=self.test,
+                student=student,
+                attempt_number=1,
+                status="submitted",
+            )
+            # Answer only the first question
+            answer = Answer.objects.create(
+                submission=submission, question=self.questions[0]
+            )
+            answer.selected_options.add(self.options[self.questions[0].id][0])
+        return submission
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return ctx, response
+
+    def test_list_query_count_is_constant(self):
+        """3 and 15 submissions cost the same, and answers are not loaded."""
+        self._create_submissions(3)
+        small, response = self._get("/api/submissions/")
+        self.assertEqual(len(response.data["results"]), 3)
+
+        self._create_submissions(12)
+        large, response = self._get("/api/submissions/")
+        self.assertEqual(len(response.data["results"]), 15)
+
+        self.assertEqual(len(small), len(large))
+        row = response.data["results"][0]
+        self.assertNotIn("answers", row)
+        self.assertEqual(row["completion_percentage"], 50)
+
+    def test_detail_options_come_from_prefetch(self):
+        """Question options do not cost a query per answer."""
+        submission = self._create_submissions(1)
+        url = f"/api/submissions/{submission.id}/"
+        one_answer, _ = self._get(url)
+
+        answer = Answer.objects.create(
+            submission=submission, question=self.questions[1]
+        )
+        answer.selected_options.add(self.options[self.questions[1].id][1])
+        two_answers, response = self._get(url)
+
+        self.assertEqual(len(one_answer), len(two_answers))
+        self.assertEqual(
+            [
+                o["text"]
+                for o in response.data["answers"][1]["question_options"]
+            ],
+            ["A", "B"],
+        )
+
+
+class LiveChoiceTestMixin:
+    """A published test with two hand-ins, one of which answers everything."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.lecturer = User.objects.create_user(
+            email="lecturer@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Lecturer",
+            role="lecturer",
+        )
+        self.student = User.objects.create_user(
+            email="student@example.com",
+            password="testpassword123",
+            first_name="Test",
+            last_name="Student",
+            role="student",
+        )
+        course = Course.objects.create(
+            name="Course",
+            program_type="certificate",
+            module_count=5,
+            description="Test course",
+            is_active=True,
+        )
+        cohort = Cohort.objects.create(
+            name="Cohort",
+            program_type="certificate",
+            start_date=self.now.date(),
+            end_date=(self.now + timedelta(days=30)).date(),
+            is_active=True,
+        )
+        self.test = Test.objects.create(
+            title="Live",
+            course=course,
+            cohort=cohort,
+            created_by=self.lecturer,
+            status="published",
+        )
+        self.submission = Submission.objects.create(
+            test=self.test,
+            student=self.student,
+            attempt_number=1,
+            status="submitted",
+        )
+        # A second hand-in that answered nothing
+        Submission.objects.create(
+            test=self.test,
+            student=self.lecturer,
+            attempt_number=1,
+            status="submitted",
+        )
+
+    def _add_questions(self, count):
+        for _ in range(count):
+            order = self.test.questions.count()
+            question = Question.objects.create(
+                test=self.test,
+                question_type="single_choice",
+                title=f"Q{order}",
+                order=order,
+                is_required=False,
+            )
+            option = QuestionOption.objects.create(
+                question=question, text="A", order=0
+            )
+            QuestionOption.objects.create(question=question, text="B", order=1)
+            answer = Answer.objects.create(
+                submission=self.submission, question=question
+            )
+            answer.selected_options.add(option)
+
+
+class BreakingChangeDetectionQueryCountTestCase(
+    LiveChoiceTestMixin, APITestCase
+):
+    """Breaking-change detection must not issue per-question queries."""
+
+    def _detect(self):
+        from apps.assessments.serializers import TestSerializer
+
+        # Every question turns required and renames its first option
+        questions_data = [
+            {
+                "id": q.id,
+                "question_type": q.question_type,
+                "max_points": q.max_points,
+                "is_required": True,
+                "options": [
+                    {"id": str(o.id), "text": f"{o.text}!"}
+                    for o in q.options.all()
+                ],
+            }
+            for q in self.test.questions.all()
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            diff = TestSerializer()._detect_breaking_changes(
+                self.test, questions_data
+            )
+        return len(ctx), diff
+
+    def test_detection_query_count_is_constant(self):
+        """5 and 50 edited questions cost the same queries."""
+        self._add_questions(5)
+        small, diff = self._detect()
+        self.assertEqual(len(diff["changed"]), 5)
+
+        self._add_questions(45)
+        large, diff = self._detect()
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 5)
+
+        reasons = next(iter(diff["changed"].values()))
+        self.assertEqual(reasons, ["options", "is_required"])
+        self.assertTrue(diff["breaking"])
+        self.assertEqual(diff["added"], [])
+        self.assertEqual(diff["deleted"], [])
+
+
+class BreakingChangeRemapQueryCountTestCase(LiveChoiceTestMixin, APITestCase):
+    """Replacing questions writes in bulk, however many questions exist."""
+
+    def _remap(self):
+        from apps.assessments.serializers import TestSerializer
+
+        questions_data = [
+            {
+                "id": q.id,
+                "question_type": q.question_type,
+                "title": f"{q.title}*",
+                "options": [
+                    {"id": o.id, "text": o.text} for o in q.options.all()
+                ],
+            }
+            for q in self.test.questions.all()
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            TestSerializer()._create_new_questions_and_update_references(
+                self.test, questions_data
+            )
+        writes = [
+            q["sql"].split()[0]
+            for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE"))
+        ]
+        return writes
+
+    def test_remap_writes_are_constant(self):
+        """One INSERT per model and one UPDATE per remapped table."""
+        self._add_questions(5)
+        small = self._remap()
+        self._add_questions(25)
+        large = self._remap()
+
+        self.assertEqual(small, large)
+        self.assertEqual(large.count("INSERT"), 2)
+        self.assertEqual(large.count("UPDATE"), 3)
+
+    def test_answers_follow_new_questions_and_options(self):
+        self._add_questions(3)
+        self._remap()
+
+        questions = list(self.test.questions.order_by("order"))
+        self.assertEqual([q.order for q in questions], [0, 1, 2])
+        self.assertTrue(all(q.title.endswith("*") for q in questions))
+        answers = Answer.objects.filter(submission=self.submission)
+        self.assertEqual(answers.count(), 3)
+        for answer in answers.prefetch_related("selected_options"):
+            self.assertIn(answer.question, questions)
+            self.assertEqual(
+                [o.question_id for o in answer.selected_options.all()],
+                [answer.question_id],
+            )
@@ -1,11 +1,20 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from datetime import timedelta
 from unittest.mock import patch
 
-from apps.assessments.models import Test, Question, Submission, Answer
+from apps.assessments.models import (
+    Test,
+    Question,
+    QuestionOption,
+    Submission,
+    Answer,
+)
 from apps.courses.models import Course
 from apps.cohorts.models import Cohort, Enrollment
 
@@ -730,16 +739,23 @@ class ResubmissionFlowTestCase(APITestCase):
             attempt_number=1,
         )
         # Simulate started 20 minutes ago
+        started_at = self.now - timedelta(minutes=20)
         Submission.objects.filter(id=sub.id).update(
-            started_at=self.now - timedelta(minutes=20)
+            started_at=started_at,
+            expires_at=self.test.expiry_for(started_at),
         )
 
-        with patch("apps.notifications.tasks.send_submission_auto_submitted_notification"):
+        with patch("apps.assessments.tasks.async_task") as mock_async:
             result = auto_submit_expired_tests()
 
         sub.refresh_from_db()
         self.assertEqual(sub.status, "submitted")
+        self.assertEqual(sub.time_spent_minutes, 10)
         self.assertIn("1", result)
+        mock_async.assert_called_once_with(
+            "apps.notifications.tasks.send_submission_auto_submitted_notifications",
+            [sub.id],
+        )
 
     def test_file_not_clobbered_by_upsert(self):
         """Upsert text answer must not clear file_answer."""
@@ -903,8 +919,11 @@ class PhaseBConcurrencyTestCase(APITestCase):
     def test_upsert_with_stale_updated_at_returns_409(self):
         """Client sends old updated_at, gets 409 with current_submission."""
         sub = self._make_submission()
-        # Advance updated_at by simulating a save after the client's snapshot
-        stale_ts = (sub.updated_at - timedelta(seconds=10)).isoformat()
+        answer = Answer.objects.create(
+            submission=sub, question=self.question, text_answer="elsewhere"
+        )
+        # The answer was saved after the client's snapshot
+        stale_ts = (answer.updated_at - timedelta(seconds=10)).isoformat()
         self.client.force_authenticate(user=self.student)
         response = self.client.post(
             f"/api/submissions/{sub.id}/answers/",
@@ -917,6 +936,53 @@ class PhaseBConcurrencyTestCase(APITestCase):
         self.assertEqual(response.status_code, 409)
         self.assertTrue(response.data.get("conflict"))
         self.assertIn("current_submission", response.data)
+        self.assertEqual(
+            response.data["conflicting_questions"], [str(self.question.id)]
+        )
+        answer.refresh_from_db()
+        self.assertEqual(answer.text_answer, "elsewhere")
+
+    def test_upsert_conflict_is_per_answer(self):
+        """Answers untouched since the snapshot are still saved."""
+        sub = self._make_submission()
+        other = Question.objects.create(
+            test=self.test, question_type="text", title="Q2", order=1
+        )
+        snapshot = timezone.now().isoformat()
+        Answer.objects.create(
+            submission=sub, question=self.question, text_answer="elsewhere"
+        )
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(
+            f"/api/submissions/{sub.id}/answers/",
+            {
+                "answers": [
+                    {"question": str(self.question.id), "text_answer": "mine"},
+                    {"question": str(other.id), "text_answer": "fresh"},
+                ],
+                "client_updated_at": snapshot,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            sub.answers.get(question=self.question).text_answer, "elsewhere"
+        )
+        self.assertEqual(sub.answers.get(question=other).text_answer, "fresh")
+
+    def test_upsert_snapshot_from_response_does_not_conflict(self):
+        """The updated_at returned by a save is a valid next snapshot."""
+        sub = self._make_submission()
+        self.client.force_authenticate(user=self.student)
+        url = f"/api/submissions/{sub.id}/answers/"
+        payload = {"answers": [{"question": str(self.question.id), "text_answer": "a"}]}
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        payload["answers"][0]["text_answer"] = "b"
+        payload["client_updated_at"] = response.data["updated_at"]
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, 200)
 
     def test_upsert_without_client_updated_at_succeeds(self):
         """No client_updated_at = last-write-wins; always succeeds."""
@@ -1342,3 +1408,2272 @@ class PhaseBValidationTestCase(APITestCase):
         }
         response = self.client.post("/api/tests/", test_data, format="json")
         self.assertIn(response.status_code, [400, 422])
+
+
+class AssessmentFixtureMixin:
+    """Shared users, cohort and published test for the grading test cases."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+
+        self.student = User.objects.create_user(
+            email="fx_student@example.com",
+            password="testpassword123",
+            first_name="FX",
+            last_name="Student",
+            role="student",
+        )
+        self.lecturer = User.objects.create_user(
+            email="fx_lecturer@example.com",
+            password="testpassword123",
+            first_name="FX",
+            last_name="Lecturer",
+            role="lecturer",
+        )
+        self.course = Course.objects.create(
+            name="FX Course",
+            program_type="certificate",
+            module_count=5,
+            description="desc",
+            is_active=True,
+        )
+        self.cohort = Cohort.objects.create(
+            name="FX Cohort",
+            program_type="certificate",
+            start_date=self.now.date(),
+            end_date=(self.now + timedelta(days=30)).date(),
+            is_active=True,
+        )
+        Enrollment.objects.create(student=self.student, cohort=self.cohort)
+
+        self.test = Test.objects.create(
+            title="FX Test",
+            course=self.course,
+            cohort=self.cohort,
+            created_by=self.lecturer,
+            status="published",
+            available_from=self.now - timedelta(hours=1),
+            available_until=self.now + timedelta(hours=2),
+            max_attempts=3,
+        )
+        self.question = Question.objects.create(
+            test=self.test,
+            question_type="text",
+            title="Q1",
+            order=0,
+            max_points=10,
+        )
+        self.question2 = Question.objects.create(
+            test=self.test,
+            question_type="essay",
+            title="Q2",
+            order=1,
+            max_points=5,
+        )
+        self.test.calculate_total_points()
+
+    def _make_student(self, index):
+        student = User.objects.create_user(
+            email=f"fx_student{index}@example.com",
+            password="testpassword123",
+            first_name="FX",
+            last_name=f"Student{index}",
+            role="student",
+        )
+        Enrollment.objects.create(student=student, cohort=self.cohort)
+        return student
+
+    def _make_submitted(self, student=None, answers=None):
+        """Create a submitted submission with the given {question: text}."""
+        sub = Submission.objects.create(
+            test=self.test,
+            student=student or self.student,
+            status="submitted",
+            attempt_number=1,
+            submitted_at=self.now,
+        )
+        for question, text in (answers or {}).items():
+            Answer.objects.create(
+                submission=sub, question=question, text_answer=text
+            )
+        return sub
+
+
+class StoredScoreTestCase(AssessmentFixtureMixin, APITestCase):
+    """Stored earned_points / answer counts on Submission."""
+
+    def _grade(self, sub, points, **extra):
+        self.client.force_authenticate(user=self.lecturer)
+        answers = [
+            {"answer_id": a.id, "points_earned": points[a.question_id]}
+            for a in sub.answers.all()
+        ]
+        return self.client.post(
+            f"/api/submissions/{sub.id}/grade/",
+            {"answers": answers, **extra},
+            format="json",
+        )
+
+    def test_grading_stores_score_and_counts(self):
+        """grade_submission persists earned_points and graded counts."""
+        sub = self._make_submitted(
+            answers={self.question: "a", self.question2: "b"}
+        )
+        response = self._grade(
+            sub, {self.question.id: 7, self.question2.id: 2.5}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["score"], 9.5)
+
+        sub.refresh_from_db()
+        self.assertEqual(sub.earned_points, 9.5)
+        self.assertEqual(sub.graded_answer_count, 2)
+        self.assertEqual(sub.answered_count, 2)
+
+    def test_resubmit_clears_stored_score(self):
+        """Submitting a reopened submission resets the stored score."""
+        sub = self._make_submitted(answers={self.question: "a"})
+        self._grade(sub, {self.question.id: 6}, **{"return": True})
+        sub.refresh_from_db()
+        self.assertEqual(sub.earned_points, 6)
+
+        self.client.force_authenticate(user=self.student)
+        self.client.post(f"/api/submissions/{sub.id}/resubmit/")
+        response = self.client.post(
+            f"/api/submissions/{sub.id}/submit/", {"confirm": True}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sub.refresh_from_db()
+        self.assertEqual(sub.earned_points, 0)
+        self.assertEqual(sub.graded_answer_count, 0)
+        self.assertEqual(sub.grading_history[0]["score"], None)
+
+    def test_statistics_average_uses_stored_score(self):
+        """statistics.average_score averages graded submissions in SQL."""
+        first = self._make_submitted(answers={self.question: "a"})
+        second = self._make_submitted(
+            student=self._make_student(2), answers={self.question: "b"}
+        )
+        self._grade(first, {self.question.id: 4})
+        self._grade(second, {self.question.id: 8})
+
+        response = self.client.get(f"/api/tests/{self.test.id}/statistics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["average_score"], 6.0)
+
+    def test_backfill_command_recomputes_scores(self):
+        """backfill_submission_scores repairs rows written outside the API."""
+        from django.core.management import call_command
+        from io import StringIO
+
+        sub = self._make_submitted(answers={self.question: "a"})
+        Answer.objects.filter(submission=sub).update(points_earned=3)
+        Answer.objects.create(
+            submission=sub, question=self.question2, text_answer="   "
+        )
+
+        call_command("backfill_submission_scores", stdout=StringIO())
+
+        sub.refresh_from_db()
+        self.assertEqual(sub.earned_points, 3)
+        self.assertEqual(sub.graded_answer_count, 1)
+        # Whitespace-only answers do not count as answered
+        self.assertEqual(sub.answered_count, 1)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-statistics",
+        }
+    }
+)
+class TestStatisticsTestCase(AssessmentFixtureMixin, APITestCase):
+    """Aggregate statistics endpoint with per-question breakdowns."""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+
+        cache.clear()
+        self.choice = Question.objects.create(
+            test=self.test,
+            question_type="single_choice",
+            title="Pick one",
+            order=2,
+            max_points=2,
+        )
+        self.option_a = QuestionOption.objects.create(
+            question=self.choice, text="A", order=0, is_correct=True
+        )
+        self.option_b = QuestionOption.objects.create(
+            question=self.choice, text="B", order=1
+        )
+        self.client.force_authenticate(user=self.lecturer)
+
+    def _submit_with_choice(self, student, option, points=None):
+        sub = self._make_submitted(
+            student=student, answers={self.question: "text"}
+        )
+        answer = Answer.objects.create(
+            submission=sub, question=self.choice, points_earned=points
+        )
+        answer.selected_options.set([option])
+        return sub
+
+    def _url(self):
+        return f"/api/tests/{self.test.id}/statistics/"
+
+    def test_per_question_breakdown(self):
+        """mean points, answer rate, flagged count and option picks."""
+        self._submit_with_choice(self.student, self.option_a, points=2)
+        other = self._submit_with_choice(
+            self._make_student(2), self.option_b, points=0
+        )
+        other.answers.filter(question=self.choice).update(is_flagged=True)
+
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["completed_submissions"], 2)
+
+        by_id = {q["question_id"]: q for q in response.data["questions"]}
+        choice = by_id[str(self.choice.id)]
+        self.assertEqual(choice["mean_points"], 1.0)
+        self.assertEqual(choice["answer_rate"], 1.0)
+        self.assertEqual(choice["flagged_count"], 1)
+        picks = {o["text"]: o["count"] for o in choice["options"]}
+        self.assertEqual(picks, {"A": 1, "B": 1})
+
+        essay = by_id[str(self.question2.id)]
+        self.assertEqual(essay["answered_count"], 0)
+        self.assertEqual(essay["answer_rate"], 0)
+        self.assertNotIn("options", essay)
+
+    def test_query_count_independent_of_submissions(self):
+        """The engine does not issue per-submission queries."""
+        for i in range(5):
+            self._submit_with_choice(self._make_student(i), self.option_a)
+
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self._url())
+
+        for i in range(5, 15):
+            self._submit_with_choice(self._make_student(i), self.option_b)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self._url())
+
+        self.assertEqual(response.data["completed_submissions"], 15)
+        self.assertEqual(len(few), len(many))
+
+    def test_cached_until_submission_changes(self):
+        """Second request is served from cache; grading invalidates it."""
+        sub = self._submit_with_choice(self.student, self.option_a)
+        first = self.client.get(self._url())
+        self.assertIsNone(first.data["average_score"])
+
+        # Cached: a raw UPDATE without signals is not visible yet
+        Submission.objects.filter(id=sub.id).update(
+            status="graded", earned_points=4
+        )
+        self.assertIsNone(self.client.get(self._url()).data["average_score"])
+
+        # A real save invalidates the cached entry
+        sub.refresh_from_db()
+        sub.save()
+        self.assertEqual(self.client.get(self._url()).data["average_score"], 4)
+
+    def test_answer_save_reads_only_the_test_id(self):
+        """Answer writes invalidate without loading the submission."""
+        sub = self._submit_with_choice(self.student, self.option_a)
+        table = Submission._meta.db_table
+
+        def submission_queries(answer):
+            with CaptureQueriesContext(connection) as ctx:
+                answer.save()
+            return [
+                q["sql"]
+                for q in ctx.captured_queries
+                if f'FROM "{table}"' in q["sql"]
+            ]
+
+        # Loaded on its own: a single lookup of the test id
+        answer = Answer.objects.get(submission=sub, question=self.choice)
+        (sql,) = submission_queries(answer)
+        self.assertEqual(
+            sql.split(" FROM ")[0], f'SELECT "{table}"."test_id" AS "test_id"'
+        )
+
+        # Loaded through the submission: no lookup at all
+        self.assertEqual(
+            submission_queries(sub.answers.get(question=self.choice)), []
+        )
+
+
+class BulkUpsertAnswersTestCase(AssessmentFixtureMixin, APITestCase):
+    """Bulk write path for the autosave endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.multi = Question.objects.create(
+            test=self.test,
+            question_type="multiple_choice",
+            title="Pick many",
+            order=2,
+        )
+        self.options = [
+            QuestionOption.objects.create(
+                question=self.multi, text=text, order=i
+            )
+            for i, text in enumerate(["A", "B", "C"])
+        ]
+        self.sub = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        self.client.force_authenticate(user=self.student)
+
+    def _upsert(self, answers):
+        return self.client.post(
+            f"/api/submissions/{self.sub.id}/answers/",
+            {"answers": answers},
+            format="json",
+        )
+
+    def _payload(self, text, option_indexes):
+        return [
+            {"question": str(self.question.id), "text_answer": text},
+            {
+                "question": str(self.multi.id),
+                "selected_options": [
+                    str(self.options[i].id) for i in option_indexes
+                ],
+            },
+        ]
+
+    def test_creates_and_diffs_selected_options(self):
+        """Missing answers are created and option selections diffed."""
+        response = self._upsert(self._payload("first", [0, 1]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["answers"]), 2)
+
+        response = self._upsert(self._payload("second", [1, 2]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        answer = self.sub.answers.get(question=self.multi)
+        self.assertEqual(
+            set(answer.selected_options.values_list("text", flat=True)),
+            {"B", "C"},
+        )
+        self.assertEqual(
+            self.sub.answers.get(question=self.question).text_answer, "second"
+        )
+        returned = {a["question"]: a for a in response.data["answers"]}
+        self.assertEqual(returned[self.question.id]["text_answer"], "second")
+
+    def test_unchanged_answers_are_skipped(self):
+        """Re-sending identical content writes nothing."""
+        self._upsert(self._payload("same", [0]))
+        before = dict(self.sub.answers.values_list("id", "updated_at"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._upsert(self._payload("same", [0]))
+        writes = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(
+            dict(self.sub.answers.values_list("id", "updated_at")), before
+        )
+
+    def test_single_choice_rejects_multiple_options(self):
+        """single_choice questions still accept only one option."""
+        self.multi.question_type = "single_choice"
+        self.multi.save()
+        response = self._upsert(self._payload("x", [0, 1]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.sub.answers.exists())
+
+    def test_foreign_options_are_ignored(self):
+        """Options from other questions are dropped, as before."""
+        other = Question.objects.create(
+            test=self.test, question_type="single_choice", title="O", order=3
+        )
+        foreign = QuestionOption.objects.create(question=other, text="F")
+        response = self._upsert(
+            [
+                {
+                    "question": str(self.multi.id),
+                    "selected_options": [
+                        str(foreign.id),
+                        str(self.options[0].id),
+                    ],
+                }
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        answer = self.sub.answers.get(question=self.multi)
+        self.assertEqual(list(answer.selected_options.all()), [self.options[0]])
+
+
+class DeltaAutosaveTestCase(AssessmentFixtureMixin, APITestCase):
+    """Delta autosave with per-answer versions and a compact ack."""
+
+    def setUp(self):
+        super().setUp()
+        self.sub = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        self.url = f"/api/submissions/{self.sub.id}/answers/delta/"
+        self.client.force_authenticate(user=self.student)
+
+    def _patch(self, *answers):
+        return self.client.post(
+            self.url, {"answers": list(answers)}, format="json"
+        )
+
+    def test_ack_carries_new_versions(self):
+        """New answers start at version 1 and bump on every change."""
+        response = self._patch(
+            {"question": str(self.question.id), "text_answer": "one"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("test", response.data)
+        self.assertEqual(response.data["conflicts"], [])
+        (ack,) = response.data["answers"]
+        self.assertEqual(ack["question"], str(self.question.id))
+        self.assertEqual(ack["version"], 1)
+
+        response = self._patch(
+            {
+                "question": str(self.question.id),
+                "version": 1,
+                "text_answer": "two",
+            }
+        )
+        self.assertEqual(response.data["answers"][0]["version"], 2)
+        self.assertEqual(
+            self.sub.answers.get(question=self.question).text_answer, "two"
+        )
+
+    def test_unchanged_answer_keeps_version(self):
+        """Re-sending identical content acks the current version."""
+        self._patch({"question": str(self.question.id), "text_answer": "same"})
+        response = self._patch(
+            {
+                "question": str(self.question.id),
+                "version": 1,
+                "text_answer": "same",
+            }
+        )
+        self.assertEqual(response.data["answers"][0]["version"], 1)
+
+    def test_stale_version_is_rejected_per_answer(self):
+        """Only the answer with a stale version conflicts."""
+        Answer.objects.create(
+            submission=self.sub,
+            question=self.question,
+            text_answer="from another tab",
+            version=3,
+        )
+        response = self._patch(
+            {
+                "question": str(self.question.id),
+                "version": 2,
+                "text_answer": "mine",
+            },
+            {"question": str(self.question2.id), "text_answer": "essay"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            [a["question"] for a in response.data["answers"]],
+            [str(self.question2.id)],
+        )
+        (conflict,) = response.data["conflicts"]
+        self.assertEqual(conflict["version"], 3)
+        self.assertEqual(conflict["text_answer"], "from another tab")
+        self.assertEqual(
+            self.sub.answers.get(question=self.question).text_answer,
+            "from another tab",
+        )
+        self.assertTrue(self.sub.answers.filter(question=self.question2).exists())
+
+    def test_new_answer_created_elsewhere_conflicts(self):
+        """Sending no version for an answer that now exists is a conflict."""
+        Answer.objects.create(
+            submission=self.sub, question=self.question, text_answer="x"
+        )
+        response = self._patch(
+            {"question": str(self.question.id), "text_answer": "y"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_concurrent_first_save_conflicts(self):
+        """A first save that loses the insert race gets a 409, not a 500."""
+        real_bulk_create = Answer.objects.bulk_create
+
+        def racing_bulk_create(objs, *args, **kwargs):
+            # Another tab inserts the same answer after our existence check
+            if not Answer.objects.filter(question=self.question).exists():
+                Answer.objects.create(
+                    submission=self.sub,
+                    question=self.question,
+                    text_answer="from another tab",
+                )
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with patch.object(
+            Answer.objects, "bulk_create", side_effect=racing_bulk_create
+        ):
+            response = self._patch(
+                {"question": str(self.question.id), "text_answer": "mine"},
+                {"question": str(self.question2.id), "text_answer": "essay"},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        (conflict,) = response.data["conflicts"]
+        self.assertEqual(conflict["text_answer"], "from another tab")
+        self.assertEqual(
+            [a["question"] for a in response.data["answers"]],
+            [str(self.question2.id)],
+        )
+        self.assertEqual(
+            self.sub.answers.get(question=self.question).text_answer,
+            "from another tab",
+        )
+        self.assertEqual(
+            self.sub.answers.get(question=self.question2).text_answer, "essay"
+        )
+
+    def test_rejected_when_not_in_progress(self):
+        """Delta saves follow the same status rules as full upserts."""
+        self.sub.status = "submitted"
+        self.sub.save()
+        response = self._patch(
+            {"question": str(self.question.id), "text_answer": "late"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SubmissionExpiryTestCase(AssessmentFixtureMixin, APITestCase):
+    """Stored expires_at for timed attempts."""
+
+    def setUp(self):
+        super().setUp()
+        self.test.time_limit_minutes = 30
+        self.test.available_until = None
+        self.test.save()
+
+    def _start(self, student=None):
+        return Submission.objects.create(
+            test=self.test, student=student or self.student, attempt_number=1
+        )
+
+    def test_expires_at_set_on_create(self):
+        """Deadline is start plus the time limit."""
+        sub = self._start()
+        self.assertAlmostEqual(
+            (sub.expires_at - sub.started_at).total_seconds(), 30 * 60, delta=1
+        )
+
+    def test_expires_at_capped_by_available_until(self):
+        """The test deadline wins when it comes before the time limit."""
+        self.test.available_until = timezone.now() + timedelta(minutes=5)
+        self.test.save()
+        sub = self._start()
+        self.assertEqual(sub.expires_at, self.test.available_until)
+
+    def test_untimed_tests_do_not_expire(self):
+        """Without a time limit there is no deadline to enforce."""
+        self.test.time_limit_minutes = None
+        self.test.save()
+        self.assertIsNone(self._start().expires_at)
+
+    def test_time_limit_change_resyncs_open_attempts(self):
+        """Editing the limit moves the deadline of in-progress attempts."""
+        sub = self._start()
+        done = self._make_submitted(student=self._make_student(1))
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.patch(
+            f"/api/tests/{self.test.id}/",
+            {"time_limit_minutes": 60},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sub.refresh_from_db()
+        self.assertAlmostEqual(
+            (sub.expires_at - sub.started_at).total_seconds(), 60 * 60, delta=1
+        )
+        done.refresh_from_db()
+        self.assertIsNone(done.expires_at)
+
+    def test_writes_rejected_after_expiry(self):
+        """Autosave stops at the deadline instead of at the next sweep."""
+        sub = self._start()
+        Submission.objects.filter(id=sub.id).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(
+            f"/api/submissions/{sub.id}/answers/",
+            {"answers": [{"question": str(self.question.id), "text_answer": "x"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expired", response.data["error"])
+
+    def test_sweep_only_touches_expired_rows(self):
+        """Open attempts before their deadline are left alone."""
+        from apps.assessments.tasks import auto_submit_expired_tests
+
+        expired = self._start()
+        open_sub = self._start(student=self._make_student(1))
+        Submission.objects.filter(id=expired.id).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        with patch("apps.assessments.tasks.async_task"):
+            auto_submit_expired_tests()
+
+        expired.refresh_from_db()
+        open_sub.refresh_from_db()
+        self.assertEqual(expired.status, "submitted")
+        self.assertEqual(open_sub.status, "in_progress")
+
+
+class SubmissionTransitionTestCase(AssessmentFixtureMixin, APITestCase):
+    """Compare-and-swap status transitions and their notifications."""
+
+    def _notified(self, mock_async, kind):
+        return [
+            c for c in mock_async.call_args_list if kind in c.args
+        ]
+
+    def test_transition_is_compare_and_swap(self):
+        """A stale instance cannot move a submission twice."""
+        sub = self._make_submitted()
+        stale = Submission.objects.get(pk=sub.pk)
+
+        self.assertTrue(sub.transition("submitted", "graded", feedback="ok"))
+        self.assertFalse(stale.transition("submitted", "returned"))
+
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, "graded")
+        self.assertEqual(sub.feedback, "ok")
+
+    @patch("apps.assessments.signals.async_task")
+    def test_signal_fires_once_per_real_transition(self, mock_async):
+        """Grading notifies once; plain saves and re-grades stay silent."""
+        sub = self._make_submitted()
+        sub.transition("submitted", "graded")
+        sub.save()
+        sub.transition("graded", "graded", feedback="regrade")
+
+        self.assertEqual(
+            len(self._notified(mock_async, "submission_graded")), 1
+        )
+
+    @patch("apps.assessments.signals.async_task")
+    def test_concurrent_submit_is_rejected(self, mock_async):
+        """The loser of a double-submit gets 409 and writes nothing."""
+        sub = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        Answer.objects.create(
+            submission=sub, question=self.question, text_answer="A"
+        )
+        Answer.objects.create(
+            submission=sub, question=self.question2, text_answer="B"
+        )
+        self.client.force_authenticate(user=self.student)
+        url = f"/api/submissions/{sub.id}/submit/"
+
+        # The sweep submits between the request's read and its write
+        stale = Submission.objects.get(pk=sub.pk)
+        Submission.objects.filter(pk=sub.pk).transition(
+            "in_progress", "submitted", time_spent_minutes=99
+        )
+        with patch(
+            "apps.assessments.views.SubmissionViewSet.get_object",
+            return_value=stale,
+        ):
+            response = self.client.post(url, {"confirm": True}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        sub.refresh_from_db()
+        self.assertEqual(sub.time_spent_minutes, 99)
+
+    def test_grade_conflicts_with_student_reopen(self):
+        """Grading a returned submission the student just reopened fails."""
+        sub = self._make_submitted(answers={self.question: "A"})
+        sub.transition("submitted", "returned")
+        answer = sub.answers.get()
+        self.client.force_authenticate(user=self.lecturer)
+
+        stale = Submission.objects.get(pk=sub.pk)
+        Submission.objects.filter(pk=sub.pk).transition(
+            "returned", "in_progress"
+        )
+        with patch(
+            "apps.assessments.views.SubmissionViewSet.get_object",
+            return_value=stale,
+        ):
+            response = self.client.post(
+                f"/api/submissions/{sub.id}/grade/",
+                {"answers": [{"answer_id": str(answer.id), "points_earned": 5}]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        answer.refresh_from_db()
+        self.assertIsNone(answer.points_earned)
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, "in_progress")
+
+
+class TestCloneTestCase(AssessmentFixtureMixin, APITestCase):
+    """Bulk duplicate and cross-cohort cloning."""
+
+    def setUp(self):
+        super().setUp()
+        self.choice = Question.objects.create(
+            test=self.test,
+            question_type="single_choice",
+            title="Pick",
+            order=2,
+            max_points=3,
+        )
+        for i, text in enumerate(["A", "B", "C"]):
+            QuestionOption.objects.create(
+                question=self.choice, text=text, order=i, is_correct=i == 1
+            )
+        self.test.calculate_total_points()
+        self.client.force_authenticate(user=self.lecturer)
+
+    def _assert_same_content(self, copy):
+        copied = list(copy.questions.all())
+        self.assertEqual(
+            [(q.title, q.max_points, q.order) for q in copied],
+            [(q.title, q.max_points, q.order) for q in self.test.questions.all()],
+        )
+        self.assertEqual(
+            [
+                (o.text, o.is_correct)
+                for o in QuestionOption.objects.filter(question__test=copy)
+            ],
+            [("A", False), ("B", True), ("C", False)],
+        )
+        self.assertEqual(copy.total_points, 18)
+        self.assertEqual(copy.status, "draft")
+
+    def test_duplicate_copies_max_points(self):
+        """The copy keeps per-question points and the recomputed total."""
+        response = self.client.post(f"/api/tests/{self.test.id}/duplicate/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        copy = Test.objects.get(id=response.data["id"])
+        self.assertEqual(copy.title, f"{self.test.title} (Copy)")
+        self.assertEqual(copy.cohort, self.cohort)
+        self._assert_same_content(copy)
+
+    def test_clone_to_cohorts_in_constant_queries(self):
+        """Cloning into 1 or 4 cohorts costs the same number of queries."""
+
+        def clone(count):
+            cohorts = [
+                Cohort.objects.create(
+                    name=f"Intake {Cohort.objects.count()}",
+                    program_type="certificate",
+                    start_date=self.now.date(),
+                    end_date=(self.now + timedelta(days=30)).date(),
+                )
+                for _ in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(
+                    f"/api/tests/{self.test.id}/clone-to-cohorts/",
+                    {"cohorts": [c.id for c in cohorts]},
+                    format="json",
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            writes = [
+                q for q in ctx.captured_queries if q["sql"].startswith("INSERT")
+            ]
+            return cohorts, response, len(writes)
+
+        _, _, one = clone(1)
+        cohorts, response, four = clone(4)
+
+        self.assertEqual(one, four)
+        self.assertEqual(len(response.data), 4)
+        for cohort in cohorts:
+            copy = Test.objects.get(cohort=cohort)
+            self.assertEqual(copy.title, self.test.title)
+            self._assert_same_content(copy)
+
+    def test_clone_rejects_title_clash(self):
+        """Existing tests with the same title block the whole request."""
+        response = self.client.post(
+            f"/api/tests/{self.test.id}/clone-to-cohorts/",
+            {"cohorts": [self.cohort.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["cohorts"], [self.cohort.id])
+
+    def test_clone_rejects_unknown_cohort(self):
+        """Unknown cohort ids are reported before anything is written."""
+        response = self.client.post(
+            f"/api/tests/{self.test.id}/clone-to-cohorts/",
+            {"cohorts": [999999]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Test.objects.count(), 1)
+
+
+class GradebookExportTestCase(AssessmentFixtureMixin, APITestCase):
+    """Streaming CSV/XLSX gradebook exports."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.lecturer)
+
+    def _graded(self, student, attempt, points):
+        sub = Submission.objects.create(
+            test=self.test,
+            student=student,
+            attempt_number=attempt,
+            status="submitted",
+        )
+        Answer.objects.create(
+            submission=sub,
+            question=self.question,
+            text_answer="A",
+            points_earned=points,
+        )
+        sub.refresh_score()
+        sub.transition("submitted", "graded")
+        return sub
+
+    def _csv(self, response):
+        import csv
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode()
+        return list(csv.reader(body.splitlines()))
+
+    def test_test_gradebook_uses_latest_attempt(self):
+        """One row per student with per-question points."""
+        self._graded(self.student, 1, 4)
+        self._graded(self.student, 2, 9)
+        other = self._make_student(1)
+        self._graded(other, 1, 6)
+        # In-progress attempts are not part of the gradebook
+        Submission.objects.create(
+            test=self.test, student=self._make_student(2), attempt_number=1
+        )
+
+        rows = self._csv(
+            self.client.get(f"/api/tests/{self.test.id}/gradebook/")
+        )
+        header, *body = rows
+        self.assertEqual(header[-2:], [self.question.title, self.question2.title])
+        self.assertEqual(len(body), 2)
+        by_email = {row[1]: row for row in body}
+        self.assertEqual(by_email[self.student.email][2], "2")
+        self.assertEqual(by_email[self.student.email][-2:], ["9.0", ""])
+        self.assertEqual(by_email[other.email][5], "6.0")
+
+    def test_small_chunks_give_same_rows(self):
+        """Students split across chunks are neither lost nor duplicated."""
+        from apps.assessments.exports import test_gradebook_rows
+
+        for i in range(5):
+            student = self._make_student(i)
+            self._graded(student, 1, i)
+            self._graded(student, 2, i + 1)
+
+        chunked = list(test_gradebook_rows(self.test, chunk_size=2))
+        whole = list(test_gradebook_rows(self.test, chunk_size=100))
+        self.assertEqual(chunked, whole)
+        self.assertEqual(len(whole), 6)
+
+    def test_cohort_gradebook_has_column_per_test(self):
+        """Enrolled students without grades still get a row."""
+        self._graded(self.student, 1, 7)
+        self._make_student(1)
+
+        rows = self._csv(
+            self.client.get(
+                "/api/tests/cohort-gradebook/", {"cohort": self.cohort.id}
+            )
+        )
+        header, *body = rows
+        self.assertEqual(header, ["Student", "Email", self.test.title])
+        by_email = {row[1]: row for row in body}
+        self.assertEqual(by_email[self.student.email][2], "7.0")
+        self.assertEqual(by_email["fx_student1@example.com"][2], "")
+
+    def test_xlsx_export(self):
+        """XLSX exports contain the same rows."""
+        from io import BytesIO
+
+        from openpyxl import load_workbook
+
+        self._graded(self.student, 1, 5)
+        response = self.client.get(
+            f"/api/tests/{self.test.id}/gradebook/", {"file_format": "xlsx"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1], self.student.email)
+
+    def test_formula_cells_are_escaped(self):
+        """User-controlled text cannot inject spreadsheet formulas."""
+        from io import BytesIO
+
+        from openpyxl import load_workbook
+
+        self.student.first_name = "=HYPERLINK(\"http://evil\")"
+        self.student.last_name = ""
+        self.student.save()
+        self.question.title = "@SUM(A1)"
+        self.question.save()
+        self._graded(self.student, 1, 5)
+
+        header, row = self._csv(
+            self.client.get(f"/api/tests/{self.test.id}/gradebook/")
+        )
+        self.assertEqual(header[-2], "'@SUM(A1)")
+        self.assertEqual(row[0], "'=HYPERLINK(\"http://evil\")")
+        self.assertEqual(row[5], "5.0")
+
+        response = self.client.get(
+            f"/api/tests/{self.test.id}/gradebook/", {"file_format": "xlsx"}
+        )
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        header, row = workbook.active.iter_rows(values_only=True)
+        self.assertEqual(header[-2], "'@SUM(A1)")
+        self.assertEqual(row[0], "'=HYPERLINK(\"http://evil\")")
+        self.assertEqual(row[5], 5)
+
+    def test_students_cannot_export(self):
+        """Exports are staff-only."""
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(f"/api/tests/{self.test.id}/gradebook/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_format_rejected(self):
+        response = self.client.get(
+            f"/api/tests/{self.test.id}/gradebook/", {"file_format": "pdf"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BreakingChangeDiffTestCase(AssessmentFixtureMixin, APITestCase):
+    """Rejected breaking edits report which questions changed and why."""
+
+    def setUp(self):
+        super().setUp()
+        self._make_submitted(answers={self.question: "A"})
+        self.client.force_authenticate(user=self.lecturer)
+
+    def test_rejection_lists_changes(self):
+        response = self.client.patch(
+            f"/api/tests/{self.test.id}/",
+            {
+                "questions": [
+                    {
+                        "id": str(self.question.id),
+                        "question_type": "essay",
+                        "title": "Q1",
+                        "max_points": 10,
+                    },
+                    {"question_type": "text", "title": "New", "max_points": 1},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = {
+            (error["attr"], error["detail"])
+            for error in response.data["errors"]
+        }
+        self.assertIn(("changes.added", "1"), errors)
+        self.assertIn(("changes.deleted", str(self.question2.id)), errors)
+        self.assertIn(
+            (f"changes.changed.{self.question.id}", "question_type"), errors
+        )
+
+    def test_non_breaking_edit_keeps_answered_question(self):
+        """Safe updates reuse the diff and keep answered questions."""
+        response = self.client.patch(
+            f"/api/tests/{self.test.id}/",
+            {
+                "questions": [
+                    {
+                        "id": str(self.question.id),
+                        "question_type": "text",
+                        "title": "Renamed",
+                        "max_points": 10,
+                    },
+                    {
+                        "id": str(self.question2.id),
+                        "question_type": "essay",
+                        "title": "Q2",
+                        "max_points": 5,
+                    },
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["breaking_changes_detected"])
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.title, "Renamed")
+        self.assertEqual(self.question.answers.count(), 1)
+
+
+class AutoGradingTestCase(AssessmentFixtureMixin, APITestCase):
+    """Objective questions are scored from the answer key."""
+
+    def setUp(self):
+        super().setUp()
+        self.single = Question.objects.create(
+            test=self.test,
+            question_type="single_choice",
+            title="Single",
+            order=2,
+            max_points=2,
+        )
+        self.single_right, self.single_wrong = [
+            QuestionOption.objects.create(
+                question=self.single, text=text, order=i, is_correct=not i
+            )
+            for i, text in enumerate("AB")
+        ]
+        self.multiple = Question.objects.create(
+            test=self.test,
+            question_type="multiple_choice",
+            title="Multiple",
+            order=3,
+            max_points=4,
+            partial_credit=True,
+        )
+        self.multi_options = [
+            QuestionOption.objects.create(
+                question=self.multiple, text=text, order=i, is_correct=i < 2
+            )
+            for i, text in enumerate("ABC")
+        ]
+        self.yes_no = Question.objects.create(
+            test=self.test,
+            question_type="yes_no",
+            title="Yes/No",
+            order=4,
+            max_points=1,
+            correct_boolean=True,
+        )
+        self.test.calculate_total_points()
+
+    def _answer(self, submission, question, options=(), boolean=None):
+        answer = Answer.objects.create(
+            submission=submission, question=question, boolean_answer=boolean
+        )
+        answer.selected_options.set(options)
+        return answer
+
+    def _submitted(self):
+        submission = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        self._answer(submission, self.single, [self.single_right])
+        self._answer(submission, self.multiple, self.multi_options[:1])
+        self._answer(submission, self.yes_no, boolean=False)
+        Answer.objects.create(
+            submission=submission, question=self.question, text_answer="A"
+        )
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(
+            f"/api/submissions/{submission.id}/submit/",
+            {"confirm": True},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return submission
+
+    def _points(self, submission):
+        return dict(
+            submission.answers.values_list("question_id", "points_earned")
+        )
+
+    def test_submit_prefills_points(self):
+        submission = self._submitted()
+        points = self._points(submission)
+        self.assertEqual(points[self.single.id], 2)
+        # One of two correct options picked, no wrong picks
+        self.assertEqual(points[self.multiple.id], 2)
+        self.assertEqual(points[self.yes_no.id], 0)
+        # Free-text questions are left for the lecturer
+        self.assertIsNone(points[self.question.id])
+        submission.refresh_from_db()
+        self.assertEqual(submission.earned_points, 4)
+
+    def test_partial_credit_scoring(self):
+        from apps.assessments.grading import answer_key, score_answer
+
+        key = answer_key(self.test.questions.all())[self.multiple.id]
+        right, right2, wrong = [o.id for o in self.multi_options]
+        self.assertEqual(score_answer(key, None, {right, right2}), 4)
+        self.assertEqual(score_answer(key, None, {right, wrong}), 0)
+        self.assertEqual(score_answer(key, None, {right, right2, wrong}), 2)
+
+        key["partial_credit"] = False
+        self.assertEqual(score_answer(key, None, {right}), 0)
+
+    def test_key_change_regrades(self):
+        submission = self._submitted()
+        # Answered choice questions cannot be edited without a breaking
+        # change; drop them to edit only the yes/no key
+        self.single.delete()
+        self.multiple.delete()
+        self.client.force_authenticate(user=self.lecturer)
+
+        # Flipping the yes/no key is not a breaking change
+        questions = [
+            {
+                "id": str(q.id),
+                "question_type": q.question_type,
+                "title": q.title,
+                "max_points": q.max_points,
+                "is_required": q.is_required,
+            }
+            for q in [self.question, self.question2, self.yes_no]
+        ]
+        questions[2]["correct_boolean"] = False
+        response = self.client.patch(
+            f"/api/tests/{self.test.id}/", {"questions": questions}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["breaking_changes_detected"])
+
+        yes_no_answer = submission.answers.get(question=self.yes_no)
+        self.assertEqual(yes_no_answer.points_earned, 1)
+        self.assertTrue(yes_no_answer.is_auto_graded)
+
+    def test_manual_grade_survives_regrade(self):
+        from apps.assessments.grading import regrade_test
+
+        submission = self._submitted()
+        answer = submission.answers.get(question=self.yes_no)
+        self.client.force_authenticate(user=self.lecturer)
+        self.client.post(
+            f"/api/submissions/{submission.id}/grade/",
+            {"answers": [{"answer_id": answer.id, "points_earned": 0.5}]},
+            format="json",
+        )
+        answer.refresh_from_db()
+        self.assertFalse(answer.is_auto_graded)
+
+        regrade_test(self.test)
+        answer.refresh_from_db()
+        self.assertEqual(answer.points_earned, 0.5)
+
+    def test_students_do_not_see_answer_key(self):
+        submission = self._submitted()
+        response = self.client.get(f"/api/submissions/{submission.id}/")
+        single = next(
+            a for a in response.data["answers"] if a["question"] == self.single.id
+        )
+        self.assertNotIn("is_correct", single["question_options"][0])
+
+        response = self.client.get(f"/api/tests/{self.test.id}/my-test/")
+        by_title = {q["title"]: q for q in response.data["questions"]}
+        self.assertNotIn("correct_boolean", by_title["Yes/No"])
+        self.assertNotIn("is_correct", by_title["Single"]["options"][0])
+
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.get(f"/api/submissions/{submission.id}/")
+        single = next(
+            a for a in response.data["answers"] if a["question"] == self.single.id
+        )
+        self.assertTrue(single["question_options"][0]["is_correct"])
+
+    def test_points_hidden_from_students_until_released(self):
+        submission = self._submitted()
+        url = f"/api/submissions/{submission.id}/"
+
+        answers = self.client.get(url).data["answers"]
+        self.assertFalse(any("points_earned" in a for a in answers))
+        self.assertFalse(any("is_auto_graded" in a for a in answers))
+
+        self.client.force_authenticate(user=self.lecturer)
+        answers = self.client.get(url).data["answers"]
+        self.assertIn("points_earned", answers[0])
+
+        # Visible to the student once the test has closed...
+        self.client.force_authenticate(user=self.student)
+        self.test.available_until = timezone.now() - timedelta(minutes=1)
+        self.test.save()
+        answers = self.client.get(url).data["answers"]
+        self.assertTrue(all("points_earned" in a for a in answers))
+
+        # ...or once the submission is graded
+        self.test.available_until = None
+        self.test.save()
+        submission.transition("submitted", "graded")
+        answers = self.client.get(url).data["answers"]
+        self.assertTrue(all("points_earned" in a for a in answers))
+
+    def test_regrade_leaves_graded_submissions_alone(self):
+        from apps.assessments.grading import regrade_test
+
+        submission = self._submitted()
+        submission.transition("submitted", "graded")
+        QuestionOption.objects.filter(id=self.single_right.id).update(
+            is_correct=False
+        )
+        QuestionOption.objects.filter(id=self.single_wrong.id).update(
+            is_correct=True
+        )
+
+        self.assertEqual(regrade_test(self.test), 0)
+        self.assertEqual(self._points(submission)[self.single.id], 2)
+
+
+class BulkGradeTestCase(AssessmentFixtureMixin, APITestCase):
+    """Grading many submissions of a test in one request."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.lecturer)
+        self.url = "/api/submissions/bulk-grade/"
+
+    def _submissions(self, count):
+        return [
+            self._make_submitted(
+                self._make_student(i), {self.question: "A", self.question2: "B"}
+            )
+            for i in range(count)
+        ]
+
+    def _payload(self, submissions, points=5, returned=()):
+        return {
+            "test": self.test.id,
+            "submissions": [
+                {
+                    "submission_id": sub.id,
+                    "feedback": f"Feedback {sub.id}",
+                    "return": sub in returned,
+                    "answers": [
+                        {"answer_id": answer.id, "points_earned": points}
+                        for answer in sub.answers.all()
+                    ],
+                }
+                for sub in submissions
+            ],
+        }
+
+    def test_bulk_grade(self):
+        submissions = self._submissions(3)
+        with patch("apps.assessments.views.async_task") as task:
+            response = self.client.post(
+                self.url,
+                self._payload(submissions, returned=submissions[:1]),
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
+        for sub in submissions:
+            sub.refresh_from_db()
+            self.assertEqual(sub.earned_points, 10)
+            self.assertEqual(sub.graded_by, self.lecturer)
+            self.assertIsNotNone(sub.graded_at)
+            self.assertEqual(sub.feedback, f"Feedback {sub.id}")
+        self.assertEqual(
+            [sub.status for sub in submissions], ["returned", "graded", "graded"]
+        )
+        # One batch for every notification
+        task.assert_called_once_with(
+            "apps.notifications.tasks.send_submission_grading_notifications",
+            [submissions[1].id, submissions[2].id],
+            [submissions[0].id],
+        )
+
+    def test_grading_notifications_batch(self):
+        """The batch task notifies like the per-submission signal."""
+        from apps.notifications.models import Notification
+        from apps.notifications.tasks import (
+            send_submission_grading_notifications,
+        )
+
+        graded, returned = self._submissions(2)
+        regraded = self._make_submitted(self._make_student(5))
+        regraded.grading_history = [{"score": 1}]
+        regraded.save()
+        Submission.objects.filter(id=returned.id).update(status="returned")
+
+        sent = send_submission_grading_notifications(
+            [graded.id, regraded.id], [returned.id]
+        )
+        self.assertEqual(sent, 2)
+        self.assertTrue(
+            Notification.objects.filter(
+                user=returned.student, type="submission_returned"
+            ).exists()
+        )
+        # Staff hear about the first grade only
+        self.assertEqual(
+            Notification.objects.filter(
+                user=self.lecturer, type="submission_graded"
+            ).count(),
+            1,
+        )
+
+    def test_points_over_max_rejected(self):
+        submissions = self._submissions(2)
+        response = self.client.post(
+            self.url, self._payload(submissions, points=6), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Answer.objects.filter(points_earned__isnull=False).exists()
+        )
+
+    def test_answer_of_other_submission_rejected(self):
+        first, second = self._submissions(2)
+        payload = self._payload([first])
+        payload["submissions"][0]["answers"][0]["answer_id"] = (
+            second.answers.first().id
+        )
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_ids_rejected(self):
+        (submission,) = self._submissions(1)
+        bad_test = self._payload([submission])
+        bad_test["test"] = "abc"
+        bad_submission = self._payload([submission])
+        bad_submission["submissions"][0]["submission_id"] = "abc"
+        listed_submission = self._payload([submission])
+        listed_submission["submissions"][0]["submission_id"] = [submission.id]
+        bad_answer = self._payload([submission])
+        bad_answer["submissions"][0]["answers"][0]["answer_id"] = "abc"
+
+        for payload in [bad_test, bad_submission, listed_submission, bad_answer]:
+            response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, payload
+            )
+
+    def test_answers_updated_at_advanced(self):
+        """Graded answers fail a stale client_updated_at check."""
+        (submission,) = self._submissions(1)
+        before = {
+            answer.id: answer.updated_at for answer in submission.answers.all()
+        }
+        response = self.client.post(
+            self.url, self._payload([submission]), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for answer in submission.answers.all():
+            self.assertGreater(answer.updated_at, before[answer.id])
+
+    def test_in_progress_submission_rejected(self):
+        submission = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        response = self.client.post(
+            self.url, self._payload([submission]), format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["submission_ids"], [submission.id])
+
+    def test_query_count_is_constant(self):
+        def grade(submissions):
+            payload = self._payload(submissions)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(ctx)
+
+        with patch("apps.assessments.views.async_task"):
+            small = grade(self._submissions(2))
+            Submission.objects.all().delete()
+            large = grade(
+                [
+                    self._make_submitted(
+                        self._make_student(10 + i),
+                        {self.question: "A", self.question2: "B"},
+                    )
+                    for i in range(8)
+                ]
+            )
+        self.assertEqual(small, large)
+
+
+class GradingQueueTestCase(AssessmentFixtureMixin, APITestCase):
+    """Graders claim distinct submissions from the grading queue."""
+
+    def setUp(self):
+        super().setUp()
+        self.other_lecturer = User.objects.create_user(
+            email="fx_lecturer2@example.com",
+            password="testpassword123",
+            first_name="FX",
+            last_name="Lecturer2",
+            role="admin",
+        )
+        self.submissions = [
+            self._make_submitted(self._make_student(i)) for i in range(3)
+        ]
+        for minutes, sub in enumerate(self.submissions):
+            Submission.objects.filter(id=sub.id).update(
+                submitted_at=self.now - timedelta(minutes=10 - minutes)
+            )
+
+    def _claim(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            "/api/submissions/claim-next/", {"test": self.test.id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_graders_get_distinct_submissions(self):
+        first = self._claim(self.lecturer)
+        second = self._claim(self.other_lecturer)
+        self.assertEqual(first["submission"]["id"], self.submissions[0].id)
+        self.assertEqual(second["submission"]["id"], self.submissions[1].id)
+        self.assertEqual(second["remaining"], 3)
+        self.assertEqual(second["claimed"], 2)
+
+        # Asking again returns the grader's own claim
+        again = self._claim(self.lecturer)
+        self.assertEqual(again["submission"]["id"], self.submissions[0].id)
+
+    def test_expired_lease_is_handed_out_again(self):
+        self._claim(self.lecturer)
+        Submission.objects.filter(id=self.submissions[0].id).update(
+            claimed_until=self.now - timedelta(minutes=1)
+        )
+        data = self._claim(self.other_lecturer)
+        self.assertEqual(data["submission"]["id"], self.submissions[0].id)
+
+    def test_queue_drains(self):
+        graders = [self.lecturer, self.other_lecturer] + [
+            User.objects.create_user(
+                email=f"fx_admin{i}@example.com",
+                password="testpassword123",
+                role="admin",
+            )
+            for i in range(2)
+        ]
+        claimed = [self._claim(grader)["submission"] for grader in graders]
+        self.assertEqual(
+            [sub["id"] for sub in claimed[:3]],
+            [sub.id for sub in self.submissions],
+        )
+        self.assertIsNone(claimed[3])
+
+    def test_claimed_submission_cannot_be_graded_by_others(self):
+        claim = self._claim(self.lecturer)
+        sub_id = claim["submission"]["id"]
+
+        self.client.force_authenticate(user=self.other_lecturer)
+        response = self.client.post(
+            f"/api/submissions/{sub_id}/grade/", {"answers": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        # Grading by the claimer clears the claim
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.post(
+            f"/api/submissions/{sub_id}/grade/", {"answers": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["claimed_by"])
+
+        response = self.client.get(
+            "/api/submissions/grading-queue/", {"test": self.test.id}
+        )
+        self.assertEqual(response.data, {"remaining": 2, "claimed": 0})
+
+    def test_bulk_grade_respects_claims(self):
+        sub_id = self._claim(self.lecturer)["submission"]["id"]
+        payload = {
+            "test": self.test.id,
+            "submissions": [
+                {"submission_id": sub.id, "answers": []}
+                for sub in self.submissions[:2]
+            ],
+        }
+
+        self.client.force_authenticate(user=self.other_lecturer)
+        response = self.client.post(
+            "/api/submissions/bulk-grade/", payload, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["submission_ids"], [sub_id])
+        # Nothing was graded and the claim is still the lecturer's
+        self.assertFalse(Submission.objects.filter(status="graded").exists())
+        self.assertEqual(
+            Submission.objects.get(id=sub_id).claimed_by, self.lecturer
+        )
+
+        # The claimer may bulk-grade it, which clears the claim
+        self.client.force_authenticate(user=self.lecturer)
+        with patch("apps.assessments.views.async_task"):
+            response = self.client.post(
+                "/api/submissions/bulk-grade/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sub = Submission.objects.get(id=sub_id)
+        self.assertEqual(sub.status, "graded")
+        self.assertIsNone(sub.claimed_by)
+
+    def test_release_claim(self):
+        sub_id = self._claim(self.lecturer)["submission"]["id"]
+        response = self.client.post(f"/api/submissions/{sub_id}/release-claim/")
+        self.assertTrue(response.data["released"])
+        self.assertEqual(response.data["claimed"], 0)
+        data = self._claim(self.other_lecturer)
+        self.assertEqual(data["submission"]["id"], sub_id)
+
+    def test_malformed_test_id_rejected(self):
+        self.client.force_authenticate(user=self.lecturer)
+        for test_id in ["abc", [self.test.id]]:
+            response = self.client.post(
+                "/api/submissions/claim-next/", {"test": test_id}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(
+            "/api/submissions/grading-queue/", {"test": "abc"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AnswerSimilarityTestCase(AssessmentFixtureMixin, APITestCase):
+    """MinHash/LSH near-duplicate detection over essay answers."""
+
+    ESSAY = (
+        "Grace is the unmerited favour of God shown to sinners through the "
+        "life death and resurrection of Christ and received by faith alone "
+        "which transforms the believer and the community around them"
+    )
+    OTHER = (
+        "A ministry plan starts from the needs of the neighbourhood and "
+        "builds small groups that meet weekly for prayer study and service "
+        "with leaders trained over twelve months"
+    )
+
+    def _hand_in(self, student, essay):
+        """Submit through the API so the index is built on submit."""
+        submission = Submission.objects.create(
+            test=self.test, student=student, attempt_number=1
+        )
+        Answer.objects.create(
+            submission=submission, question=self.question, text_answer="A"
+        )
+        Answer.objects.create(
+            submission=submission, question=self.question2, text_answer=essay
+        )
+        self.client.force_authenticate(user=student)
+        response = self.client.post(
+            f"/api/submissions/{submission.id}/submit/",
+            {"confirm": True},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return submission
+
+    def _similar(self, submission, **params):
+        self.client.force_authenticate(user=self.lecturer)
+        return self.client.get(
+            f"/api/submissions/{submission.id}/similar-answers/", params
+        )
+
+    def test_near_duplicates_are_reported(self):
+        from apps.assessments.models import AnswerBucket, AnswerSignature
+
+        original = self._hand_in(self.student, self.ESSAY)
+        copied = self._hand_in(
+            self._make_student(1), self.ESSAY.replace("alone", "only")
+        )
+        self._hand_in(self._make_student(2), self.OTHER)
+
+        # Only the essay answers are indexed, one bucket per LSH band
+        self.assertEqual(AnswerSignature.objects.count(), 3)
+        self.assertEqual(AnswerBucket.objects.count(), 3 * 32)
+
+        response = self._similar(original)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (entry,) = response.data["answers"]
+        self.assertEqual(entry["question_id"], str(self.question2.id))
+        (match,) = entry["matches"]
+        self.assertEqual(match["submission_id"], copied.id)
+        self.assertGreater(match["similarity"], 0.6)
+        self.assertLess(match["similarity"], 1)
+
+    def test_identical_answers_and_threshold(self):
+        original = self._hand_in(self.student, self.ESSAY)
+        self._hand_in(self._make_student(1), self.ESSAY)
+        self._hand_in(self._make_student(2), self.OTHER)
+
+        response = self._similar(original, threshold=0)
+        matches = response.data["answers"][0]["matches"]
+        # Unrelated answers share no bucket, so they are never compared
+        self.assertEqual([m["similarity"] for m in matches], [1.0])
+
+    def test_own_attempts_are_not_matches(self):
+        first = self._hand_in(self.student, self.ESSAY)
+        second = Submission.objects.create(
+            test=self.test,
+            student=self.student,
+            attempt_number=2,
+            status="submitted",
+        )
+        Answer.objects.create(
+            submission=second, question=self.question2, text_answer=self.ESSAY
+        )
+        from apps.assessments.similarity import index_submissions
+
+        index_submissions(Submission.objects.filter(id=second.id))
+        self.assertEqual(self._similar(first).data["answers"][0]["matches"], [])
+
+    def test_reindexing_replaces_entries(self):
+        from apps.assessments.models import AnswerBucket
+        from apps.assessments.similarity import index_submissions
+
+        submission = self._hand_in(self.student, self.ESSAY)
+        submission.answers.filter(question=self.question2).update(
+            text_answer=self.OTHER
+        )
+        self.assertEqual(
+            index_submissions(Submission.objects.filter(id=submission.id)), 1
+        )
+        self.assertEqual(AnswerBucket.objects.count(), 32)
+
+    def test_expiry_sweep_indexes_answers(self):
+        from apps.assessments.models import AnswerSignature
+        from apps.assessments.tasks import auto_submit_expired_tests
+
+        submission = Submission.objects.create(
+            test=self.test,
+            student=self.student,
+            attempt_number=1,
+            expires_at=self.now - timedelta(minutes=1),
+        )
+        answer = Answer.objects.create(
+            submission=submission, question=self.question2, text_answer=self.ESSAY
+        )
+        with patch("apps.assessments.tasks.async_task"):
+            auto_submit_expired_tests()
+        self.assertTrue(AnswerSignature.objects.filter(answer=answer).exists())
+
+    def test_invalid_threshold_and_permissions(self):
+        submission = self._hand_in(self.student, self.ESSAY)
+        for threshold in ["abc", "1.5", "-0.1"]:
+            response = self._similar(submission, threshold=threshold)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(
+            f"/api/submissions/{submission.id}/similar-answers/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_query_count_independent_of_index_size(self):
+        original = self._hand_in(self.student, self.ESSAY)
+        self._hand_in(self._make_student(1), self.ESSAY)
+        with CaptureQueriesContext(connection) as few:
+            self._similar(original)
+
+        for i in range(2, 8):
+            self._hand_in(self._make_student(i), self.ESSAY)
+        with CaptureQueriesContext(connection) as many:
+            response = self._similar(original)
+
+        self.assertEqual(len(response.data["answers"][0]["matches"]), 7)
+        self.assertEqual(len(few), len(many))
+
+
+class AnswerContentStateTestCase(AssessmentFixtureMixin, APITestCase):
+    """Stored word_count / is_answered are maintained on every write path."""
+
+    def setUp(self):
+        super().setUp()
+        self.choice = Question.objects.create(
+            test=self.test,
+            question_type="single_choice",
+            title="Pick one",
+            order=2,
+            max_points=2,
+        )
+        self.option = QuestionOption.objects.create(
+            question=self.choice, text="A", order=0
+        )
+        self.submission = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        self.client.force_authenticate(user=self.student)
+
+    def _upsert(self, *answers):
+        response = self.client.post(
+            f"/api/submissions/{self.submission.id}/answers/",
+            {"answers": list(answers)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def _state(self, question):
+        return Answer.objects.filter(
+            submission=self.submission, question=question
+        ).values_list("word_count", "is_answered").get()
+
+    def test_upsert_maintains_state(self):
+        essay = {"question": str(self.question2.id)}
+        choice = {"question": str(self.choice.id)}
+        response = self._upsert(
+            {**essay, "text_answer": "one two  three\nfour"},
+            {**choice, "selected_options": [str(self.option.id)]},
+        )
+        self.assertEqual(self._state(self.question2), (4, True))
+        self.assertEqual(self._state(self.choice), (0, True))
+        self.assertAlmostEqual(response.data["completion_percentage"], 200 / 3)
+
+        self._upsert(
+            {**essay, "text_answer": "   "}, {**choice, "selected_options": []}
+        )
+        self.assertEqual(self._state(self.question2), (0, False))
+        self.assertEqual(self._state(self.choice), (0, False))
+
+    def test_completion_without_counting_questions(self):
+        choice = {"question": str(self.choice.id)}
+        self._upsert({**choice, "selected_options": [str(self.option.id)]})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/api/submissions/{self.submission.id}/"
+            )
+        self.assertAlmostEqual(response.data["completion_percentage"], 100 / 3)
+        self.assertFalse(
+            any(
+                q["sql"].startswith("SELECT COUNT(*)")
+                and "assessments_question" in q["sql"]
+                for q in queries.captured_queries
+            )
+        )
+
+    def test_related_manager_and_save_maintain_state(self):
+        answer = Answer.objects.create(
+            submission=self.submission, question=self.choice
+        )
+        self.assertFalse(answer.is_answered)
+        answer.selected_options.add(self.option)
+        answer.refresh_from_db()
+        self.assertTrue(answer.is_answered)
+
+        # A grading save keeps the option-based flag
+        answer.points_earned = 1
+        answer.save()
+        answer.refresh_from_db()
+        self.assertTrue(answer.is_answered)
+
+        answer.selected_options.clear()
+        answer.refresh_from_db()
+        self.assertFalse(answer.is_answered)
+
+    def test_upload_and_delete_document(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = Question.objects.create(
+            test=self.test,
+            question_type="document_upload",
+            title="File",
+            order=3,
+        )
+        response = self.client.post(
+            f"/api/submissions/{self.submission.id}/upload/",
+            {
+                "question": str(upload.id),
+                "file": SimpleUploadedFile("plan.txt", b"content"),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._state(upload), (0, True))
+
+        response = self.client.delete(
+            f"/api/submissions/{self.submission.id}/delete-document/",
+            {"question": str(upload.id)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._state(upload), (0, False))
+
+    def test_submit_uses_stored_word_count(self):
+        Question.objects.filter(id=self.question2.id).update(min_word_count=5)
+        self._upsert(
+            {"question": str(self.question.id), "text_answer": "A"},
+            {"question": str(self.question2.id), "text_answer": "too short"},
+        )
+        response = self.client.post(
+            f"/api/submissions/{self.submission.id}/submit/", {}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        warning = response.data["validation_warnings"][str(self.question2.id)]
+        self.assertIn("(current: 2)", warning["errors"][0])
+
+    def test_submit_validation_query_count_is_constant(self):
+        def submit_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(
+                    f"/api/submissions/{self.submission.id}/submit/",
+                    {},
+                    format="json",
+                )
+            # Required choice question left unanswered: rejected, no writes
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            return len(ctx)
+
+        Question.objects.filter(id=self.choice.id).update(is_required=True)
+        self._upsert({"question": str(self.question2.id), "text_answer": "x"})
+        few = submit_queries()
+
+        for order in range(3, 13):
+            question = Question.objects.create(
+                test=self.test, question_type="essay", title="E", order=order
+            )
+            self._upsert({"question": str(question.id), "text_answer": "y z"})
+        self.assertEqual(submit_queries(), few)
+
+
+LOCMEM_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class ItemAnalysisTestCase(AssessmentFixtureMixin, APITestCase):
+    """Item analysis of graded submissions, computed with NumPy."""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+
+        cache.clear()
+        self.choice = Question.objects.create(
+            test=self.test,
+            question_type="single_choice",
+            title="Pick one",
+            order=2,
+            max_points=2,
+        )
+        self.option_a = QuestionOption.objects.create(
+            question=self.choice, text="A", order=0, is_correct=True
+        )
+        self.option_b = QuestionOption.objects.create(
+            question=self.choice, text="B", order=1
+        )
+        self.client.force_authenticate(user=self.lecturer)
+
+    def _graded(self, student, text_points, option, choice_points):
+        sub = self._make_submitted(
+            student=student, answers={self.question: "text"}
+        )
+        sub.answers.update(points_earned=text_points)
+        answer = Answer.objects.create(
+            submission=sub, question=self.choice, points_earned=choice_points
+        )
+        answer.selected_options.set([option])
+        sub.status = "graded"
+        sub.graded_at = timezone.now()
+        sub.save()
+        return sub
+
+    def _url(self):
+        return f"/api/tests/{self.test.id}/item-analysis/"
+
+    def test_item_statistics(self):
+        """p-value, point-biserial, discrimination and option rates."""
+        import numpy as np
+
+        scores = [
+            (10, self.option_a, 2),
+            (8, self.option_a, 2),
+            (4, self.option_b, 0),
+            (0, self.option_b, 0),
+        ]
+        for i, (text_points, option, choice_points) in enumerate(scores):
+            self._graded(
+                self._make_student(i), text_points, option, choice_points
+            )
+        # Not graded yet: left out of the analysis
+        self._make_submitted(answers={self.question: "ungraded"})
+
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["graded_submissions"], 4)
+        self.assertEqual(response.data["group_size"], 1)
+        self.assertEqual(response.data["mean_score"], 6.5)
+
+        by_id = {q["question_id"]: q for q in response.data["questions"]}
+        text = by_id[str(self.question.id)]
+        self.assertEqual(text["p_value"], 0.55)
+        expected = np.corrcoef([10, 8, 4, 0], [12, 10, 4, 0])[0, 1]
+        self.assertAlmostEqual(text["point_biserial"], expected, places=4)
+        self.assertEqual(text["discrimination_index"], 1.0)
+        self.assertNotIn("options", text)
+
+        choice = by_id[str(self.choice.id)]
+        self.assertEqual(choice["p_value"], 0.5)
+        rates = {
+            o["text"]: (
+                o["selection_rate"],
+                o["top_selection_rate"],
+                o["bottom_selection_rate"],
+            )
+            for o in choice["options"]
+        }
+        self.assertEqual(rates, {"A": (0.5, 1.0, 0.0), "B": (0.5, 0.0, 1.0)})
+
+        # Nobody answered the essay: no variance, so no correlation
+        essay = by_id[str(self.question2.id)]
+        self.assertEqual(essay["p_value"], 0.0)
+        self.assertIsNone(essay["point_biserial"])
+
+    def test_no_graded_submissions(self):
+        self._make_submitted(answers={self.question: "text"})
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["graded_submissions"], 0)
+        self.assertIsNone(response.data["mean_score"])
+        self.assertTrue(
+            all(q["p_value"] is None for q in response.data["questions"])
+        )
+
+    def test_query_count_independent_of_submissions(self):
+        for i in range(3):
+            self._graded(self._make_student(i), 5, self.option_a, 2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self._url())
+
+        for i in range(3, 15):
+            self._graded(self._make_student(i), 1, self.option_b, 0)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self._url())
+
+        self.assertEqual(response.data["graded_submissions"], 15)
+        self.assertEqual(len(few), len(many))
+
+    def test_students_forbidden(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_cached_until_next_grade(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        sub = self._graded(self.student, 10, self.option_a, 2)
+        self.assertEqual(self.client.get(self._url()).data["mean_score"], 12)
+
+        # Same graded_at: the cached report is served
+        sub.answers.update(points_earned=0)
+        self.assertEqual(self.client.get(self._url()).data["mean_score"], 12)
+
+        # A new grade moves the latest graded_at and rebuilds the report
+        Submission.objects.filter(id=sub.id).update(
+            graded_at=timezone.now() + timedelta(seconds=1)
+        )
+        self.assertEqual(self.client.get(self._url()).data["mean_score"], 0)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_regrade_and_key_edits_rebuild_report(self):
+        from django.core.cache import cache
+
+        from apps.assessments.grading import auto_grade
+
+        cache.clear()
+        sub = self._graded(self.student, 10, self.option_a, 2)
+        report = self.client.get(self._url()).data
+        self.assertEqual(report["mean_score"], 12)
+
+        # The student actually picked the wrong option; queryset updates
+        # bypass the signals, so the cached report is still served
+        answer = sub.answers.get(question=self.choice)
+        Answer.selected_options.through.objects.filter(
+            answer=answer
+        ).update(questionoption=self.option_b)
+        Answer.objects.filter(id=answer.id).update(is_auto_graded=True)
+        self.assertEqual(self.client.get(self._url()).data["mean_score"], 12)
+
+        # Auto-grading rescores it and drops the report
+        self.assertEqual(auto_grade(Submission.objects.filter(id=sub.id)), 1)
+        self.assertEqual(self.client.get(self._url()).data["mean_score"], 10)
+
+        # An answer key edit drops the cached report
+        self.option_b.text = "Renamed"
+        self.option_b.save()
+        choice = next(
+            q
+            for q in self.client.get(self._url()).data["questions"]
+            if q["question_id"] == str(self.choice.id)
+        )
+        self.assertIn("Renamed", [o["text"] for o in choice["options"]])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RandomizedQuestionOrderTestCase(AssessmentFixtureMixin, APITestCase):
+    """randomize_questions orders questions per attempt, without storage."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        super().setUp()
+        cache.clear()
+        for order in range(2, 10):
+            Question.objects.create(
+                test=self.test,
+                question_type="essay",
+                title=f"Q{order + 1}",
+                order=order,
+            )
+        self.choice = Question.objects.create(
+            test=self.test,
+            question_type="multiple_choice",
+            title="Pick",
+            order=10,
+        )
+        for order, text in enumerate("ABCDEFGH"):
+            QuestionOption.objects.create(
+                question=self.choice, text=text, order=order
+            )
+        Test.objects.filter(id=self.test.id).update(randomize_questions=True)
+        self.submission = Submission.objects.create(
+            test=self.test, student=self.student, attempt_number=1
+        )
+        self.client.force_authenticate(user=self.student)
+
+    def _my_test(self):
+        response = self.client.get(f"/api/tests/{self.test.id}/my-test/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _titles(self, questions):
+        return [question["title"] for question in questions]
+
+    def _canonical(self):
+        return [
+            question.title for question in self.test.questions.order_by("order")
+        ]
+
+    def test_order_is_stable_and_shuffled(self):
+        first = self._my_test()["questions"]
+        second = self._my_test()["questions"]
+        self.assertEqual(first, second)
+        self.assertNotEqual(self._titles(first), self._canonical())
+        self.assertCountEqual(self._titles(first), self._canonical())
+
+        choice = next(q for q in first if q["id"] == str(self.choice.id))
+        self.assertNotEqual(
+            [o["text"] for o in choice["options"]], list("ABCDEFGH")
+        )
+
+    def test_order_depends_on_attempt_and_version(self):
+        from apps.assessments.snapshots import bump_definition_version
+
+        first = self._titles(self._my_test()["questions"])
+
+        other = self._make_student(1)
+        Submission.objects.create(
+            test=self.test, student=other, attempt_number=1
+        )
+        self.client.force_authenticate(user=other)
+        self.assertNotEqual(self._titles(self._my_test()["questions"]), first)
+
+        self.client.force_authenticate(user=self.student)
+        bump_definition_version(self.test)
+        self.assertNotEqual(self._titles(self._my_test()["questions"]), first)
+
+    def test_answers_follow_the_same_order(self):
+        """Student and grader views of the submission share the order."""
+        questions = self._my_test()["questions"]
+        for question in self.test.questions.all():
+            Answer.objects.create(
+                submission=self.submission, question=question, text_answer="x"
+            )
+        expected = [question["id"] for question in questions]
+
+        response = self.client.get(f"/api/submissions/{self.submission.id}/")
+        answers = response.data["answers"]
+        self.assertEqual([str(a["question"]) for a in answers], expected)
+        choice = next(a for a in answers if a["question"] == self.choice.id)
+        snapshot_choice = next(
+            q for q in questions if q["id"] == str(self.choice.id)
+        )
+        self.assertEqual(
+            [o["id"] for o in choice["question_options"]],
+            [o["id"] for o in snapshot_choice["options"]],
+        )
+
+        Submission.objects.filter(id=self.submission.id).update(
+            status="submitted"
+        )
+        self.client.force_authenticate(user=self.lecturer)
+        response = self.client.get(f"/api/submissions/{self.submission.id}/")
+        self.assertEqual(
+            [str(a["question"]) for a in response.data["answers"]], expected
+        )
+
+    def test_cached_snapshot_is_not_mutated(self):
+        from apps.assessments.snapshots import get_test_snapshot
+
+        self._my_test()
+        self.test.refresh_from_db()
+        self.assertEqual(
+            self._titles(get_test_snapshot(self.test)["questions"]),
+            self._canonical(),
+        )
+
+    def test_no_extra_queries_and_no_attempt_means_canonical(self):
+        self._my_test()
+        with CaptureQueriesContext(connection) as randomized:
+            self._my_test()
+        Test.objects.filter(id=self.test.id).update(randomize_questions=False)
+        with CaptureQueriesContext(connection) as plain:
+            data = self._my_test()
+        self.assertEqual(len(randomized), len(plain))
+        self.assertEqual(self._titles(data["questions"]), self._canonical())
+
+        Test.objects.filter(id=self.test.id).update(randomize_questions=True)
+        self.submission.delete()
+        data = self._my_test()
+        self.assertEqual(self._titles(data["questions"]), self._canonical())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TestSnapshotTestCase(AssessmentFixtureMixin, APITestCase):
+    """Students are served a cached, versioned snapshot of the questions."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(user=self.student)
+        self.url = f"/api/tests/{self.test.id}/my-test/"
+
+    def _question_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        table = Question._meta.db_table
+        return (
+            [q for q in ctx.captured_queries if f'FROM "{table}"' in q["sql"]],
+            response,
+        )
+
+    def test_questions_served_from_cache(self):
+        """Only the first request serializes the questions."""
+        first, response = self._question_queries()
+        self.assertTrue(first)
+        self.assertEqual(response.data["definition_version"], 1)
+        self.assertEqual(len(response.data["questions"]), 2)
+
+        second, response = self._question_queries()
+        self.assertEqual(second, [])
+        self.assertEqual(
+            [q["title"] for q in response.data["questions"]], ["Q1", "Q2"]
+        )
+
+    def test_question_edit_invalidates_snapshot(self):
+        """Saving a question drops the cached snapshot."""
+        self.client.get(self.url)
+        self.question.title = "Q1 edited"
+        self.question.save()
+
+        _, response = self._question_queries()
+        self.assertEqual(response.data["questions"][0]["title"], "Q1 edited")
+
+    def test_option_edit_invalidates_snapshot(self):
+        self.client.get(self.url)
+        QuestionOption.objects.create(question=self.question, text="New", order=0)
+
+        _, response = self._question_queries()
+        self.assertEqual(
+            [o["text"] for o in response.data["questions"][0]["options"]],
+            ["New"],
+        )
+
+    def test_bump_definition_version(self):
+        """A new version is served under a new cache key."""
+        from django.core.cache import cache
+
+        from apps.assessments.snapshots import (
+            bump_definition_version,
+            snapshot_cache_key,
+        )
+
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(snapshot_cache_key(self.test.id, 1)))
+
+        self.assertEqual(bump_definition_version(self.test), 2)
+        _, response = self._question_queries()
+        self.assertEqual(response.data["definition_version"], 2)
+        self.assertIsNotNone(cache.get(snapshot_cache_key(self.test.id, 2)))
+
+    def test_batched_invalidation_runs_once_per_test(self):
+        """Bulk question edits look up the definition version once."""
+        from django.core.cache import cache
+
+        from apps.assessments.snapshots import (
+            batched_invalidation,
+            snapshot_cache_key,
+        )
+
+        self.client.get(self.url)
+        key = snapshot_cache_key(self.test.id, 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            with batched_invalidation():
+                for i in range(5):
+                    question = Question.objects.create(
+                        test=self.test,
+                        question_type="single_choice",
+                        title=f"Bulk {i}",
+                        order=10 + i,
+                    )
+                    for order, text in enumerate("AB"):
+                        QuestionOption.objects.create(
+                            question=question, text=text, order=order
+                        )
+                    self.assertIsNotNone(cache.get(key))
+                self.question.delete()
+
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(
+            sum(
+                '"definition_version"' in q["sql"]
+                for q in ctx.captured_queries
+            ),
+            1,
+        )
+        _, response = self._question_queries()
+        self.assertEqual(len(response.data["questions"]), 6)
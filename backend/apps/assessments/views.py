@@ -3,21 +3,75 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.filters import SearchFilter, OrderingFilter
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from django.db import transaction, models
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    extend_schema,
+    extend_schema_view,
+)
+from django.db import IntegrityError, transaction, models
+from django_q.tasks import async_task
 from django.utils import timezone
+from datetime import timedelta
+from typing import Any
+import uuid
+from django.utils.text import slugify
+from django.utils.dateparse import parse_datetime
 from rest_framework.exceptions import ValidationError
 
 from .models import Test, Question, QuestionOption, Submission, Answer
+from .analytics import get_test_statistics, invalidate_test_statistics
+from .cloning import clone_test
+from .grading import auto_grade
+from .item_analysis import get_item_analysis
+from .randomization import shuffle_questions
+from .similarity import (
+    DEFAULT_SIMILARITY_THRESHOLD,
+    index_submissions,
+    find_similar_answers,
+)
+from .snapshots import refresh_test_snapshot
+from .exports import (
+    EXPORT_FORMATS,
+    cohort_gradebook_rows,
+    gradebook_response,
+    test_gradebook_rows,
+)
 from .serializers import (
     TestSerializer,
     TestListSerializer,
     SubmissionSerializer,
+    SubmissionListSerializer,
+    AnswerStateSerializer,
     StudentTestSerializer,
     StudentTestDetailSerializer,
 )
+from apps.cohorts.models import Cohort
+from apps.courses.models import Course
 from utils.permissions import IsLecturerOrAdmin, IsStudent
 
+# Question types whose answer is stored in Answer.text_answer
+TEXT_QUESTION_TYPES = [
+    "text",
+    "essay",
+    "reflection",
+    "ministry_plan",
+    "theological_position",
+    "case_study",
+    "sermon_outline",
+    "scripture_reference",
+]
+
+# How long a grader's claim from the grading queue lasts
+GRADING_LEASE_MINUTES = 15
+
+GRADEBOOK_FORMAT_PARAMETER = OpenApiParameter(
+    "file_format",
+    OpenApiTypes.STR,
+    enum=EXPORT_FORMATS,
+    description="Export format (default csv)",
+)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -93,8 +147,11 @@ class TestViewSet(viewsets.ModelViewSet):
         """
         if self.action in ["create", "update", "partial_update", "destroy"]:
             permission_classes = [IsAuthenticated, IsLecturerOrAdmin]
-        else:
+        elif self.action in ["list", "retrieve"]:
             permission_classes = [IsAuthenticated]
+        else:
+            # Extra actions declare their own permission_classes
+            return super().get_permissions()
 
         return [permission() for permission in permission_classes]
 
@@ -115,8 +172,37 @@ class TestViewSet(viewsets.ModelViewSet):
                 status="published", cohort_id__in=enrolled_cohorts
             )
 
+            if self.action == "my_test":
+                # Questions come from the cached snapshot
+                queryset = queryset.prefetch_related(None)
+            if self.action in ["my_tests", "my_test"]:
+                queryset = queryset.prefetch_related(
+                    self._my_submissions_prefetch()
+                )
+
         return queryset
 
+    def _my_submissions_prefetch(self):
+        """
+        Prefetch the requesting student's submissions (newest first) with
+        everything StudentTestSerializer needs, so the per-student fields of
+        a whole page resolve without per-test queries.
+
+        `submission.test` needs no select_related: the reverse prefetch sets
+        it to the parent test, whose prefetched questions then also answer
+        `total_questions`.
+        """
+        return models.Prefetch(
+            "submissions",
+            queryset=Submission.objects.filter(student=self.request.user)
+            .select_related("student", "graded_by")
+            .prefetch_related(
+                "answers__question__options", "answers__selected_options"
+            )
+            .order_by("-created_at"),
+            to_attr="my_submissions",
+        )
+
     def perform_create(self, serializer):
         """Set the created_by field to the current user."""
         serializer.save(created_by=self.request.user)
@@ -126,6 +212,14 @@ class TestViewSet(viewsets.ModelViewSet):
         """Handle complex test updates with question management."""
         serializer.save()
 
+    def get_serializer_context(self):
+        """Students never see the answer key."""
+        context = super().get_serializer_context()
+        context["hide_answer_key"] = (
+            getattr(self.request.user, "role", None) == "student"
+        )
+        return context
+
     def get_serializer(self, *args, **kwargs):
         """Inject 'force' flag from request data into serializer context."""
         kwargs["context"] = self.get_serializer_context()
@@ -162,53 +256,195 @@ class TestViewSet(viewsets.ModelViewSet):
         """Create a copy of an existing test."""
         original_test = self.get_object()
 
-        with transaction.atomic():
-            # Create new test
-            new_test = Test.objects.create(
-                title=f"{original_test.title} (Copy)",
-                description=original_test.description,
-                instructions=original_test.instructions,
-                course=original_test.course,
-                cohort=original_test.cohort,
-                created_by=request.user,
-                time_limit_minutes=original_test.time_limit_minutes,
-                max_attempts=original_test.max_attempts,
-                allow_review_after_submission=original_test.allow_review_after_submission,
-                randomize_questions=original_test.randomize_questions,
-                status="draft",  # Always create as draft
-            )
-
-            # Copy questions and options
-            for question in original_test.questions.all():
-                new_question = Question.objects.create(
-                    test=new_test,
-                    question_type=question.question_type,
-                    title=question.title,
-                    description=question.description,
-                    is_required=question.is_required,
-                    order=question.order,
-                    max_file_size_mb=question.max_file_size_mb,
-                    allowed_file_types=question.allowed_file_types,
-                    required_translation=question.required_translation,
-                    allow_multiple_verses=question.allow_multiple_verses,
-                    min_word_count=question.min_word_count,
-                    max_word_count=question.max_word_count,
-                    text_max_length=question.text_max_length,
-                    text_placeholder=question.text_placeholder,
+        (new_test,) = clone_test(
+            original_test,
+            request.user,
+            [{"course": original_test.course, "cohort": original_test.cohort}],
+            title=f"{original_test.title} (Copy)",
+        )
+
+        serializer = self.get_serializer(new_test)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        description=(
+            "Copy a test with all its questions and options into several "
+            "cohorts at once. Copies are created as drafts without dates."
+        ),
+        summary="Clone test into cohorts",
+        request={
+            "application/json": {
+                "type": "object",
+                "properties": {
+                    "cohorts": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                    },
+                    "course": {
+                        "type": "integer",
+                        "description": "Course for the copies; defaults to "
+                        "the source test's course",
+                    },
+                },
+                "required": ["cohorts"],
+            }
+        },
+        responses={201: TestListSerializer(many=True)},
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="clone-to-cohorts",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def clone_to_cohorts(self, request, pk=None):
+        """Copy a test into each of the given cohorts in one request."""
+        source = self.get_object()
+
+        cohort_ids = request.data.get("cohorts")
+        if not isinstance(cohort_ids, list) or len(cohort_ids) == 0:
+            return Response(
+                {"error": "'cohorts' must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            cohort_ids = list(dict.fromkeys(int(c) for c in cohort_ids))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "'cohorts' must contain cohort ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        course = source.course
+        course_id = request.data.get("course")
+        if course_id is not None:
+            course = Course.objects.filter(id=course_id).first()
+            if course is None:
+                return Response(
+                    {"error": "Course not found"},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
 
-                # Copy options
-                for option in question.options.all():
-                    QuestionOption.objects.create(
-                        question=new_question,
-                        text=option.text,
-                        order=option.order,
-                        is_correct=option.is_correct,
-                    )
+        cohorts = Cohort.objects.in_bulk(cohort_ids)
+        missing = [c for c in cohort_ids if c not in cohorts]
+        if missing:
+            return Response(
+                {"error": f"Cohorts not found: {missing}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        serializer = self.get_serializer(new_test)
+        # Titles are unique per course and cohort
+        taken = list(
+            Test.objects.filter(
+                title=source.title, course=course, cohort_id__in=cohort_ids
+            ).values_list("cohort_id", flat=True)
+        )
+        if taken:
+            return Response(
+                {
+                    "error": "A test with this title already exists in some "
+                    "of the target cohorts",
+                    "cohorts": taken,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        new_tests = clone_test(
+            source,
+            request.user,
+            [
+                {"course": course, "cohort": cohorts[cohort_id]}
+                for cohort_id in cohort_ids
+            ],
+        )
+        serializer = TestListSerializer(
+            new_tests, many=True, context=self.get_serializer_context()
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        description=(
+            "Download the gradebook of a test: one row per student (latest "
+            "handed-in attempt) and one column per question. Streamed."
+        ),
+        summary="Export test gradebook",
+        parameters=[GRADEBOOK_FORMAT_PARAMETER],
+        responses={(200, "text/csv"): OpenApiTypes.BINARY},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def gradebook(self, request, pk=None):
+        """Export per-question points for every student of a test."""
+        test = self.get_object()
+        file_format = self._gradebook_format(request)
+        if file_format is None:
+            return self._gradebook_format_error()
+
+        return gradebook_response(
+            test_gradebook_rows(test),
+            f"gradebook-{slugify(test.title)}",
+            file_format,
+        )
+
+    @extend_schema(
+        description=(
+            "Download the gradebook of a cohort: one row per enrolled student "
+            "and one column per test with the best graded score. Streamed."
+        ),
+        summary="Export cohort gradebook",
+        parameters=[
+            OpenApiParameter(
+                "cohort", OpenApiTypes.INT, required=True, description="Cohort id"
+            ),
+            GRADEBOOK_FORMAT_PARAMETER,
+        ],
+        responses={(200, "text/csv"): OpenApiTypes.BINARY},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="cohort-gradebook",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def cohort_gradebook(self, request):
+        """Export scores on every test of a cohort for each student."""
+        file_format = self._gradebook_format(request)
+        if file_format is None:
+            return self._gradebook_format_error()
+
+        cohort_id = request.query_params.get("cohort", "")
+        cohort = (
+            Cohort.objects.filter(id=cohort_id).first()
+            if cohort_id.isdigit()
+            else None
+        )
+        if cohort is None:
+            return Response(
+                {"error": "A valid 'cohort' query parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        tests = self.get_queryset().filter(cohort=cohort)
+        return gradebook_response(
+            cohort_gradebook_rows(cohort, tests),
+            f"gradebook-{slugify(cohort.name)}",
+            file_format,
+        )
+
+    def _gradebook_format(self, request):
+        """Requested export format, or None if unsupported."""
+        file_format = request.query_params.get("file_format", "csv").lower()
+        return file_format if file_format in EXPORT_FORMATS else None
+
+    def _gradebook_format_error(self):
+        return Response(
+            {"error": f"file_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     @extend_schema(
         description="Publish a draft test, making it available to students",
         summary="Publish test",
@@ -237,6 +473,7 @@ class TestViewSet(viewsets.ModelViewSet):
 
         test.status = "published"
         test.save()
+        refresh_test_snapshot(test)
 
         # Trigger notification
         from .signals import trigger_test_published_notification
@@ -409,7 +646,11 @@ class TestViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @extend_schema(
-        description="Get basic statistics for a test",
+        description=(
+            "Get statistics for a test, including per-question mean points, "
+            "answer rate, flagged count and option pick distribution. "
+            "Cached per test until a submission or answer changes."
+        ),
         summary="Get test statistics",
         responses={
             200: {
@@ -424,6 +665,42 @@ class TestViewSet(viewsets.ModelViewSet):
                     },
                     "average_score": {"type": "number", "format": "float"},
                     "is_available": {"type": "boolean"},
+                    "questions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "question_id": {
+                                    "type": "string",
+                                    "format": "uuid",
+                                },
+                                "title": {"type": "string"},
+                                "question_type": {"type": "string"},
+                                "order": {"type": "integer"},
+                                "max_points": {"type": "number"},
+                                "mean_points": {"type": "number"},
+                                "answered_count": {"type": "integer"},
+                                "answer_rate": {"type": "number"},
+                                "flagged_count": {"type": "integer"},
+                                "options": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "option_id": {
+                                                "type": "string",
+                                                "format": "uuid",
+                                            },
+                                            "text": {"type": "string"},
+                                            "is_correct": {"type": "boolean"},
+                                            "count": {"type": "integer"},
+                                            "pick_rate": {"type": "number"},
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                    },
                 },
             }
         },
@@ -436,56 +713,86 @@ class TestViewSet(viewsets.ModelViewSet):
     def statistics(self, request, pk=None):
         """Get test statistics."""
         test = self.get_object()
+        return Response(get_test_statistics(test))
 
-        submissions = test.submissions.filter(
-            status__in=["submitted", "graded"]
-        )
-
-        stats = {
-            "total_questions": test.total_questions,
-            "total_submissions": test.total_submissions,
-            "completed_submissions": submissions.count(),
-            "average_completion_time": None,
-            "average_score": None,
-            "is_available": test.is_available,
-        }
-
-        if submissions.exists():
-            # Calculate average completion time
-            completed_submissions = submissions.exclude(
-                time_spent_minutes__isnull=True
-            )
-            if completed_submissions.exists():
-                avg_time = completed_submissions.aggregate(
-                    avg=models.Avg("time_spent_minutes")
-                )["avg"]
-                stats["average_completion_time"] = (
-                    float(avg_time) if avg_time else None
-                )
-
-            # Calculate average score
-            graded_submissions = submissions.filter(
-                status__in=["graded", "returned"]
-            )
-            if graded_submissions.exists():
-                total_score = 0
-                submission_count = 0
-
-                for submission in graded_submissions:
-                    if submission.score is not None:
-                        total_score += submission.score
-                        submission_count += 1
-
-                if submission_count > 0:
-                    stats["average_score"] = round(
-                        total_score / submission_count, 2
-                    )
-                else:
-                    stats["average_score"] = None
-            else:
-                stats["average_score"] = None
-
-        return Response(stats)
+    @extend_schema(
+        description=(
+            "Get the item analysis of a test's graded submissions: per-question "
+            "difficulty (p-value, mean points over max points), point-biserial "
+            "correlation with the total score, upper/lower group "
+            "discrimination index and, for choice questions, option selection "
+            "rates overall and for the top and bottom 27% of scorers. "
+            "Cached until the next submission is graded."
+        ),
+        summary="Get test item analysis",
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "graded_submissions": {"type": "integer"},
+                    "group_size": {"type": "integer"},
+                    "mean_score": {"type": "number", "nullable": True},
+                    "score_std": {"type": "number", "nullable": True},
+                    "questions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "question_id": {
+                                    "type": "string",
+                                    "format": "uuid",
+                                },
+                                "title": {"type": "string"},
+                                "question_type": {"type": "string"},
+                                "order": {"type": "integer"},
+                                "max_points": {"type": "number"},
+                                "p_value": {"type": "number", "nullable": True},
+                                "point_biserial": {
+                                    "type": "number",
+                                    "nullable": True,
+                                },
+                                "discrimination_index": {
+                                    "type": "number",
+                                    "nullable": True,
+                                },
+                                "options": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "option_id": {
+                                                "type": "string",
+                                                "format": "uuid",
+                                            },
+                                            "text": {"type": "string"},
+                                            "is_correct": {"type": "boolean"},
+                                            "selection_rate": {"type": "number"},
+                                            "top_selection_rate": {
+                                                "type": "number"
+                                            },
+                                            "bottom_selection_rate": {
+                                                "type": "number"
+                                            },
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+            }
+        },
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="item-analysis",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def item_analysis(self, request, pk=None):
+        """Get the item analysis of a test."""
+        test = self.get_object()
+        return Response(get_item_analysis(test))
 
 
 @extend_schema_view(
@@ -520,11 +827,9 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     Handles student test submissions and grading by instructors.
     """
 
-    queryset = (
-        Submission.objects.select_related("test", "student", "graded_by")
-        .prefetch_related("answers__question", "answers__selected_options")
-        .all()
-    )
+    queryset = Submission.objects.select_related(
+        "test", "student", "graded_by"
+    ).all()
 
     serializer_class = SubmissionSerializer
     filter_backends = [SearchFilter, OrderingFilter]
@@ -533,9 +838,31 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     ordering_fields = ["created_at", "submitted_at"]
     ordering = ["-created_at"]
 
+    def get_serializer_class(self):
+        """Listings use the summary serializer without answers."""
+        if self.action == "list":
+            return SubmissionListSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        """Students never see the answer key of their questions."""
+        context = super().get_serializer_context()
+        context["hide_answer_key"] = (
+            getattr(self.request.user, "role", None) == "student"
+        )
+        return context
+
     def get_queryset(self):
         """Filter submissions based on user role."""
         queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = queryset.with_completion()
+        else:
+            queryset = queryset.prefetch_related(
+                "answers__question__options", "answers__selected_options"
+            )
+            if self.action == "retrieve":
+                queryset = queryset.with_question_total()
 
         if self.request.user.role == "student":
             # Students can only see their own submissions
@@ -606,11 +933,10 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        submission.status = "in_progress"
-        submission.submitted_at = None
         # Leave graded_by, graded_at, feedback, per-answer points_earned/feedback intact
         # (student sees grader's notes while revising)
-        submission.save()
+        if not submission.transition("returned", "in_progress", submitted_at=None):
+            return self._transition_conflict()
 
         serializer = self.get_serializer(submission)
         return Response(serializer.data)
@@ -640,16 +966,16 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Validation reads the stored is_answered / word_count of the
+        # prefetched answers: no per-answer queries, no re-tokenizing
+        answers = list(submission.answers.all())
+        required_questions = list(
+            submission.test.questions.filter(is_required=True)
+        )
+
         # Hard block: no answers at all
-        has_any_answer = submission.answers.filter(
-            models.Q(text_answer__gt="")
-            | models.Q(boolean_answer__isnull=False)
-            | models.Q(file_answer__isnull=False)
-            | models.Q(selected_options__isnull=False)
-        ).distinct().exists()
-
-        required_count = submission.test.questions.filter(is_required=True).count()
-        if not has_any_answer and required_count > 0:
+        has_any_answer = any(answer.is_answered for answer in answers)
+        if not has_any_answer and required_questions:
             return Response(
                 {"error": "Cannot submit: no questions have been answered."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -658,7 +984,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         # Soft validation: collect per-answer warnings
         confirm = request.data.get("confirm", False)
         validation_warnings = {}
-        for answer in submission.answers.select_related("question").all():
+        for answer in answers:
             errors = answer.get_validation_errors()
             if errors:
                 validation_warnings[str(answer.question.id)] = {
@@ -666,10 +992,8 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                     "errors": errors,
                 }
         # Also check required questions with no Answer row at all
-        answered_question_ids = set(
-            submission.answers.values_list("question_id", flat=True)
-        )
-        for question in submission.test.questions.filter(is_required=True):
+        answered_question_ids = {answer.question_id for answer in answers}
+        for question in required_questions:
             if question.id not in answered_question_ids:
                 validation_warnings[str(question.id)] = {
                     "question_title": question.title,
@@ -694,8 +1018,11 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        changes = {"submitted_at": timezone.now()}
+
         # If reopened from 'returned', archive previous grading before re-submitting
-        if submission.graded_at is not None:
+        reopened = submission.graded_at is not None
+        if reopened:
             history_entry = {
                 "grader_id": submission.graded_by_id,
                 "grader_name": (
@@ -706,23 +1033,31 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 "score": float(submission.score or 0) if submission.score is not None else None,
                 "feedback": submission.feedback,
             }
-            submission.grading_history = (submission.grading_history or []) + [history_entry]
+            changes["grading_history"] = (submission.grading_history or []) + [history_entry]
             # Clear grading fields
-            submission.graded_by = None
-            submission.graded_at = None
-            submission.feedback = ""
-            # Clear per-answer grading
-            submission.answers.update(points_earned=None, feedback="")
-
-        submission.status = "submitted"
-        submission.submitted_at = timezone.now()
+            changes.update(graded_by=None, graded_at=None, feedback="")
 
         # Calculate time spent if not already set
         if not submission.time_spent_minutes:
-            time_diff = submission.submitted_at - submission.started_at
-            submission.time_spent_minutes = int(time_diff.total_seconds() / 60)
+            time_diff = changes["submitted_at"] - submission.started_at
+            changes["time_spent_minutes"] = int(time_diff.total_seconds() / 60)
+
+        with transaction.atomic():
+            if reopened:
+                # Clear per-answer grading
+                submission.answers.update(points_earned=None, feedback="")
+
+            # Answers are final now; score objective questions, then sync
+            # the stored score and answer counts
+            auto_grade(Submission.objects.filter(pk=submission.pk))
+            submission.refresh_score()
 
-        submission.save()
+            # A double-click or the auto-submit sweep may have won the race
+            if not submission.transition("in_progress", "submitted", **changes):
+                transaction.set_rollback(True)
+                return self._transition_conflict()
+
+            index_submissions(Submission.objects.filter(pk=submission.pk))
 
         serializer = self.get_serializer(submission)
         return Response(serializer.data)
@@ -799,21 +1134,11 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # B.1.1 — Optimistic concurrency check
-        client_updated_at_raw = request.data.get("client_updated_at")
-        if client_updated_at_raw:
-            from django.utils.dateparse import parse_datetime
-            client_updated_at = parse_datetime(client_updated_at_raw)
-            if client_updated_at and submission.updated_at > client_updated_at:
-                serializer = self.get_serializer(submission)
-                return Response(
-                    {
-                        "error": "Submission has been updated elsewhere.",
-                        "conflict": True,
-                        "current_submission": serializer.data,
-                    },
-                    status=status.HTTP_409_CONFLICT,
-                )
+        if submission.is_expired:
+            return Response(
+                {"error": "The time limit for this test has expired"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         answers_payload = request.data.get("answers", [])
         if not isinstance(answers_payload, list) or len(answers_payload) == 0:
@@ -822,108 +1147,471 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Cache questions for this test for quick lookup
-        questions_by_id = {
-            str(q.id): q for q in submission.test.questions.all()
-        }
-
-        # Process each answer in a transaction
-        with transaction.atomic():
-            for item in answers_payload:
-                question_id = str(item.get("question"))
-                if not question_id or question_id not in questions_by_id:
-                    raise ValidationError("Invalid question specified")
-
-                question = questions_by_id[question_id]
-
-                # Get or create the Answer object
-                answer, _created = Answer.objects.get_or_create(
-                    submission=submission, question=question
-                )
+        # B.1.1 — Optimistic concurrency check, per answer: an item conflicts
+        # only if its own answer changed after the client's snapshot. Items
+        # may carry their own client_updated_at; the top-level one is the
+        # default for the rest.
+        default_snapshot = parse_datetime(
+            str(request.data.get("client_updated_at") or "")
+        )
 
-                # Clear non-file answer fields (file_answer is managed by upload/delete endpoints)
-                answer.text_answer = ""
-                answer.boolean_answer = None
-                answer.date_answer = None
-
-                # Update based on question type
-                qtype = question.question_type
-                if qtype in [
-                    "text",
-                    "essay",
-                    "reflection",
-                    "ministry_plan",
-                    "theological_position",
-                    "case_study",
-                    "sermon_outline",
-                    "scripture_reference",
-                ]:
-                    answer.text_answer = item.get("text_answer", "") or ""
-                elif qtype == "yes_no":
-                    # Accept explicit boolean or null to clear
-                    if "boolean_answer" in item:
-                        answer.boolean_answer = item.get("boolean_answer")
-                elif qtype == "document_upload":
-                    # File uploads should be handled via a dedicated upload endpoint
-                    # Keep as is; no update here from JSON-only payload
-                    pass
-                elif qtype in ["single_choice", "multiple_choice"]:
-                    option_ids = item.get("selected_options", []) or []
-                    # Validate options belong to this question
-                    valid_options = list(
-                        question.options.filter(id__in=option_ids).values_list(
-                            "id", flat=True
-                        )
-                    )
-                    if qtype == "single_choice" and len(valid_options) > 1:
-                        raise ValidationError(
-                            f"Question {question.id} expects a single option"
-                        )
-                    # Defer setting M2M until after saving
-                    answer.save()
-                    answer.selected_options.set(valid_options)
-                    continue  # Skip final save below since we already saved
-                else:
-                    # Unknown type; skip safely
-                    pass
+        def is_stale(answer, item):
+            snapshot = default_snapshot
+            if item.get("client_updated_at"):
+                snapshot = parse_datetime(str(item["client_updated_at"]))
+            return snapshot is not None and answer.updated_at > snapshot
 
-                answer.save()
+        with transaction.atomic():
+            _, _, conflicts = self._bulk_upsert_answers(
+                submission, answers_payload, is_stale=is_stale
+            )
 
+        self._reload_answers(submission)
         serializer = self.get_serializer(submission)
+        if conflicts:
+            # Non-conflicting items were saved; the client merges the rest
+            return Response(
+                {
+                    "error": "Some answers have been updated elsewhere.",
+                    "conflict": True,
+                    "conflicting_questions": [
+                        str(answer.question_id) for answer in conflicts
+                    ],
+                    "current_submission": serializer.data,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
         return Response(serializer.data)
 
     @extend_schema(
-        description="Upload a document for a document_upload question in an in-progress submission",
-        summary="Upload document",
+        description=(
+            "Delta autosave: send only the answers changed since the last ack, "
+            "each with the version it was based on. Returns a compact ack with "
+            "the new version of every accepted answer instead of the full "
+            "submission. Answers whose version is stale are not written and "
+            "are returned under 'conflicts' with their current content (409)."
+        ),
+        summary="Patch answers",
         request={
-            "multipart/form-data": {
+            "application/json": {
                 "type": "object",
                 "properties": {
-                    "question": {"type": "string", "format": "uuid"},
-                    "file": {"type": "string", "format": "binary"},
+                    "answers": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "question": {
+                                    "type": "string",
+                                    "format": "uuid",
+                                },
+                                "version": {
+                                    "type": "integer",
+                                    "description": "Version the edit is based "
+                                    "on; 0 or omitted for a new answer",
+                                },
+                                "text_answer": {"type": "string"},
+                                "boolean_answer": {"type": "boolean"},
+                                "date_answer": {
+                                    "type": "string",
+                                    "format": "date",
+                                },
+                                "selected_options": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "string",
+                                        "format": "uuid",
+                                    },
+                                },
+                            },
+                            "required": ["question"],
+                        },
+                    }
                 },
-                "required": ["question", "file"],
+                "required": ["answers"],
             }
         },
-        responses={200: SubmissionSerializer},
-    )
-    @action(detail=True, methods=["post"], url_path="upload")
-    def upload_document(self, request, pk=None):
-        """
-        Upload a document for a document_upload question.
-
-        Expected multipart form data:
-        - question: UUID of the document_upload question
-        - file: The file to upload
-        """
-        submission = self.get_object()
-
-        # Only the owner (student) can upload documents
-        if (
-            request.user.role == "student"
-            and submission.student != request.user
-        ):
-            return Response(
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "submission": {"type": "integer"},
+                    "answers": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "question": {
+                                    "type": "string",
+                                    "format": "uuid",
+                                },
+                                "answer_id": {
+                                    "type": "string",
+                                    "format": "uuid",
+                                },
+                                "version": {"type": "integer"},
+                            },
+                        },
+                    },
+                    "conflicts": {
+                        "type": "array",
+                        "items": {"type": "object"},
+                    },
+                },
+            }
+        },
+    )
+    @action(detail=True, methods=["post"], url_path="answers/delta")
+    def patch_answers(self, request, pk=None):
+        """
+        Apply only the changed answers of an in-progress submission.
+
+        Expected payload:
+        {
+          "answers": [
+            {"question": "<uuid>", "version": 3, "text_answer": "..."},
+            {"question": "<uuid>", "version": 0, "selected_options": ["<uuid>"]}
+          ]
+        }
+        """
+        submission = self.get_object()
+
+        if (
+            request.user.role == "student"
+            and submission.student != request.user
+        ):
+            return Response(
+                {"error": "You can only modify your own submission"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if submission.status != "in_progress":
+            return Response(
+                {"error": "Only in-progress submissions can be edited"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if submission.is_expired:
+            return Response(
+                {"error": "The time limit for this test has expired"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        answers_payload = request.data.get("answers", [])
+        if not isinstance(answers_payload, list) or len(answers_payload) == 0:
+            return Response(
+                {"error": "'answers' must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def is_stale(answer, item):
+            try:
+                base_version = int(item.get("version") or 0)
+            except (TypeError, ValueError):
+                raise ValidationError("'version' must be an integer")
+            return answer.version != base_version
+
+        with transaction.atomic():
+            answers, _, conflicts = self._bulk_upsert_answers(
+                submission, answers_payload, is_stale=is_stale
+            )
+
+        conflicting = {answer.question_id for answer in conflicts}
+        acked = [
+            {
+                "question": str(question_id),
+                "answer_id": str(answer.id),
+                "version": answer.version,
+            }
+            for question_id, answer in answers.items()
+            if question_id not in conflicting
+        ]
+        models.prefetch_related_objects(conflicts, "selected_options")
+        return Response(
+            {
+                "submission": submission.id,
+                "answers": acked,
+                "conflicts": AnswerStateSerializer(conflicts, many=True).data,
+            },
+            status=(
+                status.HTTP_409_CONFLICT if conflicts else status.HTTP_200_OK
+            ),
+        )
+
+    def _bulk_upsert_answers(self, submission, answers_payload, is_stale=None):
+        """
+        Apply an autosave payload with a constant number of queries.
+
+        Existing answers and their selected options are loaded once, missing
+        answers are bulk-created, changed rows are bulk-updated, and option
+        selections are diffed into one through-table insert and one delete.
+        Items whose content is unchanged are skipped entirely.
+
+        Must run inside a transaction: the existing answers are read with
+        select_for_update() so the staleness check and the write are atomic.
+
+        Args:
+            submission: The in-progress submission being written.
+            answers_payload: List of answer dicts from the request.
+            is_stale: Optional callable ``(answer, item) -> bool``; items whose
+                existing answer it flags are left untouched and reported as
+                conflicts.
+
+        Returns:
+            Tuple of (answers by question id, set of written question ids,
+            list of conflicting answers). Written answers carry their new
+            version.
+        """
+        questions_by_id = {
+            str(q.id): q for q in submission.test.questions.all()
+        }
+        options_by_question: dict[uuid.UUID, dict[str, uuid.UUID]] = {}
+        for option_id, question_id in QuestionOption.objects.filter(
+            question__test_id=submission.test_id
+        ).values_list("id", "question_id"):
+            options_by_question.setdefault(question_id, {})[
+                str(option_id)
+            ] = option_id
+
+        # Resolve the desired state of every answer before touching the DB
+        desired, items = {}, {}
+        for item in answers_payload:
+            question_id = str(item.get("question"))
+            if not question_id or question_id not in questions_by_id:
+                raise ValidationError("Invalid question specified")
+
+            question = questions_by_id[question_id]
+            # Non-file fields are cleared (file_answer is managed by the
+            # upload/delete endpoints)
+            state: dict[str, Any] = {
+                "text_answer": "",
+                "boolean_answer": None,
+                "date_answer": None,
+                "options": None,
+            }
+
+            qtype = question.question_type
+            if qtype in TEXT_QUESTION_TYPES:
+                state["text_answer"] = item.get("text_answer", "") or ""
+            elif qtype == "yes_no":
+                # Accept explicit boolean or null to clear
+                if "boolean_answer" in item:
+                    state["boolean_answer"] = item.get("boolean_answer")
+            elif qtype in ["single_choice", "multiple_choice"]:
+                # Silently drop options that don't belong to this question
+                valid = options_by_question.get(question.id, {})
+                option_ids = {
+                    valid[str(option_id)]
+                    for option_id in item.get("selected_options", []) or []
+                    if str(option_id) in valid
+                }
+                if qtype == "single_choice" and len(option_ids) > 1:
+                    raise ValidationError(
+                        f"Question {question.id} expects a single option"
+                    )
+                state["options"] = option_ids
+
+            desired[question.id] = state
+            items[question.id] = item
+
+        # Locked until the caller's transaction ends, so a concurrent save
+        # cannot pass the same version check and overwrite this one
+        existing = {
+            answer.question_id: answer
+            for answer in Answer.objects.select_for_update().filter(
+                submission=submission, question_id__in=desired.keys()
+            )
+        }
+        Through = Answer.selected_options.through
+        selected: dict[int, set[uuid.UUID]] = {}
+        for answer_id, option_id in Through.objects.filter(
+            answer__in=existing.values()
+        ).values_list("answer_id", "questionoption_id"):
+            selected.setdefault(answer_id, set()).add(option_id)
+
+        now = timezone.now()
+        scalar_fields = ["text_answer", "boolean_answer", "date_answer"]
+        to_create, to_update, written, conflicts = [], [], set(), []
+        for question_id, state in desired.items():
+            answer = existing.get(question_id)
+            if (
+                answer is not None
+                and is_stale is not None
+                and is_stale(answer, items[question_id])
+            ):
+                conflicts.append(answer)
+                continue
+            if answer is None:
+                answer = Answer(
+                    submission=submission,
+                    question_id=question_id,
+                    **{field: state[field] for field in scalar_fields},
+                )
+                answer.refresh_content_state(has_options=bool(state["options"]))
+                to_create.append(answer)
+                written.add(question_id)
+                continue
+
+            current_options = selected.get(answer.id, set())
+            scalars_changed = any(
+                getattr(answer, field) != state[field]
+                for field in scalar_fields
+            )
+            options_changed = (
+                state["options"] is not None
+                and state["options"] != current_options
+            )
+            if not (scalars_changed or options_changed):
+                continue
+
+            for field in scalar_fields:
+                setattr(answer, field, state[field])
+            answer.refresh_content_state(
+                has_options=bool(
+                    current_options
+                    if state["options"] is None
+                    else state["options"]
+                )
+            )
+            answer.answered_at = now
+            answer.updated_at = now
+            answer.version += 1
+            to_update.append(answer)
+            written.add(question_id)
+
+        if to_create:
+            to_create = self._create_answers(submission, to_create, conflicts)
+            written -= {answer.question_id for answer in conflicts}
+            existing.update({answer.question_id: answer for answer in to_create})
+        if to_update:
+            Answer.objects.bulk_update(
+                to_update,
+                scalar_fields
+                + [
+                    "word_count",
+                    "is_answered",
+                    "answered_at",
+                    "updated_at",
+                    "version",
+                ],
+            )
+
+        # Diff option selections into one insert and one delete
+        rows_to_add: list[models.Model] = []
+        rows_to_remove = models.Q()
+        for question_id in written:
+            wanted = desired[question_id]["options"]
+            if wanted is None:
+                continue
+            answer = existing[question_id]
+            current = selected.get(answer.id, set())
+            rows_to_add.extend(
+                Through(answer_id=answer.id, questionoption_id=option_id)
+                for option_id in wanted - current
+            )
+            removed = current - wanted
+            if removed:
+                rows_to_remove |= models.Q(
+                    answer_id=answer.id, questionoption_id__in=removed
+                )
+        if rows_to_remove:
+            Through.objects.filter(rows_to_remove).delete()
+        if rows_to_add:
+            Through.objects.bulk_create(rows_to_add)
+
+        if written:
+            self._touch_submission(submission)
+        return existing, written, conflicts
+
+    def _create_answers(self, submission, answers, conflicts):
+        """
+        Insert new answers, tolerating a concurrent save that created some
+        of them first.
+
+        Answers another request inserted meanwhile are left as they are;
+        their current rows are appended to `conflicts`.
+
+        Returns:
+            The answers actually created.
+        """
+        try:
+            with transaction.atomic():
+                return Answer.objects.bulk_create(answers)
+        except IntegrityError:
+            pass
+
+        created, taken = [], []
+        for answer in answers:
+            try:
+                with transaction.atomic():
+                    Answer.objects.bulk_create([answer])
+            except IntegrityError:
+                taken.append(answer.question_id)
+            else:
+                created.append(answer)
+        conflicts.extend(
+            Answer.objects.select_for_update().filter(
+                submission=submission, question_id__in=taken
+            )
+        )
+        return created
+
+    def _touch_submission(self, submission):
+        """
+        Advance submission.updated_at past the answers just written.
+
+        Clients use it as their concurrency snapshot, so it must not lag
+        behind any answer's updated_at. Uses a queryset update to avoid
+        firing submission save signals on every autosave.
+        """
+        submission.updated_at = timezone.now()
+        Submission.objects.filter(pk=submission.pk).update(
+            updated_at=submission.updated_at
+        )
+
+    def _reload_answers(self, submission):
+        """Replace the stale answers prefetch from get_object after writes."""
+        getattr(submission, "_prefetched_objects_cache", {}).pop(
+            "answers", None
+        )
+        models.prefetch_related_objects(
+            [submission],
+            "answers__question__options",
+            "answers__selected_options",
+        )
+
+    @extend_schema(
+        description="Upload a document for a document_upload question in an in-progress submission",
+        summary="Upload document",
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string", "format": "uuid"},
+                    "file": {"type": "string", "format": "binary"},
+                },
+                "required": ["question", "file"],
+            }
+        },
+        responses={200: SubmissionSerializer},
+    )
+    @action(detail=True, methods=["post"], url_path="upload")
+    def upload_document(self, request, pk=None):
+        """
+        Upload a document for a document_upload question.
+
+        Expected multipart form data:
+        - question: UUID of the document_upload question
+        - file: The file to upload
+        """
+        submission = self.get_object()
+
+        # Only the owner (student) can upload documents
+        if (
+            request.user.role == "student"
+            and submission.student != request.user
+        ):
+            return Response(
                 {
                     "error": "You can only upload documents to your own submission"
                 },
@@ -938,6 +1626,12 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if submission.is_expired:
+            return Response(
+                {"error": "The time limit for this test has expired"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         question_id = request.data.get("question")
         uploaded_file = request.FILES.get("file")
 
@@ -1012,7 +1706,10 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
         # Save the file
         answer.file_answer = uploaded_file
+        if not created:
+            answer.version += 1
         answer.save()
+        self._touch_submission(submission)
 
         serializer = self.get_serializer(submission)
         return Response(serializer.data)
@@ -1063,6 +1760,12 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if submission.is_expired:
+            return Response(
+                {"error": "The time limit for this test has expired"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         question_id = request.data.get("question")
 
         if not question_id:
@@ -1104,7 +1807,9 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         # Delete the file and clear the field
         answer.file_answer.delete(save=False)  # Delete the file from storage
         answer.file_answer = None
+        answer.version += 1
         answer.save()
+        self._touch_submission(submission)
 
         serializer = self.get_serializer(submission)
         return Response(serializer.data)
@@ -1165,10 +1870,24 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Another grader holds a live claim from the grading queue
+        if (
+            submission.claimed_by_id not in (None, request.user.id)
+            and submission.claimed_until
+            and submission.claimed_until > timezone.now()
+        ):
+            return Response(
+                {
+                    "error": "Submission is claimed by another grader.",
+                    "conflict": True,
+                    "claimed_until": submission.claimed_until,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
         # B.2.1 — Optimistic concurrency check for grading
         client_updated_at_raw = request.data.get("client_updated_at")
         if client_updated_at_raw:
-            from django.utils.dateparse import parse_datetime
             client_updated_at = parse_datetime(client_updated_at_raw)
             if client_updated_at and submission.updated_at > client_updated_at:
                 return Response(
@@ -1208,37 +1927,610 @@ class SubmissionViewSet(viewsets.ModelViewSet):
                         f"Answer with id {answer_id} not found"
                     )
 
-                # Validate points earned
-                if points_earned is None:
-                    raise ValidationError(
-                        "points_earned is required for each answer"
-                    )
-
-                if points_earned < 0:
-                    raise ValidationError("points_earned cannot be negative")
-
-                if (
-                    answer.question.max_points
-                    and points_earned > answer.question.max_points
-                ):
-                    raise ValidationError(
-                        f"points_earned cannot exceed max_points ({answer.question.max_points})"
-                    )
+                self._validate_points(points_earned, answer.question.max_points)
 
-                # Update answer
+                # Update answer; pre-filled auto-grader points only stay
+                # auto-graded if the lecturer left them unchanged
+                answer.is_auto_graded = (
+                    answer.is_auto_graded
+                    and points_earned == answer.points_earned
+                )
                 answer.points_earned = points_earned
                 answer.feedback = feedback
                 answer.is_flagged = is_flagged
-                answer.save()
+                answer.save(
+                    update_fields=[
+                        "points_earned",
+                        "is_auto_graded",
+                        "feedback",
+                        "is_flagged",
+                        "updated_at",
+                    ]
+                )
 
             # Update submission
-            submission.feedback = general_feedback
-            submission.graded_by = request.user
-            submission.graded_at = timezone.now()
-            submission.status = "graded"
-            if return_submission:
-                submission.status = "returned"
-            submission.save()
+            submission.refresh_score()
+            transitioned = submission.transition(
+                submission.status,
+                "returned" if return_submission else "graded",
+                feedback=general_feedback,
+                graded_by=request.user,
+                graded_at=timezone.now(),
+                claimed_by=None,
+                claimed_until=None,
+            )
+            if not transitioned:
+                # The student reopened it (or another grader returned it)
+                transaction.set_rollback(True)
+                return self._transition_conflict()
 
         serializer = SubmissionSerializer(submission)
         return Response(serializer.data)
+
+    @extend_schema(
+        description=(
+            "Grade many submissions of one test in a single request (staff "
+            "only). Points are validated against each question's max_points "
+            "and everything is applied atomically; a submission whose status "
+            "changed concurrently fails the whole batch with 409."
+        ),
+        summary="Bulk grade submissions",
+        request={
+            "application/json": {
+                "type": "object",
+                "properties": {
+                    "test": {"type": "integer"},
+                    "submissions": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "submission_id": {"type": "integer"},
+                                "answers": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "answer_id": {"type": "integer"},
+                                            "points_earned": {
+                                                "type": "number",
+                                                "format": "float",
+                                            },
+                                            "feedback": {"type": "string"},
+                                            "is_flagged": {"type": "boolean"},
+                                        },
+                                        "required": [
+                                            "answer_id",
+                                            "points_earned",
+                                        ],
+                                    },
+                                },
+                                "feedback": {"type": "string"},
+                                "return": {"type": "boolean"},
+                            },
+                            "required": ["submission_id"],
+                        },
+                    },
+                },
+                "required": ["test", "submissions"],
+            }
+        },
+        responses={200: SubmissionListSerializer(many=True)},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-grade",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def bulk_grade(self, request):
+        """
+        Grade many submissions of a test at once.
+
+        Answers are validated against one preloaded map of question
+        max_points and written with bulk_update; the status, feedback and
+        grader stamp of every submission are set with a single UPDATE, and
+        the notifications are queued as one batch.
+        """
+        test_id, error = self._parse_test_id(request.data.get("test"))
+        if error:
+            return error
+        grades = request.data.get("submissions")
+        if not isinstance(grades, list) or not grades:
+            return Response(
+                {"error": "'submissions' must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        grades_by_id = {}
+        for grade in grades:
+            submission_id = (
+                grade.get("submission_id") if isinstance(grade, dict) else None
+            )
+            if not submission_id:
+                raise ValidationError(
+                    "submission_id is required for each submission"
+                )
+            answers = grade.get("answers", [])
+            if not isinstance(answers, list) or not all(
+                isinstance(answer_data, dict) for answer_data in answers
+            ):
+                raise ValidationError("'answers' must be a list")
+            try:
+                submission_id = int(submission_id)
+                for answer_data in answers:
+                    if answer_data.get("answer_id"):
+                        int(answer_data["answer_id"])
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "Submission and answer ids must be integers"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            grades_by_id[submission_id] = grade
+
+        # Only submissions of this test the user may see and grade
+        gradable_statuses = ["submitted", "returned", "graded"]
+        previous_status = dict(
+            self.get_queryset()
+            .prefetch_related(None)
+            .filter(
+                test_id=test_id,
+                id__in=grades_by_id,
+                status__in=gradable_statuses,
+            )
+            .values_list("id", "status")
+        )
+        missing = sorted(set(grades_by_id) - set(previous_status))
+        if missing:
+            return Response(
+                {
+                    "error": "Only submitted or returned submissions of this test can be graded",
+                    "submission_ids": missing,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        max_points = dict(
+            Question.objects.filter(test_id=test_id).values_list(
+                "id", "max_points"
+            )
+        )
+        answers = Answer.objects.filter(
+            submission_id__in=grades_by_id,
+            id__in=[
+                answer_data.get("answer_id")
+                for grade in grades
+                for answer_data in grade.get("answers", [])
+            ],
+        ).only(
+            "id",
+            "submission_id",
+            "question_id",
+            "points_earned",
+            "is_auto_graded",
+        )
+        answers = {str(answer.id): answer for answer in answers}
+
+        # Submissions another grader holds a live queue claim on stay theirs
+        now = timezone.now()
+        submissions = Submission.objects.filter(id__in=grades_by_id)
+        gradable = submissions.unclaimed(request.user, now)
+        claimed_elsewhere = sorted(
+            set(grades_by_id) - set(gradable.values_list("id", flat=True))
+        )
+        if claimed_elsewhere:
+            return Response(
+                {
+                    "error": "Some submissions are claimed by another grader.",
+                    "conflict": True,
+                    "submission_ids": claimed_elsewhere,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        updated_answers = []
+        for submission_id, grade in grades_by_id.items():
+            for answer_data in grade.get("answers", []):
+                answer_id = answer_data.get("answer_id")
+                if not answer_id:
+                    raise ValidationError(
+                        "answer_id is required for each answer"
+                    )
+                answer = answers.get(str(answer_id))
+                if answer is None or answer.submission_id != submission_id:
+                    raise ValidationError(
+                        f"Answer with id {answer_id} not found"
+                    )
+
+                points_earned = answer_data.get("points_earned")
+                self._validate_points(
+                    points_earned, max_points[answer.question_id]
+                )
+
+                answer.is_auto_graded = (
+                    answer.is_auto_graded
+                    and points_earned == answer.points_earned
+                )
+                answer.points_earned = points_earned
+                answer.feedback = answer_data.get("feedback", "")
+                answer.is_flagged = answer_data.get("is_flagged", False)
+                # Keeps the client_updated_at conflict check of autosave
+                # and grade_submission working, as Answer.save() would
+                answer.updated_at = now
+                updated_answers.append(answer)
+
+        returned_ids = [
+            submission_id
+            for submission_id, grade in grades_by_id.items()
+            if grade.get("return", False)
+        ]
+
+        with transaction.atomic():
+            Answer.objects.bulk_update(
+                updated_answers,
+                [
+                    "points_earned",
+                    "feedback",
+                    "is_flagged",
+                    "is_auto_graded",
+                    "updated_at",
+                ],
+                batch_size=500,
+            )
+            gradable.refresh_scores()
+            # Still unclaimed by others: a claim taken since the check
+            # makes the count come up short and rolls everything back
+            transitioned = gradable.transition(
+                gradable_statuses,
+                models.Case(
+                    models.When(
+                        id__in=returned_ids, then=models.Value("returned")
+                    ),
+                    default=models.Value("graded"),
+                ),
+                feedback=models.Case(
+                    *[
+                        models.When(
+                            id=submission_id,
+                            then=models.Value(grade.get("feedback", "")),
+                        )
+                        for submission_id, grade in grades_by_id.items()
+                    ],
+                    output_field=models.TextField(),
+                ),
+                graded_by=request.user,
+                graded_at=now,
+                claimed_by=None,
+                claimed_until=None,
+            )
+            if transitioned != len(grades_by_id):
+                # A student reopened one (or another grader returned it)
+                transaction.set_rollback(True)
+                return self._transition_conflict()
+
+        # Queryset updates bypass the post_save invalidation and notifications
+        invalidate_test_statistics(test_id)
+        graded_ids = sorted(
+            submission_id
+            for submission_id, previous in previous_status.items()
+            if submission_id not in returned_ids and previous != "graded"
+        )
+        newly_returned_ids = [
+            submission_id
+            for submission_id in returned_ids
+            if previous_status[submission_id] != "returned"
+        ]
+        if graded_ids or newly_returned_ids:
+            async_task(
+                "apps.notifications.tasks.send_submission_grading_notifications",
+                graded_ids,
+                newly_returned_ids,
+            )
+
+        serializer = SubmissionListSerializer(
+            submissions.select_related("test", "student", "graded_by")
+            .with_completion()
+            .order_by("id"),
+            many=True,
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        description=(
+            "Claim the oldest submitted, unclaimed submission of a test for "
+            "grading (staff only). Concurrent graders always receive "
+            "different submissions. The claim is a lease that lapses after "
+            f"{GRADING_LEASE_MINUTES} minutes; asking again returns your own "
+            "live claim first. `submission` is null once nothing is left."
+        ),
+        summary="Claim next ungraded submission",
+        request={
+            "application/json": {
+                "type": "object",
+                "properties": {"test": {"type": "integer"}},
+                "required": ["test"],
+            }
+        },
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "submission": {"type": "object", "nullable": True},
+                    "claimed_until": {
+                        "type": "string",
+                        "format": "date-time",
+                        "nullable": True,
+                    },
+                    "remaining": {"type": "integer"},
+                    "claimed": {"type": "integer"},
+                },
+            }
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="claim-next",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def claim_next(self, request):
+        """
+        Hand out the next ungraded submission of a test.
+
+        The candidate row is picked with SELECT ... FOR UPDATE SKIP LOCKED,
+        so graders claiming at the same moment skip each other's rows
+        instead of waiting on them or receiving the same one.
+        """
+        test_id, error = self._parse_test_id(request.data.get("test"))
+        if error:
+            return error
+
+        now = timezone.now()
+        claimed_until = now + timedelta(minutes=GRADING_LEASE_MINUTES)
+        queue = (
+            self.get_queryset()
+            .prefetch_related(None)
+            .filter(test_id=test_id, status="submitted")
+        )
+
+        with transaction.atomic():
+            submission_id = (
+                queue.unclaimed(request.user, now)
+                .select_for_update(skip_locked=True, of=("self",))
+                .order_by(
+                    # Own live claim first, then the oldest hand-in
+                    models.Case(
+                        models.When(claimed_by=request.user, then=0),
+                        default=1,
+                    ),
+                    "submitted_at",
+                    "id",
+                )
+                .values_list("id", flat=True)
+                .first()
+            )
+            if submission_id is not None:
+                Submission.objects.filter(id=submission_id).update(
+                    claimed_by=request.user, claimed_until=claimed_until
+                )
+
+        data = {"submission": None, "claimed_until": None}
+        if submission_id is not None:
+            data["submission"] = SubmissionSerializer(
+                self.get_queryset().get(id=submission_id),
+                context=self.get_serializer_context(),
+            ).data
+            data["claimed_until"] = claimed_until
+        data.update(queue.grading_queue_counts(now))
+        return Response(data)
+
+    @extend_schema(
+        description="Give up your claim on a submission so another grader can take it.",
+        summary="Release grading claim",
+        request=None,
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "released": {"type": "boolean"},
+                    "remaining": {"type": "integer"},
+                    "claimed": {"type": "integer"},
+                },
+            }
+        },
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="release-claim",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def release_claim(self, request, pk=None):
+        """Release the requesting grader's claim on a submission."""
+        submission = self.get_object()
+        released = Submission.objects.filter(
+            id=submission.id, claimed_by=request.user
+        ).update(claimed_by=None, claimed_until=None)
+
+        counts = (
+            self.get_queryset()
+            .filter(test_id=submission.test_id)
+            .grading_queue_counts()
+        )
+        return Response({"released": bool(released), **counts})
+
+    @extend_schema(
+        description="Count the submissions of a test left to grade and how many are claimed.",
+        summary="Grading queue counters",
+        parameters=[
+            OpenApiParameter(
+                "test", OpenApiTypes.INT, required=True, description="Test ID"
+            )
+        ],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "remaining": {"type": "integer"},
+                    "claimed": {"type": "integer"},
+                },
+            }
+        },
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="grading-queue",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def grading_queue(self, request):
+        """Remaining and claimed counters of a test's grading queue."""
+        test_id, error = self._parse_test_id(
+            request.query_params.get("test"), "'test' query parameter"
+        )
+        if error:
+            return error
+        return Response(
+            self.get_queryset()
+            .filter(test_id=test_id)
+            .grading_queue_counts()
+        )
+
+    @extend_schema(
+        description=(
+            "List near-duplicate answers by other students for each essay, "
+            "reflection, ministry plan and sermon outline answer of a "
+            "submission. Similarity is the MinHash estimate of the Jaccard "
+            "similarity of word shingles; candidates come from the LSH index "
+            "built when submissions are handed in."
+        ),
+        summary="Similar answers",
+        parameters=[
+            OpenApiParameter(
+                "threshold",
+                OpenApiTypes.FLOAT,
+                required=False,
+                description=(
+                    "Minimum similarity between 0 and 1 "
+                    f"(default {DEFAULT_SIMILARITY_THRESHOLD})"
+                ),
+            )
+        ],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "threshold": {"type": "number"},
+                    "answers": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "answer_id": {"type": "integer"},
+                                "question_id": {
+                                    "type": "string",
+                                    "format": "uuid",
+                                },
+                                "question_title": {"type": "string"},
+                                "matches": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "answer_id": {"type": "integer"},
+                                            "submission_id": {"type": "integer"},
+                                            "student_id": {"type": "integer"},
+                                            "student_name": {"type": "string"},
+                                            "similarity": {"type": "number"},
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+            }
+        },
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="similar-answers",
+        permission_classes=[IsAuthenticated, IsLecturerOrAdmin],
+    )
+    def similar_answers(self, request, pk=None):
+        """Near-duplicate answers by other students, per indexed answer."""
+        submission = self.get_object()
+        try:
+            threshold = float(
+                request.query_params.get("threshold", DEFAULT_SIMILARITY_THRESHOLD)
+            )
+        except ValueError:
+            threshold = None
+        if threshold is None or not 0 <= threshold <= 1:
+            return Response(
+                {"error": "threshold must be a number between 0 and 1"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        matches = find_similar_answers(submission, threshold)
+        answers = [
+            {
+                "answer_id": answer.id,
+                "question_id": str(answer.question_id),
+                "question_title": answer.question.title,
+                "matches": matches[answer.id],
+            }
+            for answer in submission.answers.all()
+            if answer.id in matches
+        ]
+        test = submission.test
+        if test.randomize_questions:
+            answers = shuffle_questions(
+                answers,
+                submission.id,
+                test.definition_version,
+                id_field="question_id",
+            )
+        return Response({"threshold": threshold, "answers": answers})
+
+    def _validate_points(self, points_earned, max_points):
+        """Reject points outside 0..max_points for one answer."""
+        if points_earned is None:
+            raise ValidationError("points_earned is required for each answer")
+
+        if points_earned < 0:
+            raise ValidationError("points_earned cannot be negative")
+
+        if max_points and points_earned > max_points:
+            raise ValidationError(
+                f"points_earned cannot exceed max_points ({max_points})"
+            )
+
+    def _transition_conflict(self):
+        """Response for a status transition lost to a concurrent request."""
+        return Response(
+            {
+                "error": "Submission status was changed by another request.",
+                "conflict": True,
+            },
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    def _parse_test_id(self, value, name="'test'"):
+        """
+        Return (test_id, None) for a test id parameter, or (None, a 400
+        response) when it is missing or not an integer.
+        """
+        if not value:
+            return None, Response(
+                {"error": f"{name} is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            return int(value), None
+        except (TypeError, ValueError):
+            return None, Response(
+                {"error": f"{name} must be a test id"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
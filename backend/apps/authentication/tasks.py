@@ -1,10 +1,11 @@
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from logging import getLogger
 
+from apps.notifications.outbox import queue_emails
+
 logger = getLogger(__name__)
 
 User = get_user_model()
@@ -43,14 +44,14 @@ def send_password_reset_email(user_id: int, uid: str, token: str):
         html_message = render_to_string("emails/password_reset.html", context)
         plain_message = render_to_string("emails/password_reset.txt", context)
 
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
+        # Queue and send right away; a failed send is retried by the outbox
+        queue_emails(
+            [user.email],
+            subject,
+            plain_message,
+            html_body=html_message,
+            template="emails/password_reset",
+            send_now=True,
         )
 
     except User.DoesNotExist:
@@ -5,9 +5,11 @@ from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
+from django.core.mail import get_connection
 from unittest.mock import patch
 
 from apps.authentication.tasks import send_password_reset_email
+from apps.notifications.models import OutboundEmail
 
 User = get_user_model()
 
@@ -122,12 +124,12 @@ class AuthenticationTasksTestCase(TestCase):
         # No email should be sent
         self.assertEqual(len(mail.outbox), 0)
 
-    @patch("apps.authentication.tasks.send_mail")
-    def test_send_password_reset_email_failure(self, mock_send_mail):
+    @patch(
+        "django.core.mail.backends.locmem.EmailBackend.send_messages",
+        side_effect=Exception("Email sending failed"),
+    )
+    def test_send_password_reset_email_failure(self, mock_send_messages):
         """Test handling of email sending failure."""
-        # Mock send_mail to raise an exception
-        mock_send_mail.side_effect = Exception("Email sending failed")
-
         # This should not raise an exception
         try:
             send_password_reset_email(self.user.id, self.uid, self.token)
@@ -136,6 +138,12 @@ class AuthenticationTasksTestCase(TestCase):
                 "send_password_reset_email raised an exception when it shouldn't"
             )
 
+        # The email stays in the outbox for a retry
+        email = OutboundEmail.objects.get(to_email=self.user.email)
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, "Email sending failed")
+
     @patch("apps.authentication.tasks.render_to_string")
     def test_send_password_reset_email_template_rendering(self, mock_render):
         """Test that email templates are rendered correctly."""
@@ -195,16 +203,18 @@ class AuthenticationTasksTestCase(TestCase):
         self.assertEqual(email.to, [self.user.email])
         self.assertEqual(len(email.to), 1)
 
-    @patch("apps.authentication.tasks.logger")
+    @patch("apps.notifications.outbox.logger")
     def test_send_password_reset_email_logging_on_error(self, mock_logger):
         """Test that errors are logged properly."""
-        with patch("apps.authentication.tasks.send_mail") as mock_send_mail:
-            mock_send_mail.side_effect = Exception("Email sending failed")
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages"
+        ) as mock_send_messages:
+            mock_send_messages.side_effect = Exception("Email sending failed")
 
             send_password_reset_email(self.user.id, self.uid, self.token)
 
-            # Check that exception was logged
-            mock_logger.exception.assert_called_once()
+            # Check that the failed send was logged
+            mock_logger.warning.assert_called_once()
 
     def test_send_password_reset_email_different_roles_urls(self):
         """Test that different user roles get different reset URLs."""
@@ -238,12 +248,14 @@ class AuthenticationTasksTestCase(TestCase):
         self.assertIn("reset-password", admin_email.body)
 
     def test_send_password_reset_email_fail_silently_false(self):
-        """Test that send_mail is called with fail_silently=False."""
-        with patch("apps.authentication.tasks.send_mail") as mock_send_mail:
+        """Test that the mail connection is opened with fail_silently=False."""
+        with patch(
+            "apps.notifications.outbox.get_connection", wraps=get_connection
+        ) as mock_get_connection:
             send_password_reset_email(self.user.id, self.uid, self.token)
 
-            # Check that send_mail was called with fail_silently=False
-            call_kwargs = mock_send_mail.call_args[1]
+            # Check that the connection was opened with fail_silently=False
+            call_kwargs = mock_get_connection.call_args[1]
             self.assertFalse(call_kwargs["fail_silently"])
 
     def test_send_password_reset_email_subject_format(self):
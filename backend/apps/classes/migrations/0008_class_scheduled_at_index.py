@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0007_attendance_verified'),
+        ('cohorts', '0004_remove_cohort_unique_cohort_name_and_more'),
+        ('courses', '0003_alter_course_lecturer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['scheduled_at'], name='class_scheduled_at_idx'),
+        ),
+    ]
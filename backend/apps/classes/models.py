@@ -31,6 +31,11 @@ class Class(models.Model):
         ordering = ["scheduled_at"]
         verbose_name = "Class"
         verbose_name_plural = "Classes"
+        indexes = [
+            models.Index(
+                fields=["scheduled_at"], name="class_scheduled_at_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.course.name} - {self.title}"
@@ -2,7 +2,7 @@ from rest_framework.response import Response
 from rest_framework import status, viewsets, generics
 from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Q
+from django.db.models import Avg, Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from apps.core.utils import get_resource_meta
@@ -386,29 +386,14 @@ class DashboardStatsView(generics.GenericAPIView):
         else:
             assessment_stats["avg_submission_rate"] = 0
 
-        # Calculate average test score
-        completed_submissions = submissions.filter(
-            status__in=["graded", "returned"]
+        # Calculate average test score from stored submission totals
+        avg_score = submissions.filter(status="graded").aggregate(
+            avg=Avg("earned_points")
+        )["avg"]
+        assessment_stats["avg_test_score"] = (
+            round(avg_score, 2) if avg_score is not None else 0
         )
 
-        if completed_submissions.exists():
-            total_score = 0
-            submission_count = 0
-
-            for submission in completed_submissions:
-                if submission.score is not None:
-                    total_score += submission.score
-                    submission_count += 1
-
-            if submission_count > 0:
-                assessment_stats["avg_test_score"] = round(
-                    total_score / submission_count, 2
-                )
-            else:
-                assessment_stats["avg_test_score"] = 0
-        else:
-            assessment_stats["avg_test_score"] = 0
-
         # Invitation Statistics (Admin only)
         if is_admin:
             invitations = Invitation.objects.all()
@@ -1,7 +1,7 @@
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from apps.invitations.models import Invitation
+from apps.notifications.outbox import queue_emails
 
 
 def send_invitation_email(invitation_id: int):
@@ -28,12 +28,12 @@ def send_invitation_email(invitation_id: int):
     html_message = render_to_string("emails/invitation.html", context)
     plain_message = render_to_string("emails/invitation.txt", context)
 
-    # Send email
-    send_mail(
+    # Queue and send right away; a failed send is retried by the outbox
+    queue_emails(
+        [invitation.email],
         subject,
         plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [invitation.email],
-        html_message=html_message,
-        fail_silently=False,
+        html_body=html_message,
+        template="emails/invitation",
+        send_now=True,
     )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin
-from .models import Notification, PushSubscription
+from .models import Notification, OutboundEmail, PushSubscription
 
 
 @admin.register(Notification)
@@ -81,3 +81,61 @@ class PushSubscriptionAdmin(ModelAdmin):
             },
         ),
     )
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(ModelAdmin):
+    list_display = [
+        "to_email",
+        "subject",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    ]
+    list_filter = ["status", "template", "created_at"]
+    search_fields = ["to_email", "subject"]
+    readonly_fields = [
+        "to_email",
+        "subject",
+        "body",
+        "html_body",
+        "template",
+        "attempts",
+        "last_error",
+        "created_at",
+        "sent_at",
+    ]
+    ordering = ["-created_at"]
+
+    fieldsets = (
+        (
+            "Message",
+            {
+                "fields": (
+                    "to_email",
+                    "subject",
+                    "template",
+                    "body",
+                    "html_body",
+                )
+            },
+        ),
+        (
+            "Delivery",
+            {
+                "fields": (
+                    "status",
+                    "attempts",
+                    "next_attempt_at",
+                    "last_error",
+                    "created_at",
+                    "sent_at",
+                )
+            },
+        ),
+    )
+
+    def has_add_permission(self, request):
+        """Emails are queued programmatically"""
+        return False
@@ -0,0 +1,169 @@
+"""
+Per-user notification inbox state for cheap polling.
+
+Each user has two cache entries: an unread counter, counted once on a miss
+and then adjusted in place by notification inserts and read changes, and an
+inbox version token that is replaced on every such change. The version
+makes up the inbox ETag, so an unchanged inbox is answered with a 304
+before any query runs.
+
+Inbox pages are keyset-paginated on (created_at, id), newest first: the
+cursor is the position of the last notification of the previous page, so
+every page is an index range scan of (user, -created_at) no matter how deep
+the client scrolls.
+"""
+
+import base64
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+
+from .models import Notification
+
+INBOX_CACHE_TIMEOUT = 60 * 60 * 24
+# Lifetime of an unread count taken on a cache miss; see get_unread_count
+UNREAD_RECOUNT_TIMEOUT = 60 * 5
+INBOX_PAGE_SIZE = 20
+INBOX_MAX_PAGE_SIZE = 100
+
+
+def unread_count_cache_key(user_id):
+    return f"notifications_unread_{user_id}"
+
+
+def inbox_version_cache_key(user_id):
+    return f"notifications_inbox_version_{user_id}"
+
+
+def get_unread_count(user_id):
+    """
+    Return the user's unread count, counting only on a cache miss.
+
+    A change committed between the COUNT and the add is lost: its
+    inbox_changed found no counter to adjust, and the count may predate
+    it. Counts taken here therefore expire after UNREAD_RECOUNT_TIMEOUT,
+    which bounds how long such a drift can be served.
+    """
+    key = unread_count_cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        # add, not set: keep a counter another process created meanwhile
+        cache.add(key, count, timeout=UNREAD_RECOUNT_TIMEOUT)
+    return count
+
+
+def get_inbox_version(user_id):
+    """
+    Return the token identifying the current state of the user's inbox.
+
+    When the cache does not keep the token (a dummy cache, or an eviction
+    between the add and the get) a fresh one is returned, so the response
+    gets an ETag no later request can match rather than a constant one.
+    """
+    key = inbox_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        token = uuid.uuid4().hex
+        cache.add(key, token, timeout=INBOX_CACHE_TIMEOUT)
+        version = cache.get(key) or token
+    return version
+
+
+def inbox_changed(unread_deltas):
+    """
+    Record inserted or read notifications.
+
+    Args:
+        unread_deltas: Dict of user id to the change of the user's unread
+            count (positive for new notifications, negative for read ones)
+    """
+    for user_id, delta in unread_deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(unread_count_cache_key(user_id), delta)
+        except ValueError:
+            # Not cached: the next read counts from the database
+            pass
+
+    version = uuid.uuid4().hex
+    cache.set_many(
+        {
+            inbox_version_cache_key(user_id): version
+            for user_id in unread_deltas
+        },
+        timeout=INBOX_CACHE_TIMEOUT,
+    )
+
+
+def inbox_etag(user_id, request):
+    """ETag of an inbox response: the inbox version plus the request URL."""
+    digest = hashlib.blake2b(
+        request.get_full_path().encode(), digest_size=8
+    ).hexdigest()
+    return f'"{get_inbox_version(user_id)}-{digest}"'
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match covers `etag`."""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in etags
+
+
+def encode_cursor(notification):
+    position = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Return the (created_at, id) position encoded in a cursor.
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        raw_created_at, raw_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        created_at = parse_datetime(raw_created_at)
+        notification_id = int(raw_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if created_at is None:
+        raise ValueError("Invalid cursor")
+    return created_at, notification_id
+
+
+def inbox_page(queryset, cursor=None, page_size=INBOX_PAGE_SIZE):
+    """
+    Return one page of notifications, newest first, after `cursor`.
+
+    Returns:
+        Tuple of (notifications, next_cursor); next_cursor is None on the
+        last page
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, id__lt=notification_id)
+        )
+    notifications = list(
+        queryset.order_by("-created_at", "-id")[: page_size + 1]
+    )
+    if len(notifications) <= page_size:
+        return notifications, None
+    notifications = notifications[:page_size]
+    return notifications, encode_cursor(notifications[-1])
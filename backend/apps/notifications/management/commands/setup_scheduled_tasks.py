@@ -13,7 +13,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write("Setting up scheduled notification tasks...")
 
-        # Check for upcoming classes every 5 minutes
+        # Safety net for the per-class reminder schedules, every 5 minutes
         schedule, created = Schedule.objects.update_or_create(
             name="check_upcoming_classes",
             defaults={
@@ -37,13 +37,39 @@ class Command(BaseCommand):
                 )
             )
 
-        # Auto-submit expired tests every 5 minutes
+        # Auto-submit expired tests every minute (an indexed lookup on
+        # Submission.expires_at, so cheap to run often)
         schedule, created = Schedule.objects.update_or_create(
             name="auto_submit_expired_tests",
             defaults={
                 "func": "apps.assessments.tasks.auto_submit_expired_tests",
                 "schedule_type": Schedule.MINUTES,
-                "minutes": 5,
+                "minutes": 1,
+                "repeats": -1,  # Repeat indefinitely
+            },
+        )
+
+        if created:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Created scheduled task: auto_submit_expired_tests (every minute)"
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Updated scheduled task: auto_submit_expired_tests (every minute)"
+                )
+            )
+
+        # Drain the email outbox every minute; picks up retries that are
+        # due and anything a queued drain task missed
+        schedule, created = Schedule.objects.update_or_create(
+            name="deliver_email_outbox",
+            defaults={
+                "func": "apps.notifications.outbox.deliver_outbox",
+                "schedule_type": Schedule.MINUTES,
+                "minutes": 1,
                 "repeats": -1,  # Repeat indefinitely
             },
         )
@@ -51,13 +77,13 @@ class Command(BaseCommand):
         if created:
             self.stdout.write(
                 self.style.SUCCESS(
-                    "Created scheduled task: auto_submit_expired_tests (every 5 minutes)"
+                    "Created scheduled task: deliver_email_outbox (every minute)"
                 )
             )
         else:
             self.stdout.write(
                 self.style.SUCCESS(
-                    "Updated scheduled task: auto_submit_expired_tests (every 5 minutes)"
+                    "Updated scheduled task: deliver_email_outbox (every minute)"
                 )
             )
 
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0008_class_scheduled_at_index'),
+        ('notifications', '0003_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reminder_type', models.CharField(choices=[('class_starting', 'Class Starting')], max_length=50)),
+                ('scheduled_at', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('class_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='classes.class')),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+                'constraints': [models.UniqueConstraint(fields=('class_session', 'reminder_type'), name='unique_class_reminder')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -49,13 +50,22 @@ class Notification(models.Model):
         return f"{self.user.email} - {self.title}"
 
     def mark_as_read(self):
-        """Mark notification as read"""
-        from django.utils import timezone
+        """
+        Mark notification as read.
 
-        if not self.read:
-            self.read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=["read", "read_at"])
+        The row is flipped with a conditional UPDATE, so of two concurrent
+        calls only the one that changed it decrements the unread counter.
+        """
+        from .inbox import inbox_changed
+
+        read_at = timezone.now()
+        updated = Notification.objects.filter(pk=self.pk, read=False).update(
+            read=True, read_at=read_at
+        )
+        self.read = True
+        if updated:
+            self.read_at = read_at
+            inbox_changed({self.user_id: -1})
 
 
 class PushSubscription(models.Model):
@@ -86,3 +96,79 @@ class PushSubscription(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.endpoint[:50]}..."
+
+
+class OutboundEmail(models.Model):
+    """
+    A rendered email waiting in (or sent from) the outbox. Rows are drained
+    in batches by apps.notifications.outbox.deliver_outbox; failed sends stay
+    pending with a backed-off next_attempt_at until MAX_ATTEMPTS is reached.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    template = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Template the message was rendered from",
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="outbound_email_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject}"
+
+
+class ClassReminder(models.Model):
+    """
+    Idempotency ledger for class reminders: a row is claimed right before a
+    reminder is sent, so the scheduled task and the safety-net sweep can
+    never both send it. `scheduled_at` is the class time the reminder was
+    sent for; a rescheduled class gets a fresh reminder.
+    """
+
+    REMINDER_TYPES = [
+        ("class_starting", "Class Starting"),
+    ]
+
+    class_session = models.ForeignKey(
+        "classes.Class", on_delete=models.CASCADE, related_name="reminders"
+    )
+    reminder_type = models.CharField(max_length=50, choices=REMINDER_TYPES)
+    scheduled_at = models.DateTimeField()
+    sent_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-sent_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["class_session", "reminder_type"],
+                name="unique_class_reminder",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.class_session_id} - {self.reminder_type}"
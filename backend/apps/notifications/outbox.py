@@ -0,0 +1,176 @@
+"""
+Transactional email outbox.
+
+Callers render a message once and queue one OutboundEmail row per recipient
+instead of calling send_mail. deliver_outbox drains due rows in batches over
+a single mail connection (one SMTP session per batch rather than per
+message); a failed message stays in the outbox with an exponentially
+backed-off next_attempt_at, so retries never run inside a request and a
+failure is kept on the row rather than only logged.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models, transaction
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+# Delay before retry n is RETRY_BASE_DELAY * 2 ** (n - 1): 1, 2, 4, 8 minutes
+RETRY_BASE_DELAY = timedelta(minutes=1)
+# Claimed rows are hidden from other workers for this long; a worker that
+# dies mid-batch leaves them to be picked up again afterwards
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_emails(
+    recipients, subject, body, html_body="", template="", send_now=False
+):
+    """
+    Queue one message with the same rendered content per recipient.
+
+    Args:
+        recipients: Email addresses; blank ones are skipped
+        subject: Subject line
+        body: Plain text body
+        html_body: Optional HTML alternative
+        template: Name of the template the content was rendered from
+        send_now: Deliver the queued rows in this process right away (for
+            callers that already run in a worker); otherwise a drain task is
+            queued
+
+    Returns:
+        List of the queued OutboundEmail rows
+    """
+    emails = OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                to_email=recipient,
+                subject=subject,
+                body=body,
+                html_body=html_body,
+                template=template,
+            )
+            for recipient in dict.fromkeys(recipients)
+            if recipient
+        ],
+        batch_size=OUTBOX_BATCH_SIZE,
+    )
+    if not emails:
+        return emails
+
+    if send_now:
+        deliver_outbox(email_ids=[email.id for email in emails])
+    else:
+        async_task("apps.notifications.outbox.deliver_outbox")
+    return emails
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt of a message that failed `attempts` times."""
+    return RETRY_BASE_DELAY * 2 ** (attempts - 1)
+
+
+def _claim_due(now, email_ids, batch_size):
+    """Lock a batch of due pending rows and push them out of reach of other workers."""
+    with transaction.atomic():
+        due = OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+            status="pending", next_attempt_at__lte=now
+        )
+        if email_ids is not None:
+            due = due.filter(id__in=email_ids)
+        claimed = list(due.order_by("next_attempt_at", "id")[:batch_size])
+        OutboundEmail.objects.filter(
+            id__in=[email.id for email in claimed]
+        ).update(next_attempt_at=now + CLAIM_TIMEOUT)
+    return claimed
+
+
+def _to_message(email):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.to_email],
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def deliver_outbox(email_ids=None, batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Send a batch of due outbox messages over one mail connection.
+
+    Args:
+        email_ids: Restrict the batch to these rows (default: any due row)
+        batch_size: Maximum number of messages sent by this call; a full
+            batch queues another drain for the rest
+
+    Returns:
+        Dict with the number of messages sent, scheduled for retry and
+        given up on
+    """
+    now = timezone.now()
+    claimed = _claim_due(now, email_ids, batch_size)
+    if not claimed:
+        return {"sent": 0, "retrying": 0, "failed": 0}
+
+    delivered = []
+    errors = {}
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for email in claimed:
+                try:
+                    connection.send_messages([_to_message(email)])
+                except Exception as e:
+                    errors[email.id] = e
+                else:
+                    delivered.append(email.id)
+    except Exception as e:
+        logger.exception("Error opening mail connection for outbox batch")
+        for email in claimed:
+            if email.id not in delivered:
+                errors.setdefault(email.id, e)
+
+    OutboundEmail.objects.filter(id__in=delivered).update(
+        status="sent",
+        sent_at=timezone.now(),
+        attempts=models.F("attempts") + 1,
+        last_error="",
+    )
+
+    failed = [email for email in claimed if email.id in errors]
+    for email in failed:
+        email.attempts += 1
+        email.last_error = str(errors[email.id])
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = "failed"
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+    OutboundEmail.objects.bulk_update(
+        failed, ["attempts", "last_error", "status", "next_attempt_at"]
+    )
+
+    given_up = sum(1 for email in failed if email.status == "failed")
+    if failed:
+        logger.warning(
+            f"Outbox batch: {len(failed)} of {len(claimed)} emails failed, "
+            f"{given_up} after {MAX_ATTEMPTS} attempts"
+        )
+    if email_ids is None and len(claimed) == batch_size:
+        async_task("apps.notifications.outbox.deliver_outbox")
+
+    return {
+        "sent": len(delivered),
+        "retrying": len(failed) - given_up,
+        "failed": given_up,
+    }
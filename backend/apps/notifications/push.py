@@ -0,0 +1,174 @@
+"""
+Concurrent Web Push delivery.
+
+A batch of (subscription, payload) messages is encrypted and sent from a
+bounded thread pool. Every push-service origin gets one keep-alive
+requests.Session per process, shared by the pool threads, and the signed
+VAPID headers for an origin are cached until shortly before they expire
+instead of being signed for every message. Subscriptions the push service
+reports as gone (404/410) are deleted with one query after the batch.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .models import PushSubscription
+
+logger = logging.getLogger(__name__)
+
+PUSH_MAX_WORKERS = 8
+PUSH_TIMEOUT_SECONDS = 10
+# Push services accept VAPID tokens valid for up to 24 hours
+VAPID_VALIDITY_SECONDS = 12 * 60 * 60
+# Re-sign this long before the cached token expires
+VAPID_RENEW_MARGIN_SECONDS = 5 * 60
+GONE_STATUSES = {404, 410}
+
+PushMessage = namedtuple("PushMessage", ["subscription", "payload"])
+
+# origin -> keep-alive session, and origin -> (VAPID headers, expiry)
+_sessions: dict[str, requests.Session] = {}
+_vapid_headers: dict[str, tuple[dict, int]] = {}
+_lock = threading.Lock()
+
+
+def push_origin(endpoint):
+    """scheme://host[:port] of a push endpoint; the VAPID audience."""
+    url = urlparse(endpoint)
+    return f"{url.scheme}://{url.netloc}"
+
+
+@lru_cache(maxsize=1)
+def _vapid_key(private_key):
+    from py_vapid import Vapid
+
+    return Vapid.from_string(private_key=private_key)
+
+
+def vapid_headers(origin, now=None):
+    """
+    Return the VAPID headers for a push-service origin, signing new ones
+    only when the cached token is missing or about to expire.
+    """
+    now = int(now if now is not None else time.time())
+    with _lock:
+        cached = _vapid_headers.get(origin)
+        if cached and cached[1] - VAPID_RENEW_MARGIN_SECONDS > now:
+            return cached[0]
+
+        expires_at = now + VAPID_VALIDITY_SECONDS
+        headers = _vapid_key(settings.VAPID_PRIVATE_KEY).sign(
+            {
+                "sub": f"mailto:{settings.VAPID_EMAIL}",
+                "aud": origin,
+                "exp": expires_at,
+            }
+        )
+        _vapid_headers[origin] = (headers, expires_at)
+        return headers
+
+
+def push_session(origin):
+    """Keep-alive session for an origin, pooled for PUSH_MAX_WORKERS threads."""
+    with _lock:
+        session = _sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            session.mount(
+                origin,
+                HTTPAdapter(pool_connections=1, pool_maxsize=PUSH_MAX_WORKERS),
+            )
+            _sessions[origin] = session
+        return session
+
+
+def _send(message):
+    """
+    Encrypt and POST one message. Runs in a pool thread, so it must not
+    touch the database.
+
+    Returns:
+        HTTP status code, or None when the request itself failed
+    """
+    from pywebpush import WebPusher
+
+    subscription = message.subscription
+    origin = push_origin(subscription.endpoint)
+    try:
+        response = WebPusher(
+            {
+                "endpoint": subscription.endpoint,
+                "keys": {
+                    "p256dh": subscription.p256dh,
+                    "auth": subscription.auth,
+                },
+            },
+            requests_session=push_session(origin),
+        ).send(
+            message.payload,
+            headers=vapid_headers(origin),
+            timeout=PUSH_TIMEOUT_SECONDS,
+        )
+    except Exception as e:
+        logger.error(
+            f"Error sending push notification to user {subscription.user_id}: {str(e)}"
+        )
+        return None
+
+    if response.status_code > 202:
+        logger.error(
+            f"WebPush error for user {subscription.user_id}: "
+            f"{response.status_code} {response.reason}"
+        )
+    return response.status_code
+
+
+def deliver_push_messages(messages, max_workers=PUSH_MAX_WORKERS):
+    """
+    Send a batch of PushMessages concurrently and prune dead subscriptions.
+
+    Args:
+        messages: List of PushMessage(subscription, payload)
+        max_workers: Upper bound on concurrent requests
+
+    Returns:
+        Dict with the number of messages sent, failed and of subscriptions
+        pruned
+    """
+    if not messages:
+        return {"sent": 0, "failed": 0, "pruned": 0}
+    if not settings.VAPID_PRIVATE_KEY:
+        logger.error("VAPID_PRIVATE_KEY is not configured; push not sent")
+        return {"sent": 0, "failed": len(messages), "pruned": 0}
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(messages))
+    ) as pool:
+        statuses = list(pool.map(_send, messages))
+
+    sent = sum(1 for status in statuses if status is not None and status <= 202)
+    dead_subscription_ids = {
+        message.subscription.id
+        for message, status in zip(messages, statuses)
+        if status in GONE_STATUSES
+    }
+    if dead_subscription_ids:
+        PushSubscription.objects.filter(id__in=dead_subscription_ids).delete()
+        logger.info(
+            f"Deleted {len(dead_subscription_ids)} invalid push subscriptions"
+        )
+
+    return {
+        "sent": sent,
+        "failed": len(messages) - sent,
+        "pruned": len(dead_subscription_ids),
+    }
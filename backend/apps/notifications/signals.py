@@ -1,6 +1,34 @@
 """
 Signal handlers for the notifications app.
-This file will be populated with signal handlers when integrating with other apps.
 """
 
-# Signal handlers will be added here during integration phase
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import logging
+
+from apps.classes.models import Class
+from .tasks import cancel_class_reminder, schedule_class_reminder
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Class)
+def handle_class_saved(sender, instance, **kwargs):
+    """Schedule the starting reminder of a new or rescheduled class."""
+    try:
+        schedule_class_reminder(instance.id, instance.scheduled_at)
+    except Exception as e:
+        logger.error(
+            f"Error scheduling reminder for class {instance.id}: {str(e)}"
+        )
+
+
+@receiver(post_delete, sender=Class)
+def handle_class_deleted(sender, instance, **kwargs):
+    """Cancel the starting reminder of a deleted class."""
+    try:
+        cancel_class_reminder(instance.id)
+    except Exception as e:
+        logger.error(
+            f"Error cancelling reminder for class {instance.id}: {str(e)}"
+        )
@@ -3,24 +3,36 @@ Background tasks for sending notifications using Django Q.
 """
 
 import logging
-from typing import List, Optional
-from django.conf import settings
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, List, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
+from django_q.tasks import async_task, schedule
 
 from apps.users.models import User
 from apps.classes.models import Class
 from apps.assessments.models import Test, Submission
-from .models import Notification, PushSubscription
+from .inbox import inbox_changed
+from .models import ClassReminder, Notification, PushSubscription
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT when fanning one notification out to many users
+NOTIFICATION_BATCH_SIZE = 500
+# Notifications per push delivery task
+PUSH_BATCH_SIZE = 100
+# Students are reminded this long before a class starts
+CLASS_REMINDER_LEAD = timedelta(minutes=15)
+
 
 def create_notification(
     user_id: int,
     notification_type: str,
     title: str,
     message: str,
-    data: dict = None,
+    data: Optional[dict] = None,
     send_push: bool = True,
 ) -> Optional[int]:
     """
@@ -46,6 +58,7 @@ def create_notification(
             message=message,
             data=data or {},
         )
+        inbox_changed({user_id: 1})
 
         # Send push notification if requested
         if send_push:
@@ -63,6 +76,77 @@ def create_notification(
         return None
 
 
+def fan_out_notification(
+    user_ids: List[int],
+    notification_type: str,
+    title: str,
+    message: str,
+    data: Optional[dict] = None,
+    send_push: bool = True,
+) -> List[int]:
+    """
+    Create the same notification for many users.
+
+    The rows are inserted with bulk_create, the recipients' cached unread
+    counters are bumped, and push delivery is handed to the task queue in
+    batches of PUSH_BATCH_SIZE, so the calling task never waits on push
+    services.
+
+    Args:
+        user_ids: IDs of the users to notify
+        notification_type: Type of notification
+        title: Notification title
+        message: Notification message
+        data: Additional context data
+        send_push: Whether to send push notifications
+
+    Returns:
+        IDs of the created notifications
+    """
+    notifications = Notification.objects.bulk_create(
+        [
+            Notification(
+                user_id=user_id,
+                type=notification_type,
+                title=title,
+                message=message,
+                data=data or {},
+            )
+            for user_id in user_ids
+        ],
+        batch_size=NOTIFICATION_BATCH_SIZE,
+    )
+    notification_ids = [notification.id for notification in notifications]
+    inbox_changed(Counter(user_ids))
+
+    if send_push:
+        for i in range(0, len(notification_ids), PUSH_BATCH_SIZE):
+            async_task(
+                "apps.notifications.tasks.send_push_notifications",
+                notification_ids[i : i + PUSH_BATCH_SIZE],
+            )
+    return notification_ids
+
+
+def _push_payload(notification: Notification) -> str:
+    """JSON payload shown by the service worker for a notification."""
+    import json
+
+    return json.dumps(
+        {
+            "title": notification.title,
+            "body": notification.message,
+            "icon": "/icons/icon-192x192.png",
+            "badge": "/icons/badge-72x72.png",
+            "data": {
+                "notification_id": notification.id,
+                "type": notification.type,
+                **notification.data,
+            },
+        }
+    )
+
+
 def send_push_notification(user_id: int, notification_id: int):
     """
     Send browser push notification to user's subscribed devices.
@@ -71,82 +155,56 @@ def send_push_notification(user_id: int, notification_id: int):
         user_id: User ID
         notification_id: Notification ID
     """
-    try:
-        from pywebpush import webpush, WebPushException
-        import json
-
-        notification = Notification.objects.get(id=notification_id)
-        subscriptions = PushSubscription.objects.filter(user_id=user_id)
+    send_push_notifications([notification_id])
 
-        if not subscriptions.exists():
-            logger.info(f"No push subscriptions found for user {user_id}")
-            return
 
-        # Prepare push notification payload
-        payload = json.dumps(
-            {
-                "title": notification.title,
-                "body": notification.message,
-                "icon": "/icons/icon-192x192.png",
-                "badge": "/icons/badge-72x72.png",
-                "data": {
-                    "notification_id": notification.id,
-                    "type": notification.type,
-                    **notification.data,
-                },
-            }
-        )
+def send_push_notifications(notification_ids: List[int]) -> int:
+    """
+    Send browser push notifications for a batch of notifications to every
+    subscribed device of their users. Notifications and subscriptions are
+    loaded with one query each and the messages are delivered concurrently
+    by apps.notifications.push, which also prunes dead subscriptions.
 
-        # VAPID claims
-        vapid_claims = {
-            "sub": f"mailto:{settings.VAPID_EMAIL}",
-        }
+    Args:
+        notification_ids: IDs of the notifications to deliver
 
-        # Send to all user's subscriptions
-        for subscription in subscriptions:
-            try:
-                subscription_info = {
-                    "endpoint": subscription.endpoint,
-                    "keys": {
-                        "p256dh": subscription.p256dh,
-                        "auth": subscription.auth,
-                    },
-                }
-
-                webpush(
-                    subscription_info=subscription_info,
-                    data=payload,
-                    vapid_private_key=settings.VAPID_PRIVATE_KEY,
-                    vapid_claims=vapid_claims,
-                )
-
-                logger.info(
-                    f"Push notification sent to user {user_id} endpoint {subscription.endpoint[:50]}"
-                )
-
-            except WebPushException as e:
-                logger.error(f"WebPush error for user {user_id}: {str(e)}")
-                # If subscription is no longer valid, delete it
-                if e.response and e.response.status_code in [404, 410]:
-                    subscription.delete()
-                    logger.info(
-                        f"Deleted invalid subscription for user {user_id}"
-                    )
-
-    except Notification.DoesNotExist:
-        logger.error(f"Notification {notification_id} not found")
-    except Exception as e:
-        logger.error(
-            f"Error sending push notification to user {user_id}: {str(e)}"
+    Returns:
+        Number of push messages sent
+    """
+    from .push import PushMessage, deliver_push_messages
+
+    notifications = list(Notification.objects.filter(id__in=notification_ids))
+    subscriptions: Dict[int, List[PushSubscription]] = {}
+    for subscription in PushSubscription.objects.filter(
+        user_id__in={notification.user_id for notification in notifications}
+    ):
+        subscriptions.setdefault(subscription.user_id, []).append(subscription)
+
+    messages: List[PushMessage] = []
+    for notification in notifications:
+        payload = _push_payload(notification)
+        messages.extend(
+            PushMessage(subscription, payload)
+            for subscription in subscriptions.get(notification.user_id, [])
         )
 
+    result = deliver_push_messages(messages)
+    logger.info(
+        f"Sent {result['sent']} of {len(messages)} push messages for "
+        f"{len(notifications)} notifications"
+    )
+    return result["sent"]
 
-def send_class_starting_notification(class_id: int):
+
+def send_class_starting_notification(class_id: int) -> bool:
     """
     Send notification to all students in a cohort when class is starting soon.
 
     Args:
         class_id: ID of the class starting soon
+
+    Returns:
+        False if the notifications could not be sent
     """
     try:
         class_obj = Class.objects.select_related(
@@ -154,15 +212,19 @@ def send_class_starting_notification(class_id: int):
         ).get(id=class_id)
 
         # Get all students enrolled in the cohort
-        enrolled_students = User.objects.filter(
-            enrollments__cohort=class_obj.cohort,
-            role="student",
-            is_active=True,
-        ).distinct()
+        student_ids = list(
+            User.objects.filter(
+                enrollments__cohort=class_obj.cohort,
+                role="student",
+                is_active=True,
+            )
+            .distinct()
+            .values_list("id", flat=True)
+        )
 
-        if not enrolled_students.exists():
+        if not student_ids:
             logger.info(f"No students found for class {class_id}")
-            return
+            return True
 
         # Format time remaining
         time_diff = class_obj.scheduled_at - timezone.now()
@@ -182,20 +244,19 @@ def send_class_starting_notification(class_id: int):
             "zoom_join_url": class_obj.zoom_join_url,
         }
 
-        # Create notification for each student
-        for student in enrolled_students:
-            create_notification(
-                user_id=student.id,
-                notification_type="class_starting",
-                title=title,
-                message=message,
-                data=data,
-                send_push=True,
-            )
+        fan_out_notification(
+            student_ids,
+            notification_type="class_starting",
+            title=title,
+            message=message,
+            data=data,
+            send_push=True,
+        )
 
         logger.info(
-            f"Class starting notifications sent for class {class_id} to {enrolled_students.count()} students"
+            f"Class starting notifications sent for class {class_id} to {len(student_ids)} students"
         )
+        return True
 
     except Class.DoesNotExist:
         logger.error(f"Class {class_id} not found")
@@ -203,6 +264,7 @@ def send_class_starting_notification(class_id: int):
         logger.error(
             f"Error sending class starting notification for class {class_id}: {str(e)}"
         )
+    return False
 
 
 def send_test_notification(
@@ -230,8 +292,9 @@ def send_test_notification(
                 role="student",
                 is_active=True,
             ).distinct()
+        recipient_ids = list(recipients.values_list("id", flat=True))
 
-        if not recipients.exists():
+        if not recipient_ids:
             logger.info(f"No recipients found for test {test_id} notification")
             return
 
@@ -271,19 +334,17 @@ def send_test_notification(
         if test.available_until:
             data["deadline"] = test.available_until.isoformat()
 
-        # Create notification for each recipient
-        for recipient in recipients:
-            create_notification(
-                user_id=recipient.id,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                data=data,
-                send_push=False,  # In-app only for test notifications
-            )
+        fan_out_notification(
+            recipient_ids,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            data=data,
+            send_push=False,  # In-app only for test notifications
+        )
 
         logger.info(
-            f"Test notifications ({notification_type}) sent for test {test_id} to {recipients.count()} students"
+            f"Test notifications ({notification_type}) sent for test {test_id} to {len(recipient_ids)} students"
         )
 
     except Test.DoesNotExist:
@@ -502,47 +563,218 @@ def send_submission_auto_submitted_notification(submission_id: int):
         )
 
 
+def send_submission_auto_submitted_notifications(submission_ids: List[int]):
+    """
+    Notify students about a batch of auto-submitted submissions.
+
+    Args:
+        submission_ids: IDs of submissions auto-submitted in one sweep
+    """
+    submissions = Submission.objects.select_related(
+        "test", "test__course", "student"
+    ).filter(id__in=submission_ids)
+
+    sent = 0
+    for submission in submissions:
+        try:
+            create_notification(
+                user_id=submission.student.id,
+                notification_type="submission_auto_submitted",
+                title=f"Test Auto-Submitted: {submission.test.title}",
+                message=(
+                    f"Your test '{submission.test.title}' was automatically "
+                    f"submitted because the time limit expired."
+                ),
+                data={
+                    "submission_id": submission.id,
+                    "test_id": submission.test.id,
+                    "test_title": submission.test.title,
+                    "course_name": submission.test.course.name,
+                },
+                send_push=True,
+            )
+            sent += 1
+        except Exception as e:
+            logger.error(
+                f"Error sending auto-submit notification for submission {submission.id}: {str(e)}"
+            )
+
+    logger.info(f"Sent {sent} auto-submitted notifications")
+    return sent
+
+
+def send_submission_grading_notifications(
+    graded_ids: List[int], returned_ids: List[int]
+):
+    """
+    Send the notifications for a batch of submissions graded or returned in
+    one bulk grading request; the batch counterpart of the Submission
+    post_save handler, which bulk updates bypass.
+
+    Args:
+        graded_ids: IDs of submissions newly moved to graded
+        returned_ids: IDs of submissions newly moved to returned
+    """
+    # B.7.3 — Only the first grade notifies; re-grades are silent
+    first_graded = [
+        submission_id
+        for submission_id, history in Submission.objects.filter(
+            id__in=graded_ids
+        ).values_list("id", "grading_history")
+        if not history
+    ]
+    for submission_id in first_graded:
+        send_submission_notification(submission_id, "submission_graded")
+
+    for submission_id in returned_ids:
+        send_submission_returned_notification_to_student(submission_id)
+        send_submission_notification(submission_id, "submission_returned")
+
+    sent = len(first_graded) + len(returned_ids)
+    logger.info(f"Sent grading notifications for {sent} submissions")
+    return sent
+
+
+def _class_reminder_name(class_id: int) -> str:
+    return f"class_reminder_{class_id}"
+
+
+def schedule_class_reminder(class_id: int, scheduled_at):
+    """
+    (Re)schedule the class starting reminder as a one-off task that runs
+    CLASS_REMINDER_LEAD before the class. A class that starts sooner than
+    that is reminded right away; one in the past is not reminded.
+
+    Args:
+        class_id: ID of the class
+        scheduled_at: Start time of the class
+    """
+    cancel_class_reminder(class_id)
+
+    now = timezone.now()
+    if scheduled_at <= now:
+        return
+
+    remind_at = scheduled_at - CLASS_REMINDER_LEAD
+    if remind_at <= now:
+        async_task("apps.notifications.tasks.send_class_reminder", class_id)
+        logger.info(f"Queued class starting reminder for class {class_id}")
+        return
+
+    schedule(
+        "apps.notifications.tasks.send_class_reminder",
+        class_id,
+        schedule_type="O",  # One-time task
+        next_run=remind_at,
+        name=_class_reminder_name(class_id),
+    )
+    logger.info(
+        f"Scheduled class starting reminder for class {class_id} at {remind_at}"
+    )
+
+
+def cancel_class_reminder(class_id: int):
+    """Cancel the scheduled reminder of a class, if any."""
+    from django_q.models import Schedule
+
+    Schedule.objects.filter(name=_class_reminder_name(class_id)).delete()
+
+
+def claim_class_reminder(
+    class_obj: Class, reminder_type: str = "class_starting"
+) -> bool:
+    """
+    Record in the ledger that a reminder is being sent for the class at its
+    current scheduled_at.
+
+    Returns:
+        True if the caller should send the reminder, False if it was
+        already sent for this class time
+    """
+    # Sent before, for an earlier class time: the class was rescheduled
+    if (
+        ClassReminder.objects.filter(
+            class_session=class_obj, reminder_type=reminder_type
+        )
+        .exclude(scheduled_at=class_obj.scheduled_at)
+        .update(scheduled_at=class_obj.scheduled_at, sent_at=timezone.now())
+    ):
+        return True
+
+    try:
+        with transaction.atomic():
+            ClassReminder.objects.create(
+                class_session=class_obj,
+                reminder_type=reminder_type,
+                scheduled_at=class_obj.scheduled_at,
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def send_class_reminder(class_id: int):
+    """
+    Send the class starting reminder unless it was already sent for the
+    class's current time.
+
+    Args:
+        class_id: ID of the class
+    """
+    class_obj = Class.objects.filter(id=class_id).first()
+    if class_obj is None:
+        logger.info(f"Class {class_id} no longer exists, skipping reminder")
+        return
+
+    now = timezone.now()
+    if class_obj.scheduled_at <= now:
+        logger.info(f"Class {class_id} already started, skipping reminder")
+        return
+    if class_obj.scheduled_at - CLASS_REMINDER_LEAD > now + timedelta(minutes=1):
+        # Moved later after this run was scheduled; its new schedule sends it
+        logger.info(f"Class {class_id} was rescheduled, skipping reminder")
+        return
+
+    if not claim_class_reminder(class_obj):
+        logger.info(f"Reminder for class {class_id} was already sent")
+        return
+
+    if not send_class_starting_notification(class_id):
+        # Not sent after all: release the claim so the sweep retries it
+        ClassReminder.objects.filter(
+            class_session=class_obj,
+            reminder_type="class_starting",
+            scheduled_at=class_obj.scheduled_at,
+        ).delete()
+
+
 def check_upcoming_classes():
     """
-    Check for classes starting in the next 15-30 minutes and send notifications.
-    This should be run as a scheduled task every 5-10 minutes.
+    Safety net for the per-class reminder schedules: remind classes that
+    start within CLASS_REMINDER_LEAD and have no ledger entry for their
+    current time (e.g. a lost task). Run every 5 minutes.
     """
     try:
         now = timezone.now()
-        # Check for classes starting in 15 minutes (±2 minutes window)
-        start_time = now + timezone.timedelta(minutes=13)
-        end_time = now + timezone.timedelta(minutes=17)
-
-        upcoming_classes = Class.objects.filter(
-            scheduled_at__gte=start_time, scheduled_at__lte=end_time
-        ).select_related("course", "cohort")
-
-        for class_obj in upcoming_classes:
-            # Check if notification has already been sent
-            # We do this by checking if any student in the cohort has a notification for this class
-            students = User.objects.filter(
-                enrollments__cohort=class_obj.cohort,
-                role="student",
-                is_active=True,
-            ).first()
-
-            if students:
-                # Check if notification already exists
-                existing = Notification.objects.filter(
-                    user=students,
-                    type="class_starting",
-                    data__class_id=class_obj.id,
-                    created_at__gte=now - timezone.timedelta(minutes=20),
-                ).exists()
-
-                if not existing:
-                    send_class_starting_notification(class_obj.id)
-                    logger.info(
-                        f"Scheduled class starting notification for class {class_obj.id}"
-                    )
+        reminded = ClassReminder.objects.filter(
+            class_session=OuterRef("pk"),
+            reminder_type="class_starting",
+            scheduled_at=OuterRef("scheduled_at"),
+        )
+        missed = list(
+            Class.objects.filter(
+                scheduled_at__gt=now,
+                scheduled_at__lte=now + CLASS_REMINDER_LEAD,
+            )
+            .exclude(Exists(reminded))
+            .values_list("id", flat=True)
+        )
+
+        for class_id in missed:
+            send_class_reminder(class_id)
 
         logger.info(
-            f"Checked upcoming classes, found {upcoming_classes.count()} classes"
+            f"Checked upcoming classes, sent {len(missed)} missed reminders"
         )
 
     except Exception as e:
@@ -0,0 +1,188 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.assessments.tasks import send_bulk_test_notification
+from apps.notifications.models import OutboundEmail
+from apps.notifications.outbox import (
+    MAX_ATTEMPTS,
+    deliver_outbox,
+    queue_emails,
+    retry_delay,
+)
+from apps.notifications.test_tasks import NotificationFixtureMixin
+
+LOCMEM_SEND = "django.core.mail.backends.locmem.EmailBackend.send_messages"
+
+
+def _fail_for(*addresses):
+    """send_messages stand-in that fails for the given recipients."""
+    real_send = mail.backends.locmem.EmailBackend.send_messages
+
+    def send_messages(backend, messages):
+        if any(
+            address in message.to
+            for message in messages
+            for address in addresses
+        ):
+            raise ConnectionError("Mailbox unavailable")
+        return real_send(backend, messages)
+
+    return send_messages
+
+
+class EmailOutboxTestCase(TestCase):
+    """Queueing, batched delivery and retries."""
+
+    def _queue(self, recipients):
+        with patch("apps.notifications.outbox.async_task") as mock_async:
+            emails = queue_emails(
+                recipients, "Subject", "Body", html_body="<p>Body</p>"
+            )
+        return emails, mock_async
+
+    def test_queue_skips_blank_and_duplicate_recipients(self):
+        emails, mock_async = self._queue(
+            ["a@example.com", "", "b@example.com", "a@example.com"]
+        )
+
+        self.assertEqual(
+            [email.to_email for email in emails],
+            ["a@example.com", "b@example.com"],
+        )
+        self.assertEqual(
+            OutboundEmail.objects.filter(status="pending").count(), 2
+        )
+        mock_async.assert_called_once_with(
+            "apps.notifications.outbox.deliver_outbox"
+        )
+        self.assertEqual(mail.outbox, [])
+
+    def test_batch_is_sent_over_one_connection(self):
+        self._queue([f"user{i}@example.com" for i in range(5)])
+
+        with patch(
+            "apps.notifications.outbox.get_connection", wraps=get_connection
+        ) as mock_get_connection:
+            result = deliver_outbox()
+
+        self.assertEqual(result, {"sent": 5, "retrying": 0, "failed": 0})
+        self.assertEqual(mock_get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, ["user0@example.com"])
+        self.assertEqual(mail.outbox[0].alternatives[0][0], "<p>Body</p>")
+        self.assertFalse(OutboundEmail.objects.exclude(status="sent").exists())
+
+    def test_failed_email_is_retried_with_backoff(self):
+        self._queue(["ok@example.com", "down@example.com"])
+
+        with patch(LOCMEM_SEND, _fail_for("down@example.com")):
+            result = deliver_outbox()
+
+        self.assertEqual(result, {"sent": 1, "retrying": 1, "failed": 0})
+        failed = OutboundEmail.objects.get(to_email="down@example.com")
+        self.assertEqual(failed.status, "pending")
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.last_error, "Mailbox unavailable")
+        self.assertGreater(
+            failed.next_attempt_at,
+            timezone.now() + retry_delay(1) - timedelta(seconds=5),
+        )
+
+        # Not due yet
+        self.assertEqual(deliver_outbox()["sent"], 0)
+
+        OutboundEmail.objects.filter(id=failed.id).update(
+            next_attempt_at=timezone.now()
+        )
+        self.assertEqual(deliver_outbox()["sent"], 1)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, "sent")
+        self.assertEqual(failed.attempts, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        emails, _ = self._queue(["down@example.com"])
+        OutboundEmail.objects.filter(id=emails[0].id).update(
+            attempts=MAX_ATTEMPTS - 1
+        )
+
+        with patch(LOCMEM_SEND, _fail_for("down@example.com")):
+            result = deliver_outbox()
+
+        self.assertEqual(result, {"sent": 0, "retrying": 0, "failed": 1})
+        self.assertEqual(OutboundEmail.objects.get().status, "failed")
+
+    def test_connection_failure_keeps_batch_for_retry(self):
+        self._queue(["a@example.com", "b@example.com"])
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.open",
+            side_effect=ConnectionRefusedError("SMTP down"),
+        ):
+            result = deliver_outbox()
+
+        self.assertEqual(result, {"sent": 0, "retrying": 2, "failed": 0})
+        self.assertEqual(
+            list(OutboundEmail.objects.values_list("last_error", flat=True)),
+            ["SMTP down", "SMTP down"],
+        )
+
+    def test_full_batch_queues_another_drain(self):
+        self._queue([f"user{i}@example.com" for i in range(3)])
+
+        with patch("apps.notifications.outbox.async_task") as mock_async:
+            deliver_outbox(batch_size=2)
+            self.assertEqual(mock_async.call_count, 1)
+            deliver_outbox(batch_size=2)
+            self.assertEqual(mock_async.call_count, 1)
+
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_send_now_delivers_only_its_own_rows(self):
+        self._queue(["queued@example.com"])
+
+        queue_emails(["now@example.com"], "Subject", "Body", send_now=True)
+
+        self.assertEqual(
+            [message.to for message in mail.outbox], [["now@example.com"]]
+        )
+        self.assertEqual(
+            OutboundEmail.objects.get(to_email="queued@example.com").status,
+            "pending",
+        )
+
+
+class BulkTestEmailTestCase(NotificationFixtureMixin, TestCase):
+    """Bulk test notifications render once and go through the outbox."""
+
+    def test_rendered_once_and_queued_per_recipient(self):
+        students = self._enroll_students(5)
+        self.test.status = "published"
+        self.test.save()
+
+        with (
+            patch(
+                "apps.assessments.tasks.render_to_string",
+                wraps=render_to_string,
+            ) as mock_render,
+            patch("apps.notifications.outbox.async_task"),
+        ):
+            send_bulk_test_notification(self.test.id, "published")
+
+        # One html and one text rendering for the whole cohort
+        self.assertEqual(mock_render.call_count, 2)
+        self.assertCountEqual(
+            OutboundEmail.objects.values_list("to_email", flat=True),
+            [student.email for student in students],
+        )
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list("template", flat=True)),
+            {"emails/test_published"},
+        )
+        # Nothing sent from the calling task itself
+        self.assertEqual(mail.outbox, [])
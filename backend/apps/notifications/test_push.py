@@ -0,0 +1,219 @@
+import base64
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.notifications import push
+from apps.notifications.models import Notification, PushSubscription
+from apps.notifications.push import PushMessage, deliver_push_messages
+from apps.notifications.tasks import send_push_notifications
+from apps.notifications.test_tasks import NotificationFixtureMixin
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _vapid_private_key():
+    key = ec.generate_private_key(ec.SECP256R1())
+    return _b64(key.private_numbers().private_value.to_bytes(32, "big"))
+
+
+def _browser_keys():
+    """p256dh/auth of a (fake) browser subscription."""
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    p256dh = public_key.public_bytes(
+        serialization.Encoding.X962,
+        serialization.PublicFormat.UncompressedPoint,
+    )
+    return _b64(p256dh), _b64(os.urandom(16))
+
+
+class StubPushServer:
+    """
+    Local push service: answers 201, or 410 for endpoints under /gone/, and
+    records the requests and the client ports they arrived on.
+    """
+
+    def __init__(self):
+        self.requests: list[dict] = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub.lock:
+                    stub.requests.append(
+                        {
+                            "path": self.path,
+                            "port": self.client_address[1],
+                            "authorization": self.headers.get("Authorization"),
+                            "encoding": self.headers.get("Content-Encoding"),
+                        }
+                    )
+                self.send_response(
+                    410 if self.path.startswith("/gone/") else 201
+                )
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.origin = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def connections(self):
+        return {request["port"] for request in self.requests}
+
+
+class PushDeliveryTestCase(NotificationFixtureMixin, TestCase):
+    """Concurrent delivery against a stub push service."""
+
+    def setUp(self):
+        super().setUp()
+        push._sessions.clear()
+        push._vapid_headers.clear()
+        settings_override = override_settings(
+            VAPID_PRIVATE_KEY=_vapid_private_key()
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _subscribe(self, student, endpoint):
+        p256dh, auth = _browser_keys()
+        return PushSubscription.objects.create(
+            user=student, endpoint=endpoint, p256dh=p256dh, auth=auth
+        )
+
+    def _notify(self, students):
+        return [
+            Notification.objects.create(
+                user=student,
+                type="class_starting",
+                title="Class",
+                message="Soon",
+                data={"class_id": self.class_obj.id},
+            ).id
+            for student in students
+        ]
+
+    def test_sends_to_every_subscription_and_prunes_dead_ones(self):
+        first, second = self._enroll_students(2)
+        with StubPushServer() as server:
+            self._subscribe(first, f"{server.origin}/push/a")
+            gone = self._subscribe(first, f"{server.origin}/gone/a")
+            self._subscribe(second, f"{server.origin}/push/b")
+            sent = send_push_notifications(self._notify([first, second]))
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(server.requests), 3)
+        self.assertTrue(
+            all(
+                request["encoding"] == "aes128gcm"
+                for request in server.requests
+            )
+        )
+        self.assertFalse(PushSubscription.objects.filter(id=gone.id).exists())
+        self.assertEqual(PushSubscription.objects.count(), 2)
+
+    def test_reuses_connections_and_vapid_headers(self):
+        students = self._enroll_students(24)
+        with StubPushServer() as server:
+            messages = [
+                PushMessage(
+                    self._subscribe(
+                        student, f"{server.origin}/push/{student.id}"
+                    ),
+                    "payload",
+                )
+                for student in students
+            ]
+            with patch.object(
+                push, "_vapid_key", wraps=push._vapid_key
+            ) as vapid_key:
+                result = deliver_push_messages(messages, max_workers=4)
+
+        self.assertEqual(result, {"sent": 24, "failed": 0, "pruned": 0})
+        # Keep-alive: at most one connection per worker
+        self.assertLessEqual(len(server.connections), 4)
+        # Signed once for the origin, not per message
+        self.assertEqual(vapid_key.call_count, 1)
+        self.assertEqual(
+            len({request["authorization"] for request in server.requests}), 1
+        )
+        self.assertTrue(
+            server.requests[0]["authorization"].startswith("vapid ")
+        )
+
+    def test_query_count_independent_of_batch_size(self):
+        students = self._enroll_students(12)
+        for student in students:
+            self._subscribe(student, f"https://push.example.com/{student.id}")
+        notification_ids = self._notify(students)
+
+        with patch.object(push, "_send", return_value=201):
+            with CaptureQueriesContext(connection) as few:
+                send_push_notifications(notification_ids[:2])
+            with CaptureQueriesContext(connection) as many:
+                send_push_notifications(notification_ids)
+
+        self.assertEqual(len(few), len(many))
+
+    def test_vapid_headers_renewed_before_expiry(self):
+        origin = "https://push.example.com"
+        first = push.vapid_headers(origin, now=1_000_000)
+        self.assertIs(push.vapid_headers(origin, now=1_000_060), first)
+
+        near_expiry = (
+            1_000_000
+            + push.VAPID_VALIDITY_SECONDS
+            - push.VAPID_RENEW_MARGIN_SECONDS
+        )
+        self.assertIsNot(push.vapid_headers(origin, now=near_expiry), first)
+
+    def test_unreachable_service_counts_as_failed(self):
+        student = self._enroll_students(1)[0]
+        with StubPushServer() as server:
+            origin = server.origin
+        subscription = self._subscribe(student, f"{origin}/push/a")
+
+        result = deliver_push_messages([PushMessage(subscription, "payload")])
+
+        self.assertEqual(result, {"sent": 0, "failed": 1, "pruned": 0})
+        self.assertTrue(
+            PushSubscription.objects.filter(id=subscription.id).exists()
+        )
+
+    @override_settings(VAPID_PRIVATE_KEY="")
+    def test_not_sent_without_vapid_key(self):
+        student = self._enroll_students(1)[0]
+        with StubPushServer() as server:
+            subscription = self._subscribe(student, f"{server.origin}/push/a")
+            result = deliver_push_messages(
+                [PushMessage(subscription, "payload")]
+            )
+
+        self.assertEqual(result["sent"], 0)
+        self.assertEqual(server.requests, [])
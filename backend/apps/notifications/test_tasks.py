@@ -0,0 +1,281 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_q.models import Schedule
+
+from apps.assessments.models import Test
+from apps.classes.models import Class
+from apps.cohorts.models import Cohort, Enrollment
+from apps.courses.models import Course
+from apps.notifications.models import ClassReminder, Notification
+from apps.notifications.tasks import (
+    CLASS_REMINDER_LEAD,
+    check_upcoming_classes,
+    send_class_reminder,
+    send_class_starting_notification,
+    send_test_notification,
+)
+from apps.users.models import User
+
+
+class NotificationFixtureMixin:
+    """A lecturer, a cohort with enrolled students, a test and a class."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.lecturer = User.objects.create_user(
+            email="nt_lecturer@example.com",
+            password="testpassword123",
+            first_name="NT",
+            last_name="Lecturer",
+            role="lecturer",
+        )
+        self.course = Course.objects.create(
+            name="NT Course",
+            program_type="certificate",
+            module_count=5,
+            description="desc",
+            is_active=True,
+        )
+        self.cohort = Cohort.objects.create(
+            name="NT Cohort",
+            program_type="certificate",
+            start_date=self.now.date(),
+            end_date=(self.now + timedelta(days=30)).date(),
+            is_active=True,
+        )
+        self.test = Test.objects.create(
+            title="NT Test",
+            course=self.course,
+            cohort=self.cohort,
+            created_by=self.lecturer,
+        )
+        self.class_obj = Class.objects.create(
+            course=self.course,
+            lecturer=self.lecturer,
+            cohort=self.cohort,
+            title="NT Class",
+            scheduled_at=self.now + timedelta(minutes=15),
+        )
+        self.student_count = 0
+
+    def _enroll_students(self, count):
+        students = []
+        for _ in range(count):
+            self.student_count += 1
+            student = User.objects.create_user(
+                email=f"nt_student{self.student_count}@example.com",
+                password="testpassword123",
+                first_name="NT",
+                last_name=f"Student{self.student_count}",
+                role="student",
+            )
+            Enrollment.objects.create(student=student, cohort=self.cohort)
+            students.append(student)
+        return students
+
+
+class NotificationFanOutTestCase(NotificationFixtureMixin, TestCase):
+    """One recipients query and one bulk insert per fan-out."""
+
+    def test_test_notification_reaches_the_cohort(self):
+        students = self._enroll_students(3)
+        with patch("apps.notifications.tasks.async_task") as mock_async:
+            send_test_notification(self.test.id, "test_published")
+
+        notifications = Notification.objects.filter(type="test_published")
+        self.assertCountEqual(
+            notifications.values_list("user_id", flat=True),
+            [student.id for student in students],
+        )
+        self.assertEqual(
+            notifications.first().data["test_title"], self.test.title
+        )
+        # In-app only: no push delivery queued
+        mock_async.assert_not_called()
+
+    def test_query_count_independent_of_cohort_size(self):
+        self._enroll_students(2)
+        with CaptureQueriesContext(connection) as few:
+            send_test_notification(self.test.id, "test_published")
+
+        self._enroll_students(20)
+        with CaptureQueriesContext(connection) as many:
+            send_test_notification(self.test.id, "test_published")
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(Notification.objects.count(), 2 + 22)
+
+    def test_class_starting_queues_batched_push(self):
+        self._enroll_students(5)
+        with (
+            patch("apps.notifications.tasks.PUSH_BATCH_SIZE", 2),
+            patch("apps.notifications.tasks.async_task") as mock_async,
+            patch(
+                "apps.notifications.push.deliver_push_messages"
+            ) as mock_deliver,
+        ):
+            send_class_starting_notification(self.class_obj.id)
+
+        ids = list(
+            Notification.objects.filter(type="class_starting")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(len(ids), 5)
+        batches = [call.args for call in mock_async.call_args_list]
+        self.assertEqual(
+            batches,
+            [
+                ("apps.notifications.tasks.send_push_notifications", ids[0:2]),
+                ("apps.notifications.tasks.send_push_notifications", ids[2:4]),
+                ("apps.notifications.tasks.send_push_notifications", ids[4:5]),
+            ],
+        )
+        # Nothing is pushed from inside the fan-out task
+        mock_deliver.assert_not_called()
+
+
+@patch("apps.notifications.tasks.async_task")
+class ClassReminderTestCase(NotificationFixtureMixin, TestCase):
+    """Per-class reminder schedules backed by the reminder ledger."""
+
+    def _create_class(self, starts_in):
+        return Class.objects.create(
+            course=self.course,
+            lecturer=self.lecturer,
+            cohort=self.cohort,
+            title="Later Class",
+            scheduled_at=timezone.now() + starts_in,
+        )
+
+    def _schedule(self, class_obj):
+        return Schedule.objects.get(name=f"class_reminder_{class_obj.id}")
+
+    def _reminders_sent(self, class_obj):
+        return Notification.objects.filter(
+            type="class_starting", data__class_id=class_obj.id
+        ).count()
+
+    def test_reminder_scheduled_before_class(self, mock_async):
+        class_obj = self._create_class(timedelta(days=1))
+
+        reminder = self._schedule(class_obj)
+        self.assertEqual(
+            reminder.func, "apps.notifications.tasks.send_class_reminder"
+        )
+        self.assertEqual(reminder.schedule_type, Schedule.ONCE)
+        self.assertEqual(
+            reminder.next_run, class_obj.scheduled_at - CLASS_REMINDER_LEAD
+        )
+
+    def test_reschedule_moves_reminder_and_delete_cancels_it(self, mock_async):
+        class_obj = self._create_class(timedelta(days=1))
+        class_obj.scheduled_at += timedelta(days=2)
+        class_obj.save()
+
+        self.assertEqual(
+            Schedule.objects.filter(
+                name=f"class_reminder_{class_obj.id}"
+            ).count(),
+            1,
+        )
+        self.assertEqual(
+            self._schedule(class_obj).next_run,
+            class_obj.scheduled_at - CLASS_REMINDER_LEAD,
+        )
+
+        class_id = class_obj.id
+        class_obj.delete()
+        self.assertFalse(
+            Schedule.objects.filter(name=f"class_reminder_{class_id}").exists()
+        )
+
+    def test_class_starting_soon_is_reminded_right_away(self, mock_async):
+        class_obj = self._create_class(timedelta(minutes=5))
+
+        mock_async.assert_called_with(
+            "apps.notifications.tasks.send_class_reminder", class_obj.id
+        )
+        self.assertFalse(
+            Schedule.objects.filter(
+                name=f"class_reminder_{class_obj.id}"
+            ).exists()
+        )
+
+    def test_reminder_sent_once(self, mock_async):
+        self._enroll_students(2)
+
+        send_class_reminder(self.class_obj.id)
+        send_class_reminder(self.class_obj.id)
+        check_upcoming_classes()
+
+        self.assertEqual(self._reminders_sent(self.class_obj), 2)
+        self.assertEqual(
+            ClassReminder.objects.get(
+                class_session=self.class_obj
+            ).scheduled_at,
+            self.class_obj.scheduled_at,
+        )
+
+    def test_failed_send_is_not_recorded(self, mock_async):
+        self._enroll_students(1)
+
+        with patch(
+            "apps.notifications.tasks.fan_out_notification",
+            side_effect=ConnectionError("Database unavailable"),
+        ):
+            send_class_reminder(self.class_obj.id)
+
+        self.assertFalse(ClassReminder.objects.exists())
+
+        # The next sweep sends it
+        check_upcoming_classes()
+        self.assertEqual(self._reminders_sent(self.class_obj), 1)
+        self.assertTrue(ClassReminder.objects.exists())
+
+    def test_rescheduled_class_is_reminded_again(self, mock_async):
+        self._enroll_students(1)
+        send_class_reminder(self.class_obj.id)
+
+        # Moved five minutes earlier: the new time needs its own reminder
+        Class.objects.filter(id=self.class_obj.id).update(
+            scheduled_at=self.class_obj.scheduled_at - timedelta(minutes=5)
+        )
+        send_class_reminder(self.class_obj.id)
+
+        self.assertEqual(self._reminders_sent(self.class_obj), 2)
+        self.assertEqual(ClassReminder.objects.count(), 1)
+
+    def test_reminder_skipped_for_class_moved_later(self, mock_async):
+        self._enroll_students(1)
+        Class.objects.filter(id=self.class_obj.id).update(
+            scheduled_at=timezone.now() + timedelta(hours=2)
+        )
+
+        send_class_reminder(self.class_obj.id)
+
+        self.assertEqual(self._reminders_sent(self.class_obj), 0)
+        self.assertFalse(ClassReminder.objects.exists())
+
+    def test_sweep_sends_only_missed_reminders(self, mock_async):
+        self._enroll_students(1)
+        reminded = self._create_class(timedelta(minutes=10))
+        send_class_reminder(reminded.id)
+        self._create_class(timedelta(hours=3))
+
+        check_upcoming_classes()
+
+        # The fixture class (15 minutes out) was missed; the others were
+        # reminded already or are not due yet
+        self.assertEqual(self._reminders_sent(self.class_obj), 1)
+        self.assertEqual(self._reminders_sent(reminded), 1)
+        self.assertEqual(Notification.objects.count(), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            check_upcoming_classes()
+        self.assertEqual(len(queries), 1)
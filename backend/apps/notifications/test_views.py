@@ -0,0 +1,244 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.notifications.models import Notification
+from apps.notifications.tasks import fan_out_notification
+from apps.users.models import User
+
+LOCMEM_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "notification-inbox-tests",
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class NotificationInboxTestCase(APITestCase):
+    """Keyset-paginated inbox, cached unread counter and ETags."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="inbox@example.com",
+            password="testpassword123",
+            first_name="In",
+            last_name="Box",
+            role="student",
+        )
+        self.other = User.objects.create_user(
+            email="inbox_other@example.com",
+            password="testpassword123",
+            role="student",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.inbox_url = reverse("notification-inbox")
+        self.unread_url = reverse("notification-unread-count")
+
+    def _notify(self, count, user=None, **kwargs):
+        with patch("apps.notifications.tasks.async_task"):
+            return [
+                fan_out_notification(
+                    [(user or self.user).id],
+                    "test_published",
+                    f"Notification {i}",
+                    "Message",
+                    **kwargs,
+                )[0]
+                for i in range(count)
+            ]
+
+    def test_keyset_pages_cover_inbox_newest_first(self):
+        ids = self._notify(5)
+        self._notify(2, user=self.other)
+        # Two rows with the same timestamp: the id breaks the tie
+        same_time = timezone.now() - timedelta(hours=1)
+        Notification.objects.filter(id__in=ids[1:3]).update(
+            created_at=same_time
+        )
+
+        seen: list[int] = []
+        cursor = None
+        while True:
+            params = {"page_size": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(self.inbox_url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item["id"] for item in response.data["results"])
+            cursor = response.data["next_cursor"]
+            if cursor is None:
+                break
+
+        expected = list(
+            Notification.objects.filter(user=self.user)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 5)
+
+    def test_page_query_count_independent_of_depth(self):
+        self._notify(30)
+        first = self.client.get(self.inbox_url, {"page_size": 5})
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as shallow:
+            self.client.get(self.inbox_url, {"page_size": 5})
+        cache.clear()
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(
+                self.inbox_url,
+                {"page_size": 5, "cursor": first.data["next_cursor"]},
+            )
+
+        self.assertEqual(len(shallow), len(deep))
+        self.assertFalse(
+            any("OFFSET" in q["sql"] for q in deep.captured_queries)
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.inbox_url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_read_filter(self):
+        ids = self._notify(3)
+        self.client.post(reverse("notification-mark-read", args=[ids[0]]))
+
+        response = self.client.get(self.inbox_url, {"read": "false"})
+
+        self.assertCountEqual(
+            [item["id"] for item in response.data["results"]], ids[1:]
+        )
+        self.assertEqual(response.data["unread_count"], 2)
+
+    def test_unread_count_cached_and_kept_in_step(self):
+        ids = self._notify(3)
+        self.assertEqual(self.client.get(self.unread_url).data["count"], 3)
+
+        # Served from the cache: no COUNT query
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.unread_url).data["count"], 3)
+        self.assertFalse(
+            any("COUNT" in q["sql"].upper() for q in queries.captured_queries)
+        )
+
+        self._notify(2)
+        self.assertEqual(self.client.get(self.unread_url).data["count"], 5)
+
+        self.client.post(reverse("notification-mark-read", args=[ids[0]]))
+        # Marking an already read notification does not decrement again
+        self.client.post(reverse("notification-mark-read", args=[ids[0]]))
+        self.assertEqual(self.client.get(self.unread_url).data["count"], 4)
+
+        response = self.client.post(reverse("notification-mark-all-read"))
+        self.assertEqual(response.data["updated"], 4)
+        self.assertEqual(self.client.get(self.unread_url).data["count"], 0)
+        self.assertEqual(
+            Notification.objects.filter(user=self.user, read=False).count(), 0
+        )
+
+    def test_concurrent_mark_as_read_decrements_once(self):
+        (notification_id,) = self._notify(1)
+        self._notify(1)
+        self.assertEqual(self.client.get(self.unread_url).data["count"], 2)
+
+        # Two requests that both loaded the notification while unread
+        first = Notification.objects.get(id=notification_id)
+        second = Notification.objects.get(id=notification_id)
+        first.mark_as_read()
+        second.mark_as_read()
+
+        self.assertEqual(self.client.get(self.unread_url).data["count"], 1)
+        self.assertTrue(Notification.objects.get(id=notification_id).read)
+
+    def test_unchanged_inbox_returns_304(self):
+        ids = self._notify(2)
+        response = self.client.get(self.inbox_url)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.inbox_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        # Authentication aside, a 304 costs no query
+        self.assertFalse(
+            any(
+                "notifications_notification" in q["sql"]
+                for q in queries.captured_queries
+            )
+        )
+
+        # Another user's notifications do not change this inbox
+        self._notify(1, user=self.other)
+        response = self.client.get(self.inbox_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A different page or filter has its own ETag
+        response = self.client.get(
+            self.inbox_url, {"read": "false"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Reading a notification changes the inbox
+        self.client.post(reverse("notification-mark-read", args=[ids[0]]))
+        response = self.client.get(self.inbox_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # ...and so does a new one
+        self._notify(1)
+        response = self.client.get(self.inbox_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_unread_count_etag(self):
+        self._notify(1)
+        etag = self.client.get(self.unread_url)["ETag"]
+
+        response = self.client.get(self.unread_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self._notify(1)
+        response = self.client.get(self.unread_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    }
+)
+class NotificationInboxWithoutCacheTestCase(APITestCase):
+    """Without a cache every response is fresh, never a stale 304."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="nocache@example.com",
+            password="testpassword123",
+            role="student",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_etag_never_matches(self):
+        url = reverse("notification-inbox")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotIn("None", etag)
+
+        with patch("apps.notifications.tasks.async_task"):
+            fan_out_notification(
+                [self.user.id], "test_published", "New", "Message"
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
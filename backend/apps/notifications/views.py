@@ -3,8 +3,22 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    extend_schema,
+    extend_schema_view,
+)
 
+from .inbox import (
+    INBOX_MAX_PAGE_SIZE,
+    INBOX_PAGE_SIZE,
+    etag_matches,
+    get_unread_count,
+    inbox_changed,
+    inbox_etag,
+    inbox_page,
+)
 from .models import Notification, PushSubscription
 from .serializers import NotificationSerializer, PushSubscriptionSerializer
 
@@ -36,6 +50,91 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         """Return notifications for the current user"""
         return Notification.objects.filter(user=self.request.user)
 
+    def _not_modified(self, request):
+        """
+        Return (etag, response): a 304 response when the client's
+        If-None-Match still matches the user's inbox, otherwise None.
+        """
+        etag = inbox_etag(request.user.id, request)
+        if etag_matches(request, etag):
+            return etag, Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+        return etag, None
+
+    @extend_schema(
+        description=(
+            "Page through the user's notifications, newest first. Pass the "
+            "returned next_cursor to get the following page. Responses carry "
+            "an ETag; send it as If-None-Match to get a 304 while the inbox "
+            "is unchanged."
+        ),
+        summary="Notification inbox",
+        parameters=[
+            OpenApiParameter(
+                "cursor",
+                OpenApiTypes.STR,
+                description="next_cursor of the previous page",
+            ),
+            OpenApiParameter(
+                "page_size",
+                OpenApiTypes.INT,
+                description=f"Default {INBOX_PAGE_SIZE}, max {INBOX_MAX_PAGE_SIZE}",
+            ),
+            OpenApiParameter("read", OpenApiTypes.BOOL),
+            OpenApiParameter("type", OpenApiTypes.STR),
+        ],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "results": {"type": "array", "items": {"type": "object"}},
+                    "next_cursor": {"type": "string", "nullable": True},
+                    "unread_count": {"type": "integer"},
+                },
+            },
+            304: None,
+        },
+    )
+    @action(detail=False, methods=["get"])
+    def inbox(self, request):
+        """Keyset-paginated inbox with the unread count"""
+        etag, not_modified = self._not_modified(request)
+        if not_modified:
+            return not_modified
+
+        queryset = self.get_queryset()
+        read = request.query_params.get("read")
+        if read in ("true", "false"):
+            queryset = queryset.filter(read=read == "true")
+        notification_type = request.query_params.get("type")
+        if notification_type:
+            queryset = queryset.filter(type=notification_type)
+
+        try:
+            page_size = int(
+                request.query_params.get("page_size", INBOX_PAGE_SIZE)
+            )
+            notifications, next_cursor = inbox_page(
+                queryset,
+                request.query_params.get("cursor"),
+                min(max(page_size, 1), INBOX_MAX_PAGE_SIZE),
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid cursor or page_size"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "results": self.get_serializer(notifications, many=True).data,
+                "next_cursor": next_cursor,
+                "unread_count": get_unread_count(request.user.id),
+            },
+            headers={"ETag": etag},
+        )
+
     @extend_schema(
         description="Get count of unread notifications",
         summary="Get unread count",
@@ -43,14 +142,19 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             200: {
                 "type": "object",
                 "properties": {"count": {"type": "integer"}},
-            }
+            },
+            304: None,
         },
     )
     @action(detail=False, methods=["get"], url_path="unread-count")
     def unread_count(self, request):
         """Get count of unread notifications"""
-        count = self.get_queryset().filter(read=False).count()
-        return Response({"count": count})
+        etag, not_modified = self._not_modified(request)
+        if not_modified:
+            return not_modified
+        return Response(
+            {"count": get_unread_count(request.user.id)}, headers={"ETag": etag}
+        )
 
     @extend_schema(
         description="Mark a notification as read",
@@ -84,6 +188,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             .filter(read=False)
             .update(read=True, read_at=now)
         )
+        if updated:
+            inbox_changed({request.user.id: -updated})
         return Response({"updated": updated})
 
 
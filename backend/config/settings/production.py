@@ -102,7 +102,11 @@ STORAGES.update(
 )
 
 CACHES = {
-    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "plsom",
+    },
     "django-backblaze-b2": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
     },